@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Token throughput of the streaming hot path with logging off, with the legacy
+synchronous DEBUG FileHandler setup, and with the queue-based logging pipeline.
+
+Pushes tokens through CustomAsyncIteratorCallbackHandler.on_llm_new_token into the
+same StreamRecord event pusher used by utils/chat.py, so the numbers include the
+per-event logging done by the handler and the pusher.
+
+Usage: python benchmarks/token_logging_throughput.py [--tokens 20000]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mcp_web_app.utils.custom_event_handler import CustomAsyncIteratorCallbackHandler
+from mcp_web_app.utils.events import stream_record_output_fn_factory
+from mcp_web_app.utils.stream_buffer import StreamRecord
+from mcp_web_app.utils.logging_pipeline import configure_logging, shutdown_logging
+
+async def _run_tokens(token_count: int) -> float:
+    record = StreamRecord("bench-stream", "bench-session")
+    pusher = stream_record_output_fn_factory(record)
+    handler = CustomAsyncIteratorCallbackHandler(output_stream_fn=pusher, session_id="bench-session")
+
+    start = time.perf_counter()
+    for i in range(token_count):
+        await handler.on_llm_new_token(f"tok{i} ")
+        if i % 64 == 0:
+            await asyncio.sleep(0) # Yield to the loop, as a real stream would
+    return token_count / (time.perf_counter() - start)
+
+def _reset_root():
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    logging.disable(logging.NOTSET)
+
+def _legacy_setup(log_file: str):
+    # Mirrors the previous main.py setup: root DEBUG, synchronous FileHandler
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler(log_file)],
+        force=True,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios = {
+            "logging off": lambda: logging.disable(logging.CRITICAL),
+            "legacy sync DEBUG FileHandler": lambda: _legacy_setup(os.path.join(tmp, "legacy.log")),
+            "queue pipeline (INFO)": lambda: configure_logging(
+                {"logging": {"file": os.path.join(tmp, "pipeline.log"), "console": False}}),
+            "queue pipeline (DEBUG, hot path limited)": lambda: configure_logging(
+                {"logging": {"file": os.path.join(tmp, "pipeline-debug.log"), "console": False, "level": "DEBUG"}}),
+        }
+        results = {}
+        for name, setup in scenarios.items():
+            _reset_root()
+            setup()
+            results[name] = asyncio.run(_run_tokens(args.tokens))
+        _reset_root()
+
+    baseline = results["logging off"]
+    print(f"{'scenario':<45}{'tokens/s':>14}{'vs off':>10}")
+    for name, rate in results.items():
+        print(f"{name:<45}{rate:>14,.0f}{rate / baseline:>10.2f}")
+
+if __name__ == "__main__":
+    main()
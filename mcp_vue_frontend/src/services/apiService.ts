@@ -235,6 +235,66 @@ export async function getServerStatus(serverId: string): Promise<ServerStatusRes
     }
 }
 
+let allStatusesEtag: string | null = null;
+let allStatusesCache: Record<string, ServerStatusResponse> = {};
+
+/**
+ * Fetches the status of every server in one request (instead of one request per server).
+ * Uses the ETag of the previous response, so an unchanged poll costs a 304 with no body.
+ */
+export async function getAllServerStatuses(): Promise<Record<string, ServerStatusResponse>> {
+    try {
+        const response = await fetch(`${API_BASE_URL}/servers/status`, {
+            headers: allStatusesEtag ? { 'If-None-Match': allStatusesEtag } : {},
+        });
+        if (response.status === 304) {
+            return allStatusesCache;
+        }
+        if (!response.ok) {
+            const errorData = await response.text();
+            throw new Error(`Failed to get server statuses: ${response.status} ${response.statusText} - ${errorData}`);
+        }
+        const data = await response.json() as { servers: Record<string, ServerStatusResponse> };
+        allStatusesEtag = response.headers.get('ETag');
+        allStatusesCache = data.servers;
+        return allStatusesCache;
+    } catch (error) {
+        console.error('Error getting server statuses:', error);
+        throw error;
+    }
+}
+
+export interface ServerEvent {
+    seq: number;
+    ts: number;
+    topic: 'status' | 'capabilities' | 'resources' | 'health';
+    server_id: string;
+    data: any;
+}
+
+/**
+ * Subscribes to live server changes (pushed by the backend, no polling).
+ * onSnapshot receives every server's status on (re)connect; onEvent receives each change after it.
+ * @param topics Optional subset of 'status', 'capabilities', 'resources', 'health'.
+ * @returns A function that closes the subscription.
+ */
+export function subscribeServerEvents(
+    onSnapshot: (servers: Record<string, ServerStatusResponse>) => void,
+    onEvent: (event: ServerEvent) => void,
+    topics?: string[],
+): () => void {
+    const query = topics && topics.length ? `?topics=${encodeURIComponent(topics.join(','))}` : '';
+    const source = new EventSource(`${API_BASE_URL}/servers/events${query}`);
+    source.addEventListener('snapshot', (message) => {
+        onSnapshot((JSON.parse((message as MessageEvent).data) as { servers: Record<string, ServerStatusResponse> }).servers);
+    });
+    for (const topic of ['status', 'capabilities', 'resources', 'health']) {
+        source.addEventListener(topic, (message) => onEvent(JSON.parse((message as MessageEvent).data) as ServerEvent));
+    }
+    source.onerror = (error) => console.warn('Server event stream interrupted; the browser will reconnect.', error);
+    return () => source.close();
+}
+
 /**
  * Refreshes the capabilities of a specific MCP server.
  * @param serverId The ID of the server to refresh capabilities for.
@@ -1,7 +1,7 @@
 import json
 import os
 import asyncio # For file lock in LLMConfigManager
-from typing import Dict, List, Optional, Any # Added List, Any
+from typing import Callable, Dict, List, Optional, Any # Added List, Any
 from .models.models import ServerConfig
 import logging
 from fastapi import APIRouter, HTTPException, Body, status # For LLMConfig router
@@ -147,6 +147,18 @@ class LLMConfig(BaseModel):
     is_default: Optional[bool] = Field(False, description="Is this the default for the provider?")
 
 
+class LLMConfigSnapshot:
+    """Immutable view of llm_configs.json: the validated configs plus lookup indexes."""
+
+    def __init__(self, configs: List[LLMConfig]):
+        self.configs = tuple(configs)
+        self.by_id: Dict[str, LLMConfig] = {}
+        self.by_provider: Dict[str, List[LLMConfig]] = {}
+        for cfg in self.configs:
+            self.by_id.setdefault(cfg.config_id, cfg) # First entry wins, as with the old linear scan
+            self.by_provider.setdefault(cfg.provider, []).append(cfg)
+
+
 class LLMConfigManager:
     def __init__(self, config_file_path: str = LLM_CONFIGS_FILENAME):
         self.config_file_path = config_file_path
@@ -154,6 +166,63 @@ class LLMConfigManager:
         if not os.path.isabs(self.config_file_path):
              self.config_file_path = os.path.join(os.path.dirname(__file__), self.config_file_path)
         logger.info(f"LLMConfigManager initialized with config file: {self.config_file_path}")
+        # Validated configs indexed by config_id and provider, rebuilt when the file changes
+        self._snapshot: Optional[LLMConfigSnapshot] = None
+        self._snapshot_key: Optional[tuple] = None
+        self.cache_hits = 0
+        self.reloads = 0
+        self._change_listeners: List[Callable[[], None]] = []
+
+    def _file_key(self) -> Optional[tuple]:
+        """Identity of the config file on disk; any edit (or replace by rename) changes it."""
+        try:
+            st = os.stat(self.config_file_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def invalidate_cache(self) -> None:
+        self._snapshot = None
+        self._snapshot_key = None
+
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """Called after every write through this manager (e.g. to drop derived caches)."""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"LLM config change listener failed: {e}", exc_info=True)
+
+    async def _get_snapshot(self) -> "LLMConfigSnapshot":
+        # Fast path: a stat() and a comparison, no lock, no JSON parsing, no validation
+        file_key = self._file_key()
+        snapshot = self._snapshot
+        if snapshot is not None and file_key == self._snapshot_key:
+            self.cache_hits += 1
+            return snapshot
+        raw_configs = await self._load_llm_configs_from_file()
+        validated_configs: List[LLMConfig] = []
+        for config_data in raw_configs:
+            try:
+                validated_configs.append(LLMConfig(**config_data))
+            except Exception as e: # PydanticValidationError
+                logger.error(f"Validation error for LLM config data: {config_data}. Error: {e}", exc_info=True)
+        snapshot = LLMConfigSnapshot(validated_configs)
+        self._snapshot, self._snapshot_key = snapshot, file_key
+        self.reloads += 1
+        logger.debug(f"Reloaded {len(validated_configs)} LLM configs from {self.config_file_path}.")
+        return snapshot
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return {
+            "config_file": self.config_file_path,
+            "cached_configs": len(self._snapshot.configs) if self._snapshot else 0,
+            "cache_hits": self.cache_hits,
+            "reloads": self.reloads,
+        }
 
 
     async def _load_llm_configs_from_file(self) -> List[Dict[str, Any]]:
@@ -177,6 +246,8 @@ class LLMConfigManager:
             try:
                 with open(self.config_file_path, 'w') as f:
                     json.dump(configs_data, f, indent=2)
+                self.invalidate_cache() # mtime granularity may hide a quick rewrite
+                self._notify_changed()
                 logger.info(f"LLM configurations saved to {self.config_file_path}")
             except Exception as e:
                 logger.error(f"Error saving LLM configurations to {self.config_file_path}: {e}", exc_info=True)
@@ -215,18 +286,16 @@ class LLMConfigManager:
             logger.info("Existing 'ericai' provider configurations found. Default templates not added.")
 
     async def get_all_llm_configs(self) -> List[LLMConfig]:
-        raw_configs = await self._load_llm_configs_from_file()
-        validated_configs: List[LLMConfig] = []
-        for config_data in raw_configs:
-            try:
-                validated_configs.append(LLMConfig(**config_data))
-            except Exception as e: # PydanticValidationError
-                logger.error(f"Validation error for LLM config data: {config_data}. Error: {e}", exc_info=True)
-        return validated_configs
+        snapshot = await self._get_snapshot()
+        return list(snapshot.configs) # Callers may edit the list before saving it back
 
     async def get_llm_config_by_id(self, config_id: str) -> Optional[LLMConfig]:
-        configs = await self.get_all_llm_configs()
-        return next((cfg for cfg in configs if cfg.config_id == config_id), None)
+        snapshot = await self._get_snapshot()
+        return snapshot.by_id.get(config_id)
+
+    async def get_llm_configs_by_provider(self, provider: str) -> List[LLMConfig]:
+        snapshot = await self._get_snapshot()
+        return list(snapshot.by_provider.get(provider, []))
 
     async def add_llm_config(self, config: LLMConfig) -> LLMConfig:
         all_configs_objects = await self.get_all_llm_configs()
@@ -283,6 +352,10 @@ llm_manager_instance = LLMConfigManager(config_file_path=LLM_CONFIGS_FILENAME)
 async def get_all_llm_configs_endpoint():
     return await llm_manager_instance.get_all_llm_configs()
 
+@llm_config_router.get("/cache-stats")
+async def get_llm_config_cache_stats_endpoint():
+    return llm_manager_instance.get_cache_stats()
+
 @llm_config_router.get("/{config_id}", response_model=LLMConfig)
 async def get_llm_config_by_id_endpoint(config_id: str):
     config = await llm_manager_instance.get_llm_config_by_id(config_id)
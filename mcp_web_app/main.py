@@ -87,13 +87,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, List, Any, Optional, AsyncGenerator
 import uvicorn
 from pydantic import BaseModel, Field, ValidationError
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 
 # Import WebSocketDisconnect and WebSocketState for more robust error handling
 from starlette.websockets import WebSocketDisconnect, WebSocketState
 
 # Import ProcessManager, LangchainAgentService, config_manager, CustomAsyncIteratorCallbackHandler, and EventType
 from mcp_web_app.services.process_manager import ProcessManager
+from mcp_web_app.services.server_supervisor import ServerSupervisor
+from mcp_web_app.services.resource_sampler import ResourceSampler
+from mcp_web_app.services.server_orchestrator import ServerOrchestrator, DependencyError
+from mcp_web_app.services.server_logs import server_log_registry, sse_log_events, format_line
+from mcp_web_app.services.mcp_standby_pool import standby_pool_manager
+from mcp_web_app.services.event_bus import parse_topics, encode_event, sse_server_events
+from mcp_web_app.services.launch_resolver import launch_resolver
+from mcp_web_app.services.mcp_gateway import MCPGateway, MCP_GATEWAY_PATH, GatewayAddressMiddleware, is_local_client
 from mcp_web_app.services.langchain_agent_service import LangchainAgentService
 from mcp_web_app.services.config_manager import config_manager, PREDEFINED_ERICAI_MODEL_IDENTIFIERS
 from mcp_web_app.utils.custom_event_handler import CustomAsyncIteratorCallbackHandler, EventType, MCPEventCollector
@@ -104,7 +112,7 @@ from langchain_core.callbacks.base import BaseCallbackHandler
 from mcp_web_app.models.models import (
     ServerConfig,
     LLMConfig,
-    StreamChatRequest, ChatResponse, ChatRequest, ServerStatusResponse,
+    StreamChatRequest, ChatResponse, ChatRequest, ServerStatusResponse, BulkServerRequest,
     CreateServerConfigRequest, CreateServerConfigResponse,
     UpdateServerConfigRequest, UpdateServerConfigResponse
 )
@@ -189,15 +197,16 @@ from langchain_deepseek import ChatDeepSeek
 from langchain_openai import ChatOpenAI # Used for EricAI integration
 
 # --- BEGIN LOGGING CONFIGURATION ---
-LOG_FILE = os.path.join(os.path.dirname(__file__), '..', 'mcp_app.log')
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler() # Still print to console as well, can be removed if only file is needed
-    ]
-)
+# Records are enqueued on the event loop and written by a background QueueListener
+# (rotating file + console). Levels come from the "logging" section of config.json
+# and MCP_LOG_* env vars; see utils/logging_pipeline.py.
+from mcp_web_app.utils.logging_pipeline import configure_logging, shutdown_logging, get_logging_stats
+from mcp_web_app.services.llm_hedging import get_hedging_stats
+from mcp_web_app.services.llm_health import llm_health_tracker, BreakerState
+from mcp_web_app.services.ollama_residency import ollama_residency_manager
+from mcp_web_app.utils.http_clients import http_client_registry, get_async_client, get_sync_client
+from mcp_web_app.utils.lifecycle import shutdown_servers_and_clients
+configure_logging(config_manager.get_app_config())
 logger = logging.getLogger(__name__)
 # --- END LOGGING CONFIGURATION ---
 
@@ -273,6 +282,12 @@ connection_manager = ConnectionManager()
 # CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'servers.json') # <<< REMOVE
 # config_manager = ConfigManager(CONFIG_PATH) # <<< REMOVE - This was causing the NameError, use imported singleton
 process_manager = ProcessManager()
+server_supervisor = ServerSupervisor(process_manager) # Health probes and automatic restarts
+resource_sampler = ResourceSampler(process_manager) # CPU/RSS/FDs per server from /proc
+server_orchestrator = ServerOrchestrator(process_manager, config_manager, supervisor=server_supervisor) # Bulk operations
+mcp_gateway = MCPGateway(process_manager, config_manager) # Agent sessions share the managed server processes
+app.add_middleware(GatewayAddressMiddleware, gateway=mcp_gateway) # Learns the bound port if not configured
+standby_pool_manager.gateway = mcp_gateway # Fronted servers need no standby pool
 
 # Initialize the LLM
 # Ensure you have DEEPSEEK_API_KEY set in your environment (e.g., in the .env file)
@@ -295,6 +310,7 @@ process_manager = ProcessManager()
 #     agent_service = LangchainAgentService(config_manager=config_manager)
 
 agent_service = LangchainAgentService(config_manager=config_manager) # Pass the imported config_manager instance
+agent_service.mcp_gateway = mcp_gateway
 logger.info("LangchainAgentService initialized using global config_manager.")
 
 # Store the agent_service in app.state for potential access in dependencies or middlewares if needed
@@ -370,6 +386,42 @@ async def get_llm_configurations():
         logger.error(f"API: Error loading LLM configurations: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error loading LLM configurations: {str(e)}")
 
+@app.get("/api/servers/status")
+async def get_all_server_statuses(request: Request, detail: bool = Query(False)):
+    """Every server's status and capabilities in one response; answers 304 when If-None-Match matches."""
+    result = server_orchestrator.status_all(detail=detail)
+    headers = {"ETag": result["etag"], "Cache-Control": "no-cache"}
+    if result["etag"] in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=result["payload"], headers=headers)
+
+@app.post("/api/servers/start-all")
+async def start_servers_bulk(bulk_request: BulkServerRequest):
+    """Start servers (all configured by default) in parallel, dependencies first"""
+    try:
+        results = await server_orchestrator.start_many(bulk_request.servers, bulk_request.concurrency, bulk_request.respect_dependencies)
+    except DependencyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results, "ok": all(result["ok"] for result in results)}
+
+@app.post("/api/servers/stop-all")
+async def stop_servers_bulk(bulk_request: BulkServerRequest):
+    """Stop servers (all running by default) in parallel, dependents first"""
+    try:
+        results = await server_orchestrator.stop_many(bulk_request.servers, bulk_request.concurrency, bulk_request.respect_dependencies)
+    except DependencyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results, "ok": all(result["ok"] for result in results)}
+
+@app.post("/api/servers/restart")
+async def restart_servers_bulk(bulk_request: BulkServerRequest):
+    """Restart servers (all running by default): ordered stop, then ordered start"""
+    try:
+        results = await server_orchestrator.restart_many(bulk_request.servers, bulk_request.concurrency, bulk_request.respect_dependencies)
+    except DependencyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**results, "ok": all(result["ok"] for phase in results.values() for result in phase)}
+
 @app.post("/api/servers/{server_name}/start", response_model=ServerStatusResponse)
 async def start_server(server_name: str, background_tasks: BackgroundTasks):
     logger.info(f"API: POST /api/servers/{server_name}/start called")
@@ -403,6 +455,7 @@ async def start_server(server_name: str, background_tasks: BackgroundTasks):
 
     try:
         logger.info(f"API: Starting server '{server_name}' with command: {server_config.command} {' '.join(server_config.args)}")
+        server_supervisor.reset(server_name) # A manual start clears a crash-loop verdict
         # Start the server process using ProcessManager
         background_tasks.add_task(process_manager.start_server, server_name, server_config)
         return ServerStatusResponse(
@@ -419,9 +472,10 @@ async def stop_server(server_name: str):
     logger.info(f"API: POST /api/servers/{server_name}/stop called")
     if not process_manager.is_server_running(server_name):
         logger.warning(f"API: Server '{server_name}' is not running.")
+        await process_manager.stop_server(server_name) # Also cancels a pending automatic restart
         return ServerStatusResponse(server_name=server_name, status="stopped", message=f"Server '{server_name}' was not running.")
     try:
-        process_manager.stop_server(server_name)
+        await process_manager.stop_server(server_name)
         logger.info(f"API: Server '{server_name}' stopped successfully.")
         return ServerStatusResponse(server_name=server_name, status="stopped", message=f"Server '{server_name}' stopped.")
     except Exception as e:
@@ -436,6 +490,165 @@ async def get_server_status(server_name: str):
     # ProcessManager.get_server_status now returns a dictionary
     return ServerStatusResponse(**status_dict)
 
+@app.post("/api/servers/{server_name}/ping")
+async def ping_server(server_name: str):
+    """MCP ping over the server's existing session (no extra process is spawned)"""
+    if not process_manager.is_server_running(server_name):
+        raise HTTPException(status_code=409, detail=f"Server '{server_name}' is not running.")
+    latency_ms = await server_supervisor.probe(server_name)
+    return {"server_name": server_name, "healthy": latency_ms is not None, "latency_ms": latency_ms,
+            "health": server_supervisor.health_info(server_name)}
+
+@app.get("/api/servers/health")
+async def servers_health():
+    """Supervisor state of every server: probe latency, failures, restarts, crash loops"""
+    return server_supervisor.snapshot()
+
+@app.get("/api/servers/metrics")
+async def servers_metrics():
+    """Resource use of every managed server's process tree: current sample and rolling window"""
+    return resource_sampler.snapshot()
+
+@app.get("/api/servers/standby-pools")
+async def standby_pools():
+    """Pre-warmed standby instances per server: idle/leased counts, hit rate, warm-up time"""
+    return standby_pool_manager.snapshot()
+
+@app.get("/api/servers/launch-cache")
+async def servers_launch_cache():
+    """Resolved npx/uvx launches and spawn-to-ready latency per launch mode (original vs resolved)"""
+    return launch_resolver.snapshot()
+
+@app.get("/api/servers/gateway")
+async def servers_gateway():
+    """MCP gateway clients per server: in-flight and waiting requests, totals, idle time"""
+    return mcp_gateway.snapshot()
+
+@app.post(MCP_GATEWAY_PATH + "/{server_name}")
+async def mcp_gateway_post(server_name: str, request: Request):
+    """Streamable-HTTP MCP endpoint of a managed stdio server (JSON responses, no SSE stream)."""
+    if not is_local_client(request.scope): # Raw tool calls: only for agent sessions of this host
+        return Response(status_code=403)
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+    status_code, headers, payload = await mcp_gateway.handle_post(server_name, body, request.headers.get("mcp-session-id"))
+    if payload is None:
+        return Response(status_code=status_code, headers=headers)
+    return JSONResponse(status_code=status_code, content=payload, headers=headers)
+
+@app.get(MCP_GATEWAY_PATH + "/{server_name}")
+async def mcp_gateway_get(server_name: str, request: Request):
+    if not is_local_client(request.scope):
+        return Response(status_code=403)
+    # No server-initiated stream: clients treat 405 as "not offered"
+    return Response(status_code=405, headers={"Allow": "POST, DELETE"})
+
+@app.delete(MCP_GATEWAY_PATH + "/{server_name}")
+async def mcp_gateway_delete(server_name: str, request: Request):
+    if not is_local_client(request.scope):
+        return Response(status_code=403)
+    closed = mcp_gateway.close_session(server_name, request.headers.get("mcp-session-id"))
+    return Response(status_code=200 if closed else 404)
+
+@app.get("/api/servers/events")
+async def server_events(request: Request, topics: Optional[str] = Query(None, description="Comma-separated: status,capabilities,resources,health")):
+    """
+    Live server changes over Server-Sent Events: a snapshot of every server's status, then
+    coalesced status/capabilities/resources/health events as they happen (no polling needed).
+    """
+    try:
+        topic_filter = parse_topics(topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = process_manager.events.subscribe(topic_filter) # Before the snapshot, so no change falls in between
+    return StreamingResponse(
+        sse_server_events(subscription, server_orchestrator.status_all()["payload"], is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/servers/events/stats")
+async def server_events_stats():
+    """Event bus counters and per-subscriber delivered/coalesced/dropped counts"""
+    return process_manager.events.snapshot()
+
+@app.websocket("/ws/servers/events")
+async def websocket_server_events(websocket: WebSocket, topics: Optional[str] = None):
+    """WebSocket variant of /api/servers/events: {"type": "snapshot"} first, then {"type": "events"} batches."""
+    await websocket.accept()
+    try:
+        topic_filter = parse_topics(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
+    subscription = process_manager.events.subscribe(topic_filter)
+
+    async def push_events():
+        await websocket.send_json({"type": "snapshot", "data": server_orchestrator.status_all()["payload"]})
+        while True:
+            events = await subscription.next_batch(timeout=15.0)
+            if events:
+                await websocket.send_json({"type": "events", "events": [encode_event(event) for event in events]})
+            else:
+                await websocket.send_json({"type": "keep-alive"})
+
+    sender = asyncio.create_task(push_events())
+    try:
+        while True: # Only here to notice the disconnect; clients don't send anything
+            receive = asyncio.create_task(websocket.receive())
+            await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+            if sender.done() or receive.result()["type"] == "websocket.disconnect":
+                receive.cancel()
+                break
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        subscription.close()
+
+@app.get("/api/servers/{server_name}/logs")
+async def server_logs(server_name: str, request: Request, tail: int = Query(200, ge=0, le=5000),
+                      offset: Optional[int] = Query(None, ge=0), limit: int = Query(500, ge=1, le=5000),
+                      stream: Optional[str] = Query(None, pattern="^(stdout|stderr|system)$"), follow: bool = Query(False)):
+    """
+    Captured stdout/stderr of a server. Without offset, the last `tail` lines; with offset,
+    up to `limit` lines after it (use next_offset to page). follow=true streams new lines over
+    Server-Sent Events, resuming from Last-Event-ID on reconnect.
+    """
+    log_buffer = server_log_registry.get(server_name)
+    if log_buffer is None:
+        if not config_manager.get_tool_server_config(server_name):
+            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+        log_buffer = server_log_registry.get_or_create(server_name) # Not started yet: empty, but followable
+    if follow:
+        if offset is None:
+            try:
+                offset = int(request.headers["last-event-id"])
+            except (KeyError, ValueError):
+                offset = max(log_buffer.last_offset - tail, 0)
+        return StreamingResponse(
+            sse_log_events(log_buffer, offset, stream=stream, is_disconnected=request.is_disconnected),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    if offset is None:
+        lines, gap = log_buffer.tail(tail, stream=stream), False
+        next_offset = log_buffer.last_offset
+    else:
+        lines, gap = log_buffer.lines_after(offset, limit, stream=stream)
+        # A short page means everything up to last_offset was scanned
+        next_offset = lines[-1][0] if len(lines) >= limit else max(log_buffer.last_offset, offset)
+    return {
+        "server_name": server_name,
+        "lines": [format_line(line) for line in lines],
+        "next_offset": next_offset,
+        "gap": gap, # Lines after `offset` were already evicted from the ring buffer
+        **log_buffer.info(),
+    }
+
 @app.post("/api/servers/{server_name}/refresh-capabilities", response_model=ServerStatusResponse)
 async def refresh_server_capabilities(server_name: str):
     logger.info(f"API: POST /api/servers/{server_name}/refresh-capabilities for server '{server_name}'")
@@ -477,7 +690,8 @@ async def refresh_server_capabilities(server_name: str):
             detail=f"Exception during refresh: {str(e)}. Current server status: {status_info_on_error.get('status')}"
         )
 
-from mcp_web_app.utils.chat import chat_bot_invoke, websocket_chat_stream_handler
+from mcp_web_app.utils.chat import chat_bot_invoke, websocket_chat_stream_handler, sse_stream_events, StreamProtocol
+from mcp_web_app.utils.stream_buffer import stream_registry
 
 @app.post("/api/chat_bot", response_model=ChatResponse)
 async def chat_bot(request: ChatRequest):
@@ -549,33 +763,31 @@ async def check_env_variables():
     else:
         api_key_preview = None
     
-    # Check if we're using a fallback model 
+    # Check circuit breaker state of the LLM configs
     agent_service = app.state.agent_service
     llm_status = "ok"
     fallback_info = None
     error_details = None
+    llm_health = []
     
     if agent_service:
         # Get error details if available
         if hasattr(agent_service, '_error_details') and agent_service._error_details:
             error_details = agent_service._error_details
         
-        # Check fallback model status
-        if hasattr(agent_service, '_fallback_model_used'):
-            if agent_service._fallback_model_used == "ollama":
-                llm_status = "fallback_ollama"
-                fallback_info = {
-                    "provider": "ollama",
-                    "message": "Using Ollama as fallback. DeepSeek API key is invalid or missing.",
-                    "error_details": error_details
-                }
-            elif agent_service._fallback_model_used == "mock":
-                llm_status = "fallback_mock"
-                fallback_info = {
-                    "provider": "mock",
-                    "message": "Using mock LLM. Both DeepSeek and Ollama are unavailable.",
-                    "error_details": error_details
-                }
+        llm_health = agent_service.llm_health.snapshot()
+        default_config_id = agent_service._resolve_llm_config_id()
+        routed_config_id = agent_service._route_llm_config_id(default_config_id)
+        default_health = next((health for health in llm_health if health["config_id"] == default_config_id), None)
+        if default_health and default_health["state"] != BreakerState.CLOSED:
+            llm_status = "fallback" if routed_config_id != default_config_id else "degraded"
+            fallback_info = {
+                "provider": routed_config_id,
+                "message": (f"LLM config '{default_config_id}' circuit is {default_health['state']}; "
+                            + (f"routing to fallback '{routed_config_id}'." if routed_config_id != default_config_id
+                               else "no healthy fallback configured, still using it.")),
+                "error_details": default_health["last_error"] or error_details
+            }
         
         # If no LLM is available at all
         if not agent_service.llm:
@@ -606,7 +818,8 @@ async def check_env_variables():
                 "preview": api_key_preview if api_key_status == "present" else None
             }
         },
-        "error_details": error_details
+        "error_details": error_details,
+        "llm_health": llm_health
     } 
 
 @app.get("/api/healthcheck")
@@ -614,6 +827,50 @@ async def healthcheck():
     """Health check endpoint specifically for frontend connection testing"""
     return {"status": "ok", "message": "API is healthy"}
 
+@app.get("/api/llm-hedging-stats")
+async def llm_hedging_stats():
+    """Hedged LLM request counters: hedge fraction, budget denials and primary/secondary wins."""
+    return {"hedging": get_hedging_stats()}
+
+@app.get("/api/ollama/residency")
+async def ollama_residency():
+    """Which configured Ollama models are loaded, with keep_alive and last load time per model."""
+    return ollama_residency_manager.snapshot()
+
+@app.post("/api/ollama/residency/{config_id}/preload")
+async def preload_ollama_model(config_id: str, force: bool = False):
+    """Load the model of an Ollama LLM config now (force=true ignores the per-host residency limit)."""
+    llm_config = next((config for config in config_manager.get_llm_configs() if config.config_id == config_id), None)
+    if not llm_config or llm_config.provider != "ollama" or not llm_config.ollama_config:
+        raise HTTPException(status_code=404, detail=f"Ollama LLM config '{config_id}' not found.")
+    await ollama_residency_manager.refresh()
+    return await ollama_residency_manager.preload(llm_config.ollama_config.base_url, llm_config.ollama_config.model, force=force)
+
+@app.get("/api/http-client-stats")
+async def http_client_stats():
+    """Pooled outbound HTTP clients (per origin) and their pool limits"""
+    return http_client_registry.stats()
+
+@app.get("/api/chat-model-cache-stats")
+async def chat_model_cache_stats():
+    """Hits/misses of the per-config chat model instance cache"""
+    return chat_model_cache.stats()
+
+@app.get("/api/usage")
+async def token_usage(session_id: Optional[str] = None):
+    """Token usage per LLM config and per turn kind (tools vs plain); ?session_id= for one session"""
+    if session_id:
+        usage = usage_ledger.session_usage(session_id)
+        if usage is None:
+            raise HTTPException(status_code=404, detail=f"No token usage recorded for session '{session_id}'.")
+        return usage
+    return usage_ledger.snapshot()
+
+@app.get("/api/logging-stats")
+async def logging_stats():
+    """Background log queue depth and hot-path sampling counters"""
+    return get_logging_stats()
+
 # Add a new class for the active tools request
 class ActiveToolsRequest(BaseModel):
     active_tools_config: Dict[str, List[Dict[str, Any]]]
@@ -657,6 +914,32 @@ async def test_websocket_endpoint_info(request: Request):
         "instructions": "Connect to this WebSocket endpoint to test WebSocket functionality. Messages sent to this endpoint will be echoed back."
     }
 
+@app.get("/api/streams")
+async def list_streams():
+    """List resumable chat streams still held in the ring buffer registry."""
+    return {"streams": stream_registry.list_streams()}
+
+@app.get("/api/streams/{stream_id}/events")
+async def stream_events_sse(stream_id: str, request: Request, last_offset: Optional[int] = Query(None),
+                            protocol: Optional[int] = Query(None)):
+    """
+    Resume (or follow) a chat stream over Server-Sent Events.
+    The offset comes from the Last-Event-ID header (automatic browser reconnects) or ?last_offset=.
+    """
+    record = stream_registry.get(stream_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Stream '{stream_id}' not found or expired.")
+    if last_offset is None:
+        try:
+            last_offset = int(request.headers.get("last-event-id") or 0)
+        except ValueError:
+            last_offset = 0
+    return StreamingResponse(
+        sse_stream_events(record, max(last_offset, 0), protocol_version=StreamProtocol.negotiate(protocol)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.websocket("/ws/chat")
 async def websocket_chat_endpoint(websocket: WebSocket):
     """
@@ -724,9 +1007,16 @@ async def websocket_chat_endpoint(websocket: WebSocket):
             llm_config_id = data.get("llm_config_id")
             agent_mode = data.get("agent_mode", "chat")
             agent_data_source = data.get("agent_data_source")
+            # Per-connection event verbosity: message field wins over the ?verbosity= query param
+            event_verbosity = data.get("event_verbosity") or websocket.query_params.get("verbosity")
+            # Stream protocol: 1 = legacy (answer repeated at the end), 2 = delta-only
+            protocol_version = data.get("protocol_version") or websocket.query_params.get("protocol")
+            # Resuming an interrupted stream: {"resume_stream_id": ..., "last_offset": n}, no prompt needed
+            resume_stream_id = data.get("resume_stream_id") or websocket.query_params.get("resume_stream_id")
+            last_offset = data.get("last_offset", websocket.query_params.get("last_offset", 0))
             
             # Validate the prompt
-            if not prompt or not prompt.strip():
+            if not resume_stream_id and (not prompt or not prompt.strip()):
                 logger.warning(f"WS session {session_id}: Empty prompt received")
                 await websocket.send_json({
                     "type": "error_event",
@@ -744,7 +1034,11 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                 "tools_config": tools_config,
                 "llm_config_id": llm_config_id,
                 "agent_mode": agent_mode,
-                "agent_data_source": agent_data_source
+                "agent_data_source": agent_data_source,
+                "event_verbosity": event_verbosity,
+                "protocol_version": protocol_version,
+                "resume_stream_id": resume_stream_id,
+                "last_offset": last_offset
             }
             
             # Inform the client that processing is starting
@@ -895,7 +1189,7 @@ def load_all_llm_configs() -> list:
 app = FastAPI(title="MCP LLM API - Modular Config & Streaming")
 
 # CORS Middleware (ensure it's correctly set up)
-origins = [ "http://localhost:5173", /* other origins */ ]
+origins = [ "http://localhost:5173", ] # other origins
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -921,7 +1215,13 @@ from .config_manager import (
     llm_config_router,
     LLMConfigManager,
     LLMConfig as LLMConfigModel,
+    llm_manager_instance as llm_config_manager, # Shared with the /llm_configs router (one cache)
 )
+from mcp_web_app.services.chat_model_cache import chat_model_cache
+from mcp_web_app.utils.flush_policy import coalesce_text_stream
+from mcp_web_app.utils.token_utils import UsageMeteringCallbackHandler, usage_ledger, warm_tokenizer
+
+llm_config_manager.add_change_listener(chat_model_cache.invalidate) # Edited configs get fresh model instances
 
 # --- Event Handlers ---
 @app.on_event("startup")
@@ -930,6 +1230,25 @@ async def on_app_startup():
     print("Application starting up...")
     await config_manager.ensure_default_ericai_configs_on_startup()
     print("Default EricAI config check complete.")
+    process_manager.prime_capabilities_from_cache(config_manager.get_all_tool_server_configs()) # Tools known at boot
+    server_supervisor.start() # Probe running MCP servers and restart crashed ones
+    resource_sampler.start() # Per-server CPU/RSS/FD accounting and soft limits
+    standby_pool_manager.start(config_manager) # Pre-warm standby instances of servers that configure a pool
+    ollama_residency_manager.start(config_manager) # Keep hot Ollama models loaded
+    asyncio.get_running_loop().run_in_executor(None, warm_tokenizer) # Off the event loop; usage estimates need it
+
+@app.on_event("shutdown")
+async def on_app_shutdown():
+    """Tasks to run on application shutdown."""
+    logger.info("Application shutting down...")
+    await server_supervisor.stop() # Before servers go down, so their exits aren't treated as crashes
+    await resource_sampler.stop()
+    # Managed servers, session MCP clients and standby instances go down together under one deadline
+    await shutdown_servers_and_clients(process_manager, agent_service, standby_pool_manager)
+    await llm_health_tracker.stop()
+    await ollama_residency_manager.stop()
+    await http_client_registry.aclose() # Pooled outbound HTTP connections
+    shutdown_logging() # Flush the background log writer last
 
 # Include the LLM config CRUD router
 app.include_router(llm_config_router)
@@ -946,10 +1265,10 @@ async def get_predefined_ericai_model_names():
 # GET /ericai_models (List of configured EricAI services for chat dropdown - no change)
 @app.get("/ericai_models", response_model=EricAIModelsResponse, tags=["EricAI Chat"])
 async def get_ericai_display_models_from_manager():
-    all_configs = await llm_config_manager.get_all_llm_configs()
+    ericai_configs = await llm_config_manager.get_llm_configs_by_provider("ericai")
     ericai_configs_list = [
         EricAIModelInfo(config_id=cfg.config_id, display_name=cfg.display_name)
-        for cfg in all_configs if cfg.provider == "ericai"
+        for cfg in ericai_configs
     ]
     return EricAIModelsResponse(models=ericai_configs_list)
 
@@ -966,28 +1285,31 @@ async def ericai_streaming_chat_from_manager(request: EricAIChatRequest):
 
         model_name = model_config_pydantic.model_name_or_path
         base_url = model_config_pydantic.base_url
-        temperature = model_config_pydantic.temperature
-        max_tokens = model_config_pydantic.max_tokens
         api_key = model_config_pydantic.api_key
 
         if not model_name: raise HTTPException(status_code=500, detail=f"Config '{request.config_id}': 'model_name_or_path' missing.")
         if not base_url: raise HTTPException(status_code=500, detail=f"Config '{request.config_id}': 'base_url' missing.")
         if not api_key: raise HTTPException(status_code=500, detail=f"Config '{request.config_id}': 'api_key' missing.")
 
-        llm = ChatOpenAI( model=model_name, temperature=temperature if temperature is not None else 0.7, max_tokens=max_tokens if max_tokens is not None and max_tokens > 0 else None, openai_api_base=base_url, openai_api_key=api_key, streaming=True,)
+        # Built from cfg (the config hashed into the cache key), not from the locals above
+        llm = chat_model_cache.get_or_create(model_config_pydantic, lambda cfg: ChatOpenAI( model=cfg.model_name_or_path, temperature=cfg.temperature if cfg.temperature is not None else 0.7, max_tokens=cfg.max_tokens if cfg.max_tokens is not None and cfg.max_tokens > 0 else None, openai_api_base=cfg.base_url, openai_api_key=cfg.api_key, streaming=True, stream_usage=True, http_client=get_sync_client(cfg.base_url), http_async_client=get_async_client(cfg.base_url),))
     except HTTPException as http_exc: raise http_exc
     except Exception as e:
         print(f"Error setting up LLM stream for config {request.config_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to initialize LLM stream: {str(e)}")
 
     async def stream_generator():
+        usage_meter = UsageMeteringCallbackHandler(config_id=request.config_id)
         try:
-            async for chunk in llm.astream(request.message):
-                content = chunk.content
-                if content: yield f"data: {json.dumps({'chunk': content})}\n\n"; await asyncio.sleep(0.01)
+            # Coalesce bursts into fewer frames instead of sleeping per chunk (provider-speed streaming)
+            async for content in coalesce_text_stream(chunk.content async for chunk in llm.astream(request.message, config={"callbacks": [usage_meter]})):
+                yield f"data: {json.dumps({'chunk': content})}\n\n"
+            yield f"data: {json.dumps({'usage': usage_meter.finish()})}\n\n"
         except Exception as e:
             print(f"Error during EricAI stream (Config ID: {request.config_id}): {e}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            usage_meter.finish(failed=True) # Failed or cancelled turns are recorded too (no-op if already recorded)
     return StreamingResponse(stream_generator(), media_type="text/event-stream")
 
 # Root endpoint
@@ -1009,5 +1331,8 @@ if __name__ == "__main__":
     # Example: uvicorn mcp_web_app.main:asgi_app --reload --port args.port --host args.host
     
     logger.info(f"Starting server on {args.host}:{args.port} with reload: {args.reload}")
+    # Agent sessions reach the MCP gateway on this app; the app module is (re)imported by uvicorn and reads this
+    gateway_host = "127.0.0.1" if args.host in ("0.0.0.0", "::", "") else args.host
+    os.environ.setdefault("MCP_GATEWAY_BASE_URL", f"http://{f'[{gateway_host}]' if ':' in gateway_host else gateway_host}:{args.port}")
     # When using app.mount, Uvicorn should run the main FastAPI 'app'
     uvicorn.run("mcp_web_app.main:app", host=args.host, port=args.port, reload=args.reload, log_level="info") 
\ No newline at end of file
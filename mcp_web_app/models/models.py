@@ -1,6 +1,18 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any, Union
 
+class StandbyPoolConfig(BaseModel):
+    min_idle: int = Field(0, ge=0) # Initialized instances kept ready for new agent sessions
+    max_total: int = Field(0, ge=0) # Cap on this pool's running instances (idle + warming + leased); 0 means no cap
+    idle_ttl_seconds: float = Field(300.0, gt=0) # Extra idle instances from a burst are closed after this long
+
+class ResourceLimitsConfig(BaseModel):
+    max_rss_mb: Optional[float] = None # Resident memory of the server's whole process tree
+    max_cpu_percent: Optional[float] = None # 100 = one core
+    max_fds: Optional[int] = None
+    sustained_samples: int = Field(3, ge=1) # Consecutive samples over a limit before acting
+    action: str = Field("alert", pattern="^(alert|restart)$")
+
 class ServerConfig(BaseModel):
     name: str
     description: str
@@ -11,6 +23,10 @@ class ServerConfig(BaseModel):
     url: Optional[str] = None  # For SSE, HTTP-based transports
     cwd: Optional[str] = None  # For stdio transport if a specific CWD is needed
     env: Optional[Dict[str, str]] = {}  # Environment variables for the server
+    speculative_tools: bool = False # Start this server's tools before the LLM finishes; only for servers whose tools have no side effects
+    standby: Optional[StandbyPoolConfig] = None # Pre-warmed stdio instances leased to new agent sessions
+    resource_limits: Optional[ResourceLimitsConfig] = None # Soft limits checked by the resource sampler
+    depends_on: List[str] = [] # Servers that must be up first (bulk start/restart ordering)
     # This might become obsolete if langchain-mcp-adapters discovers tools directly
     # shell: bool = True # Removed
     # Add other fields from your TypeScript ServerConfig as needed
@@ -22,6 +38,16 @@ class ServerStatusResponse(BaseModel):
     message: Optional[str] = None
     pid: Optional[int] = None 
     discovered_capabilities: Optional[List[Any]] = None
+    capabilities_source: Optional[str] = None # "cache" (last known, launch fingerprint unchanged) or "live"
+    mcp_session: Optional[Dict[str, Any]] = None # Long-lived MCP session over the process pipes
+    health: Optional[Dict[str, Any]] = None # Supervisor view: probe latency, failures, restarts, crash loop
+    resources: Optional[Dict[str, Any]] = None # CPU, RSS, FDs of the server's process tree (rolling window)
+    launch: Optional[Dict[str, Any]] = None # npx/uvx servers: original vs resolved launch, spawn-to-ready latency
+
+class BulkServerRequest(BaseModel):
+    servers: Optional[List[str]] = None # None: every configured server (start) or every running one (stop/restart)
+    concurrency: int = Field(4, ge=1, le=32)
+    respect_dependencies: bool = True # Start depends_on first (pulling them in), stop dependents first
 
 # --- Added Chat Models ---
 class ChatRequest(BaseModel):
@@ -39,6 +65,8 @@ class StreamChatRequest(BaseModel):
     llm_config_id: Optional[str] = None # Added field for LLM selection
     agent_mode: Optional[str] = None # Added field for agent mode
     agent_data_source: Optional[Union[str, Dict]] = None # Added field for agent data source
+    event_verbosity: Optional[str] = None # 'tokens_only', 'summary' or 'debug'
+    protocol_version: Optional[int] = None # 1 = legacy (default), 2 = delta-only final frame
 
 # For creating a new server config
 class CreateServerConfigRequest(BaseModel):
@@ -64,6 +92,9 @@ class OllamaConfig(BaseModel):
     base_url: str = "http://localhost:11434"
     model: str # e.g., "llama3:8b", "mistral"
     temperature: float = 0.7
+    keep_alive: Optional[Union[str, int]] = None # How long Ollama keeps the model loaded, e.g. "30m" or -1 (forever)
+    preload: bool = False # Keep this model resident even before it is first used
+    max_resident_models: Optional[int] = None # Per-host cap on models kept loaded (shared GPU box)
     # Add other Ollama-specific options here if needed, like num_ctx, top_k, top_p etc.
     # Example: options: Optional[Dict[str, Any]] = None 
 
@@ -73,6 +104,11 @@ class DeepSeekConfig(BaseModel):
     api_key: Optional[str] = None
     # Add other DeepSeek-specific options here if needed
 
+class HedgingPolicy(BaseModel):
+    secondary_config_id: str # LLM config raced against this one when the first token is slow
+    first_token_timeout_ms: int = 2000 # Start the secondary if no token arrived by then
+    max_hedge_fraction: float = 0.1 # Budget: at most this fraction of requests may be hedged
+
 class LLMConfig(BaseModel):
     config_id: str # Unique identifier, e.g., "ollama_local_llama3"
     provider: str # e.g., "ollama", "openai", "deepseek"
@@ -82,4 +118,6 @@ class LLMConfig(BaseModel):
     # Add other provider configs here as needed, e.g.:
     # openai_config: Optional[OpenAIConfig] = None
     api_key_env_var: Optional[str] = None # e.g., "OPENAI_API_KEY", "DEEPSEEK_API_KEY"
-    is_default: Optional[bool] = False 
\ No newline at end of file
+    is_default: Optional[bool] = False
+    hedging: Optional[HedgingPolicy] = None # Optional tail-latency hedging to a secondary config
+    fallback_config_ids: List[str] = [] # Tried in order while this config's circuit breaker is open 
\ No newline at end of file
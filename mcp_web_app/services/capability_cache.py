@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mcp import types
+
+logger = logging.getLogger(__name__)
+
+CAPABILITY_CACHE_PATH = Path(os.getenv("MCP_CAPABILITY_CACHE_PATH", str(Path(__file__).parent.parent / "capability_cache.json")))
+
+def _file_stamp(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Identity of an executable or script on disk (reinstalls and upgrades change it)."""
+    if not path:
+        return None
+    try:
+        real_path = os.path.realpath(path)
+        st = os.stat(real_path)
+    except OSError:
+        return None
+    return {"path": real_path, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+def _script_path(arg: str, cwd: Optional[str]) -> str:
+    return os.path.join(cwd, arg) if cwd and not os.path.isabs(arg) else arg
+
+def launch_fingerprint(config: Any) -> str:
+    """
+    Hash of everything that determines which tools a server exposes: command, args, cwd, env
+    and the resolved executable (plus any script passed as an argument) as found on disk.
+    Package specs pinned in args (e.g. npx pkg@1.2.3) are covered by the args themselves.
+    """
+    args = list(getattr(config, "args", None) or [])
+    cwd = getattr(config, "cwd", None)
+    launch = {
+        "command": config.command,
+        "args": args,
+        "cwd": cwd,
+        "env": dict(sorted((getattr(config, "env", None) or {}).items())),
+        "shell": bool(getattr(config, "shell", False)),
+        "executable": _file_stamp(shutil.which(config.command) or config.command),
+        "scripts": {arg: _file_stamp(path) for arg, path in ((arg, _script_path(arg, cwd)) for arg in args) if os.path.isfile(path)},
+    }
+    return hashlib.sha256(json.dumps(launch, sort_keys=True).encode("utf-8")).hexdigest()
+
+class CapabilityCache:
+    """
+    On-disk cache of each server's tools/list result, keyed by its launch fingerprint.
+
+    Entries survive restarts of the web app, so server status (and the tool pickers built on it)
+    can answer at boot before any server has been started or re-discovered. An entry is only
+    returned while the fingerprint matches; a tools/list_changed notification drops it.
+    """
+
+    def __init__(self, path: Path = CAPABILITY_CACHE_PATH):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable capability cache {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path) # Atomic: a crash never leaves a half-written cache
+        except OSError as e:
+            logger.error(f"Failed to write capability cache {self.path}: {e}")
+
+    def get(self, server_id: str, fingerprint: str) -> Optional[List[types.Tool]]:
+        entry = self._entries.get(server_id)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        try:
+            return [types.Tool.model_validate(tool) for tool in entry.get("tools", [])]
+        except Exception as e:
+            logger.warning(f"Dropping invalid capability cache entry for {server_id}: {e}")
+            self.invalidate(server_id)
+            return None
+
+    def put(self, server_id: str, fingerprint: str, tools: List[types.Tool]) -> None:
+        serialized = [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+        entry = self._entries.get(server_id)
+        if entry and entry.get("fingerprint") == fingerprint and entry.get("tools") == serialized:
+            entry["discovered_at"] = time.time() # Revalidated, unchanged: no need to rewrite tools
+        else:
+            self._entries[server_id] = {"fingerprint": fingerprint, "tools": serialized, "discovered_at": time.time()}
+        self._save()
+
+    def invalidate(self, server_id: str) -> None:
+        if self._entries.pop(server_id, None) is not None:
+            logger.info(f"Capability cache entry for {server_id} invalidated.")
+            self._save()
@@ -0,0 +1,55 @@
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL_CACHE_SIZE = int(os.getenv("MCP_CHAT_MODEL_CACHE_SIZE", "32"))
+
+def config_content_hash(config: Any) -> str:
+    """Hash of everything in a (pydantic) LLM config that affects the model instance."""
+    return hashlib.sha256(config.model_dump_json().encode("utf-8")).hexdigest()
+
+class ChatModelCache:
+    """
+    LRU of chat model instances per LLM config_id, tagged with the config's content hash.
+
+    A lookup whose hash differs from the cached one (the config was edited, even by hand
+    in the JSON file) rebuilds the instance; writes through the /llm_configs router drop
+    the cache outright.
+    """
+
+    def __init__(self, max_size: int = CHAT_MODEL_CACHE_SIZE):
+        self.max_size = max_size
+        self._models: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, config: Any, factory: Callable[[Any], Any]) -> Any:
+        content_hash = config_content_hash(config)
+        cached = self._models.get(config.config_id)
+        if cached is not None and cached[0] == content_hash:
+            self._models.move_to_end(config.config_id)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        model = factory(config)
+        self._models[config.config_id] = (content_hash, model)
+        self._models.move_to_end(config.config_id)
+        while len(self._models) > self.max_size:
+            self._models.popitem(last=False)
+        logger.info(f"Created chat model instance for LLM config '{config.config_id}'.")
+        return model
+
+    def invalidate(self, config_id: Optional[str] = None) -> None:
+        if config_id is None:
+            self._models.clear()
+        else:
+            self._models.pop(config_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached_models": len(self._models), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+chat_model_cache = ChatModelCache()
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+# Topics published about managed servers
+EVENT_TOPICS = ("status", "capabilities", "resources", "health")
+# A subscriber wakes at most this often; changes within the window are merged into one batch
+EVENT_COALESCE_WINDOW_SECONDS = float(os.getenv("MCP_EVENT_COALESCE_WINDOW_SECONDS", "0.25"))
+# Distinct (topic, server) entries a slow subscriber may have pending before the oldest are dropped
+EVENT_SUBSCRIBER_MAX_PENDING = int(os.getenv("MCP_EVENT_SUBSCRIBER_MAX_PENDING", "1000"))
+
+class EventSubscription:
+    """
+    One subscriber's pending events, coalesced by (topic, server_id): only the latest status,
+    capabilities, resource sample or health of each server is kept until the subscriber reads
+    it, so a slow dashboard costs bounded memory and never sees stale intermediate states.
+    """
+
+    def __init__(self, bus: "EventBus", topics: Optional[Set[str]] = None, max_pending: int = EVENT_SUBSCRIBER_MAX_PENDING):
+        self._bus = bus
+        self.topics = topics # None: every topic
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.coalesced = 0 # Events replaced by a newer one for the same server before delivery
+        self.dropped = 0
+        self.created_at = time.time()
+
+    def accepts(self, topic: str) -> bool:
+        return self.topics is None or topic in self.topics
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        key = (event["topic"], event["server_id"])
+        if key in self._pending:
+            del self._pending[key] # Re-inserted at the end so batches stay in publish order
+            self.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = event
+        self._ready.set()
+
+    async def next_batch(self, timeout: float, window: float = EVENT_COALESCE_WINDOW_SECONDS) -> List[Dict[str, Any]]:
+        """Pending events in publish order (waits up to `timeout` for the first; [] if none came)."""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+            if window > 0:
+                await asyncio.sleep(window) # Let a burst (e.g. start-all) collapse into one batch
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        self.delivered += len(events)
+        return events
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "topics": sorted(self.topics) if self.topics is not None else None,
+            "pending": len(self._pending),
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "connected_seconds": round(time.time() - self.created_at, 1),
+        }
+
+class EventBus:
+    """
+    In-process fan-out of server state changes to live subscribers (dashboards over SSE or
+    WebSocket). publish() is synchronous and never blocks the publisher: it only records the
+    event in each subscriber's coalescing buffer. Without subscribers it does nothing.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[EventSubscription] = set()
+        self._seq = 0
+        self.published: Dict[str, int] = {}
+
+    def publish(self, topic: str, server_id: str, data: Any) -> None:
+        self.published[topic] = self.published.get(topic, 0) + 1
+        if not self._subscribers:
+            return
+        self._seq += 1
+        event = {"seq": self._seq, "ts": time.time(), "topic": topic, "server_id": server_id, "data": data}
+        for subscription in self._subscribers:
+            if subscription.accepts(topic):
+                subscription.offer(event)
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> EventSubscription:
+        subscription = EventSubscription(self, set(topics) if topics is not None else None)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "seq": self._seq,
+            "published": dict(self.published),
+            "subscribers": [subscription.info() for subscription in self._subscribers],
+        }
+
+server_event_bus = EventBus()
+
+def parse_topics(value: Optional[str]) -> Optional[Set[str]]:
+    """Comma-separated topic filter from a query string; None means every topic."""
+    if not value:
+        return None
+    topics = {topic.strip() for topic in value.split(",") if topic.strip()}
+    unknown = topics - set(EVENT_TOPICS)
+    if unknown:
+        raise ValueError(f"Unknown event topics {sorted(unknown)}; expected some of {list(EVENT_TOPICS)}")
+    return topics
+
+def encode_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    # Encoded per delivery, not per publish: nothing is serialized while nobody listens
+    return jsonable_encoder(event)
+
+async def sse_server_events(subscription: EventSubscription, snapshot: Dict[str, Any],
+                            is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                            keepalive_seconds: float = 15.0) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: a full snapshot first, then coalesced change events (the bus sequence
+    number is the SSE id). Reconnecting clients get a fresh snapshot rather than a replay.
+    """
+    try:
+        yield f"event: snapshot\ndata: {json.dumps(jsonable_encoder(snapshot), ensure_ascii=False)}\n\n"
+        while True:
+            events = await subscription.next_batch(timeout=keepalive_seconds)
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['topic']}\ndata: {json.dumps(encode_event(event), ensure_ascii=False)}\n\n"
+            if is_disconnected is not None and await is_disconnected():
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+    finally:
+        subscription.close()
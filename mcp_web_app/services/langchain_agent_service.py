@@ -26,6 +26,7 @@ from langchain_core.callbacks.base import BaseCallbackHandler
 from langchain_core.outputs import LLMResult, ChatGenerationChunk, GenerationChunk
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.language_models.chat_models import BaseChatModel
 
 # Consolidate runnables imports
 from langchain_core.runnables import (
@@ -38,7 +39,6 @@ from langchain_core.runnables import (
 
 from langchain.agents.output_parsers.react_single_input import ReActSingleInputOutputParser
 
-from langchain import hub
 
 from langchain_deepseek import ChatDeepSeek # Add DeepSeek
 from langchain_community.chat_models import ChatOllama # Added for Ollama
@@ -55,12 +55,24 @@ from langchain_community.chat_message_histories import ChatMessageHistory
 from ..utils.io import load_json_or_yaml
 from ..utils.llm import get_fast_response
 from ..utils.session import needs_session_recreation, create_new_session_dict
+from ..utils.logging_pipeline import hot_path
+from .llm_hedging import HedgedChatModel
+from .llm_health import llm_health_tracker, LLMHealthCallbackHandler
+from .ollama_residency import ollama_residency_manager
+from .mcp_standby_pool import standby_pool_manager
+from ..utils.speculative_tools import SpeculativeToolDispatcher, current_dispatcher, enable_speculative_dispatch
+from ..utils.http_clients import get_async_client, get_sync_client
+from ..utils.token_utils import UsageMeteringCallbackHandler
+from ..utils.prompt_assembly import build_react_prompt, build_tools_agent_prompt, canonical_tools, prompt_prefix_fingerprint
 
 # Explicitly load .env from the project root
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
 if os.path.exists(dotenv_path):
     load_dotenv(dotenv_path=dotenv_path)
 
+# ChatDeepSeek's default endpoint (its api_base field), used to pick the pooled HTTP client
+DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
+
 # Define a simple streaming callback handler for LLM
 class StreamingCallback(BaseCallbackHandler):
     def __init__(self, output_stream_fn):
@@ -216,8 +228,13 @@ class LangchainAgentService:
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager # Use the passed-in ConfigManager
         self._llm_cache: Dict[str, Any] = {}
+        self._hedged_llm_cache: Dict[str, HedgedChatModel] = {} # config_id -> hedging wrapper around the cached LLM
+        # Per-config error rate / latency and circuit breakers; probes reopen or close tripped configs
+        self.llm_health = llm_health_tracker
+        self.llm_health.set_probe(self._probe_llm_config)
         self.llm = None # Default LLM instance, to be loaded by _get_llm
         self.globally_active_tools: Optional[Dict[str, List[Dict[str, Any]]]] = None # This might need to be populated from ConfigManager tool server configs
+        self.mcp_gateway = None # Set by the app: stdio servers are reached through the managed processes instead of spawned
         
         # Initial LLM loading can be triggered here if needed, or lazily via _get_llm
         try:
@@ -260,7 +277,26 @@ class LangchainAgentService:
         # or have sessions check this global config when they are next used.
         # For now, it just updates the property.
 
-    async def _get_llm(self, llm_config_id: Optional[str] = None) -> Any:
+    async def _with_hedging(self, config_id: str, llm: Any) -> Any:
+        """Wrap llm in a HedgedChatModel if its config has a hedging policy."""
+        llm_config = next((config for config in self.config_manager.get_llm_configs() if config.config_id == config_id), None)
+        policy = llm_config.hedging if llm_config else None
+        if not policy or not policy.secondary_config_id or policy.secondary_config_id == config_id:
+            return llm
+        cached = self._hedged_llm_cache.get(config_id)
+        if cached is not None and cached.primary is llm and cached.policy == policy:
+            return cached
+        secondary = await self._get_llm(policy.secondary_config_id, allow_hedging=False, route=False, set_current=False)
+        if not isinstance(llm, BaseChatModel) or not isinstance(secondary, BaseChatModel):
+            logger.warning(f"Hedging for '{config_id}' disabled: primary and secondary '{policy.secondary_config_id}' must both be chat models.")
+            return llm
+        hedged = HedgedChatModel(primary=llm, secondary=secondary, policy=policy, config_id=config_id)
+        self._hedged_llm_cache[config_id] = hedged
+        logger.info(f"LLM '{config_id}' hedges to '{policy.secondary_config_id}' after {policy.first_token_timeout_ms}ms (max fraction {policy.max_hedge_fraction}).")
+        return hedged
+
+    def _resolve_llm_config_id(self, llm_config_id: Optional[str] = None) -> Optional[str]:
+        """The explicit config ID, else the default config, else the first configured one."""
         llm_config_manager = self.config_manager
 
         # Try to get the llm_config_id based on provided ID or default
@@ -283,11 +319,46 @@ class LangchainAgentService:
                 else:
                     logger.error("No LLM configs found. Unable to initialize an LLM.")
                     return None
+        return effective_llm_config_id
+
+    def _route_llm_config_id(self, config_id: Optional[str]) -> Optional[str]:
+        """Route around LLM configs whose circuit breaker is open, following their fallback chain."""
+        if not config_id:
+            return config_id
+        llm_config = next((config for config in self.config_manager.get_llm_configs() if config.config_id == config_id), None)
+        fallback_chain = llm_config.fallback_config_ids if llm_config and llm_config.fallback_config_ids else []
+        return self.llm_health.select(config_id, fallback_chain)
+
+    def _touch_ollama_model(self, config_id: Optional[str]) -> None:
+        """Mark an Ollama model as in use so the residency manager keeps it loaded."""
+        llm_config = next((config for config in self.config_manager.get_llm_configs() if config.config_id == config_id), None) if config_id else None
+        if llm_config and llm_config.provider == "ollama" and llm_config.ollama_config:
+            ollama_residency_manager.touch(llm_config.ollama_config.base_url, llm_config.ollama_config.model)
+
+    async def _probe_llm_config(self, config_id: str) -> None:
+        """Half-open probe: a minimal request straight against this config (no hedging or routing)."""
+        llm = await self._get_llm(config_id, allow_hedging=False, route=False, set_current=False)
+        if llm is None:
+            raise RuntimeError(f"LLM config '{config_id}' could not be instantiated")
+        await llm.ainvoke("ping")
+
+    async def _get_llm(self, llm_config_id: Optional[str] = None, allow_hedging: bool = True, route: bool = True,
+                       set_current: bool = True) -> Any:
+        """LLM for a config (cached); set_current=False leaves self.llm alone (e.g. for breaker probes)."""
+        llm_config_manager = self.config_manager
+        effective_llm_config_id = self._resolve_llm_config_id(llm_config_id)
+        if not effective_llm_config_id:
+            return None
+        if route:
+            effective_llm_config_id = self._route_llm_config_id(effective_llm_config_id)
 
         # Check if we have already cached this LLM instance
         if effective_llm_config_id in self._llm_cache:
             logger.info(f"Returning cached LLM for config ID: '{effective_llm_config_id}'")
-            self.llm = self._llm_cache[effective_llm_config_id]  # Update current LLM reference
+            if set_current:
+                self.llm = self._llm_cache[effective_llm_config_id]  # Update current LLM reference
+            if allow_hedging:
+                return await self._with_hedging(effective_llm_config_id, self._llm_cache[effective_llm_config_id])
             return self._llm_cache[effective_llm_config_id]
 
         # Load the LLM config
@@ -349,7 +420,8 @@ class LangchainAgentService:
                             logger.info(f"Successfully created fallback ChatOllama instance")
                             # Cache and return the Ollama LLM
                             self._llm_cache[effective_llm_config_id] = created_llm
-                            self.llm = created_llm
+                            if set_current:
+                                self.llm = created_llm
                             return created_llm
                         else:
                             logger.warning("No Ollama configs available for fallback")
@@ -364,7 +436,11 @@ class LangchainAgentService:
                         model=llm_config_to_use.deepseek_config.model,
                         temperature=llm_config_to_use.deepseek_config.temperature,
                         api_key=api_key_to_use,
-                        streaming=True
+                        streaming=True,
+                        stream_usage=True, # Final chunk carries the token usage
+                        # Reuse warm pooled connections to the DeepSeek API across requests
+                        http_client=get_sync_client(DEEPSEEK_API_BASE),
+                        http_async_client=get_async_client(DEEPSEEK_API_BASE),
                     )
                     logger.info(f"Successfully created ChatDeepSeek instance with streaming=True for config '{effective_llm_config_id}'")
                 except Exception as deepseek_error:
@@ -385,6 +461,7 @@ class LangchainAgentService:
                         model=llm_config_to_use.ollama_config.model,
                         base_url=llm_config_to_use.ollama_config.base_url,
                         temperature=llm_config_to_use.ollama_config.temperature,
+                        keep_alive=llm_config_to_use.ollama_config.keep_alive,
                     )
                 except Exception as ollama_error:
                     logger.error(f"Failed to create ChatOllama: {ollama_error}")
@@ -401,14 +478,35 @@ class LangchainAgentService:
             # Cache the LLM for future use
             if created_llm:
                 self._llm_cache[effective_llm_config_id] = created_llm
-                self.llm = created_llm  # Update the current LLM reference
-                logger.info(f"LLM instance created and cached for '{effective_llm_config_id}'. Current self.llm is set.")
+                if set_current:
+                    self.llm = created_llm  # Update the current LLM reference
+                logger.info(f"LLM instance created and cached for '{effective_llm_config_id}'.")
+                if allow_hedging:
+                    return await self._with_hedging(effective_llm_config_id, created_llm)
             return created_llm
             
         except Exception as e:
             logger.error(f"Error creating LLM for config '{effective_llm_config_id}': {e}", exc_info=True)
             return None
 
+    def _mcp_connections(self, server_configs: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """MultiServerMCPClient connections: through the MCP gateway where it fronts the server, else spawned directly."""
+        connections = {}
+        for name, config in server_configs.items():
+            gateway_connection = self.mcp_gateway.connection_for(name, config) if self.mcp_gateway else None
+            connections[name] = gateway_connection or config.model_dump()
+        return connections
+
+    def _speculation_excluded_tools(self, mcp_client: Optional[MultiServerMCPClient]) -> set:
+        """Names of tools whose server has not opted in to speculative dispatch (speculative_tools: true)."""
+        excluded = set()
+        server_configs = self.config_manager.get_all_tool_server_configs() or {}
+        for server_name, server_tools in (getattr(mcp_client, "server_name_to_tools", None) or {}).items():
+            server_config = server_configs.get(server_name)
+            if server_config is None or not getattr(server_config, "speculative_tools", False):
+                excluded.update(tool.name for tool in server_tools)
+        return excluded
+
     async def _get_or_create_session_components(self, 
                                                 session_id: str, 
                                                 tools_config: Dict[str, Any], 
@@ -419,6 +517,11 @@ class LangchainAgentService:
         session_exists = session_id in self.sessions
         session = self.sessions[session_id] if session_exists else None
         session_needs_recreation = needs_session_recreation(session, llm_config_id, tools_config, agent_mode, agent_data_source)
+        # The LLM this session should use right now, after routing around open circuit breakers
+        routed_llm_config_id = self._route_llm_config_id(self._resolve_llm_config_id(llm_config_id))
+        if session is not None and not session_needs_recreation and session.get("llm_routed_config_id") != routed_llm_config_id:
+            logger.info(f"Session {session_id}: LLM routing changed ({session.get('llm_routed_config_id')} -> {routed_llm_config_id}); recreating agent.")
+            session_needs_recreation = True
         current_llm = None
         effective_llm_config_id = llm_config_id
 
@@ -486,6 +589,7 @@ class LangchainAgentService:
                 }
             
             # Now, self.sessions[session_id] definitely exists.
+            self.sessions[session_id]["llm_routed_config_id"] = routed_llm_config_id
             # Use its chat_history and memory_saver for the agent creation process.
             # existing_chat_history_for_agent = self.sessions[session_id]["chat_history"] # Not strictly needed as var
             # current_memory_saver_for_agent = self.sessions[session_id]["memory_saver"] # Not strictly needed as var
@@ -588,13 +692,14 @@ class LangchainAgentService:
                              # agent_tools will remain empty
 
                         else:
-                            all_tool_server_configs_dict = {
-                                name: config.model_dump() for name, config in filtered_server_configs.items()
-                            }
+                            all_tool_server_configs_dict = self._mcp_connections(filtered_server_configs)
                             mcp_client = MultiServerMCPClient(connections=all_tool_server_configs_dict)
                         
                         logger.info(f"Session {session_id}: MCP Client created. Attempting to activate...")
                         try:
+                            standby_servers = standby_pool_manager.attach_to_client(mcp_client) # Pre-warmed, no cold start
+                            if standby_servers:
+                                logger.info(f"Session {session_id}: Leased standby MCP instances for {standby_servers}.")
                             await mcp_client.__aenter__() # ACTIVATE THE CLIENT
                             self.sessions[session_id]["mcp_client"] = mcp_client # Store it first
                             
@@ -612,7 +717,10 @@ class LangchainAgentService:
                             logger.info(f"Session {session_id}: Extracted tool names for ReAct factory: {tool_names_to_enable}")
 
                             tool_factory = MCPServerToolFactory(client=mcp_client, enabled_tools_list=tool_names_to_enable)
-                            agent_tools = tool_factory.create_tools()
+                            # Canonical order keeps the rendered tool block (the cacheable prompt prefix) stable
+                            agent_tools = canonical_tools(enable_speculative_dispatch(
+                                tool_factory.create_tools(), self._speculation_excluded_tools(mcp_client)
+                            ))
                             logger.info(f"Session {session_id}: Created {len(agent_tools)} tools for ReAct agent.")
                         except Exception as e:
                             logger.error(f"Session {session_id}: Error initializing MCP Client: {e}. Falling back.", exc_info=True)
@@ -629,7 +737,7 @@ class LangchainAgentService:
                     return self.sessions[session_id]
 
                 logger.info(f"Session {session_id}: Preparing to create ReAct agent with {len(agent_tools)} tools.")
-                react_prompt = hub.pull("hwchase17/react")
+                react_prompt = build_react_prompt() # Local copy of hwchase17/react: stable tools block first, input last
                 # Using CustomReActParser for consistency, if it handles edge cases better for tool inputs.
                 # create_react_agent will use its default parser if output_parser is None.
                 custom_parser = CustomReActParser()
@@ -687,13 +795,14 @@ class LangchainAgentService:
                             # agent_tools will remain empty
 
                         else:
-                            all_tool_server_configs_dict = {
-                                name: config.model_dump() for name, config in filtered_server_configs.items()
-                            }
+                            all_tool_server_configs_dict = self._mcp_connections(filtered_server_configs)
                             mcp_client = MultiServerMCPClient(connections=all_tool_server_configs_dict)
                         
                         logger.info(f"Session {session_id}: MCP Client created. Attempting to activate...")
                         try:
+                            standby_servers = standby_pool_manager.attach_to_client(mcp_client) # Pre-warmed, no cold start
+                            if standby_servers:
+                                logger.info(f"Session {session_id}: Leased standby MCP instances for {standby_servers}.")
                             await mcp_client.__aenter__() # ACTIVATE THE CLIENT
                             self.sessions[session_id]["mcp_client"] = mcp_client # Store it first
                             
@@ -712,7 +821,9 @@ class LangchainAgentService:
                             logger.info(f"Session {session_id}: Extracted tool names for default factory: {tool_names_to_enable}")
 
                             tool_factory = MCPServerToolFactory(client=mcp_client, enabled_tools_list=tool_names_to_enable)
-                            agent_tools = tool_factory.create_tools()
+                            agent_tools = canonical_tools(enable_speculative_dispatch(
+                                tool_factory.create_tools(), self._speculation_excluded_tools(mcp_client)
+                            ))
                         except Exception as e:
                             logger.error(f"Session {session_id}: Error initializing MCP Client: {e}. Falling back.", exc_info=True)
                             raw_agent_executor = None # Ensure it's None on error
@@ -748,7 +859,7 @@ class LangchainAgentService:
                     logger.info(f"Session {session_id}: SimpleChainExecutor created for basic LLM interaction.")
                 else:
                     logger.info(f"Session {session_id}: Preparing to create ReAct/Tool-using agent (via OpenAI Tools structure) with {len(agent_tools)} tools.")
-                    prompt = hub.pull("hwchase17/openai-tools-agent")
+                    prompt = build_tools_agent_prompt() # Local copy of hwchase17/openai-tools-agent
                     agent = create_openai_tools_agent(current_llm, agent_tools, prompt)
 
                     raw_agent_executor = AgentExecutor( # This is the executor before history
@@ -772,11 +883,13 @@ class LangchainAgentService:
                 self.sessions[session_id].update({
                     "agent_executor": agent_executor_with_history, 
                     "raw_agent_executor": raw_agent_executor, # Store the non-history executor too
+                    "agent_tools": agent_tools, # Tools wrapped for speculative dispatch
+                    "prompt_prefix_fingerprint": prompt_prefix_fingerprint(agent_tools, agent_mode) if agent_tools else None,
                     "mcp_client": mcp_client, # Store the active client for this session (primarily for non-JSON agents)
                     # llm, memory_saver, chat_history_display already set or preserved
                     # llm_config_id_used, tools_config_used, etc., are already set from the start of session_needs_recreation block
                 })
-                logger.info(f"Session {session_id}: AgentExecutor wrapped with history and session updated.")
+                logger.info(f"Session {session_id}: AgentExecutor wrapped with history and session updated (prompt prefix {self.sessions[session_id]['prompt_prefix_fingerprint']}).")
             else:
                 # This case means raw_agent_executor was not created (e.g. JSON agent failed and no fallback, or LLM failed)
                 # Ensure session reflects no usable executor
@@ -812,11 +925,14 @@ class LangchainAgentService:
         output_stream_fn: callable,
         llm_config_id: Optional[str] = None,
         agent_mode: Optional[str] = None, # New
-        agent_data_source: Optional[Union[str, Dict]] = None # New
+        agent_data_source: Optional[Union[str, Dict]] = None, # New
+        event_verbosity: Optional[str] = None
     ) -> None: # MODIFIED: Changed return type from AsyncGenerator to None
         """
         Asynchronously asks the agent a question and streams events using a callback.
         Events (tokens, errors, etc.) are sent via the output_stream_fn.
+        event_verbosity selects how much chain/tool detail is streamed
+        ('tokens_only', 'summary' or 'debug', see utils.event_projection).
         """
         logger.info(f"---> [SERVICE ENTRY] astream_ask_agent_events ENTERED for session {session_id}") 
         
@@ -824,18 +940,38 @@ class LangchainAgentService:
 
         from ..utils.custom_event_handler import EventType # Ensure EventType is in scope
 
+        speculator: Optional[SpeculativeToolDispatcher] = None
+        speculator_token = None
+        usage_meter: Optional[UsageMeteringCallbackHandler] = None
         try:
             logger.info(f"astream_ask_agent_events for session {session_id}: ENTERING main try block.")
             final_response_content = None # INITIALIZE HERE
 
-            custom_handler = CustomAsyncIteratorCallbackHandler(output_stream_fn=output_stream_fn)
-            # MCPEventCollector is for collecting a final response, can be used alongside
-            mcp_event_collector = MCPEventCollector()
-            callbacks = [custom_handler, mcp_event_collector]
-            
             session_data = await self._get_or_create_session_components(
                 session_id, tools_config, llm_config_id, agent_mode, agent_data_source
             )
+
+            # Starts MCP tool calls while the LLM is still streaming; the wrapped tools claim the results
+            speculator = SpeculativeToolDispatcher(session_data.get("agent_tools") or [], session_id=session_id)
+            speculator_token = current_dispatcher.set(speculator)
+            custom_handler = CustomAsyncIteratorCallbackHandler(
+                output_stream_fn=output_stream_fn, verbosity=event_verbosity, session_id=session_id,
+                react_filter=(agent_mode == "react"), # Stream only the Final Answer text in ReAct mode
+                speculator=speculator
+            )
+            # MCPEventCollector is for collecting a final response, can be used alongside
+            mcp_event_collector = MCPEventCollector()
+            # Token accounting for this turn (provider-reported usage, local estimate as fallback)
+            usage_meter = UsageMeteringCallbackHandler(
+                output_stream_fn=output_stream_fn, session_id=session_id,
+                config_id=session_data.get("llm_routed_config_id") or llm_config_id,
+                tools_enabled=bool(session_data.get("agent_tools"))
+            )
+            callbacks = [custom_handler, mcp_event_collector, usage_meter]
+            self._touch_ollama_model(session_data.get("llm_routed_config_id"))
+            if session_data.get("llm_routed_config_id"):
+                # Feeds the per-config error rate / latency that drive the circuit breakers
+                callbacks.append(LLMHealthCallbackHandler(self.llm_health, session_data["llm_routed_config_id"]))
             agent_executor = session_data.get("agent_executor")
             raw_agent_executor = session_data.get("raw_agent_executor") # Get the raw executor before history wrapping
 
@@ -873,11 +1009,10 @@ class LangchainAgentService:
                             chunk_content = getattr(chunk, 'content', '')
 
                         if chunk_content is not None and chunk_content != "": # Ensure we have actual content
-                            logger.debug(f"Session {session_id}: SimpleChain stream chunk #{stream_chunk_count} content: '{chunk_content}'")
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("Session %s: SimpleChain stream chunk #%d content: %r", session_id, stream_chunk_count, chunk_content, extra=hot_path(session_id))
                             output_stream_fn(EventType.TOKEN, chunk_content)
                             accumulated_content += chunk_content
-                        else:
-                             logger.debug(f"Session {session_id}: SimpleChain stream chunk #{stream_chunk_count} was empty or None. Type: {type(chunk)}")
 
                     logger.info(f"Session {session_id}: SUCCESSFULLY COMPLETED iteration of SimpleChainExecutor.astream. Total chunks: {stream_chunk_count}")
                     final_response_content = accumulated_content # Use accumulated content
@@ -898,7 +1033,8 @@ class LangchainAgentService:
                     input_data, version="v1", config=config_for_stream
                 ):
                     stream_event_count += 1
-                    logger.debug(f"Session {session_id}: Langchain event #{stream_event_count} received by service: {event.get('event')} - Name: {event.get('name')}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Session %s: Langchain event #%d received by service: %s - Name: %s", session_id, stream_event_count, event.get('event'), event.get('name'), extra=hot_path(session_id))
                     
                     # Capture final response from the event stream (fallback mechanism)
                     if event["event"] == "on_chain_end":
@@ -930,6 +1066,7 @@ class LangchainAgentService:
 
             # === Send Final Event (Common Logic) ===
             # This part runs after either the astream or astream_events loop finishes successfully
+            output_stream_fn(EventType.USAGE, usage_meter.finish())
             if final_response_content is not None: # Check if content was actually captured/accumulated
                 logger.info(f"Session {session_id}: Sending final CHAIN_END event via output_stream_fn with content: {str(final_response_content)[:70]}...")
                 try:
@@ -964,6 +1101,15 @@ class LangchainAgentService:
             except Exception as ex_send_error:
                 logger.error(f"astream_ask_agent_events for session {session_id}: FAILED TO SEND error event via output_stream_fn after critical error: {ex_send_error}", exc_info=True)
         finally:
+            if usage_meter is not None:
+                # Only reached unrecorded if the turn errored or was cancelled: recorded as failed
+                usage_meter.finish(failed=True) # No-op if the successful path already recorded it
+            if speculator is not None:
+                speculator.cancel_all()
+                if speculator.stats["dispatched"]:
+                    logger.info(f"astream_ask_agent_events for session {session_id}: speculative tool calls {speculator.stats}.")
+            if speculator_token is not None:
+                current_dispatcher.reset(speculator_token)
             logger.info(f"astream_ask_agent_events for session {session_id}: NORMALLY EXITING.")
 
     def submit_request(self, session_id: Optional[str], question: str, tools_config: Dict[str, Any], 
@@ -1068,26 +1214,39 @@ class LangchainAgentService:
         if self.loop and self.loop.is_running(): 
             self.loop.call_soon_threadsafe(self.loop.stop)
 
-    async def close_mcp_clients(self):
+    async def close_mcp_clients(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Close the MCP clients of all sessions concurrently. Closing a client terminates its stdio
+        servers; clients still closing after `timeout` are cancelled, which kills their servers.
+        """
         logger.info("Attempting to close active MCP clients in sessions...")
-        closed_clients = 0
+        closing: Dict[asyncio.Task, str] = {}
         for session_id, session_data in self.sessions.items():
             mcp_client = session_data.get("mcp_client")
             if mcp_client and hasattr(mcp_client, "__aexit__") and \
                not getattr(mcp_client, "_closed", False) and \
                not getattr(mcp_client, "_explicitly_closed_in_recreation", False): # CHECK FLAG
-                try:
-                    logger.info(f"Closing MCP client for session {session_id}...")
-                    await mcp_client.__aexit__(None, None, None) # type: ignore
-                    setattr(mcp_client, "_closed", True) # Mark as closed by general shutdown
-                    closed_clients += 1
-                    logger.info(f"MCP client for session {session_id} closed.")
-                except Exception as e:
-                    logger.error(f"Error closing MCP client for session {session_id}: {e}", exc_info=True)
-        if closed_clients > 0:
-            logger.info(f"Successfully closed {closed_clients} MCP clients.")
-        else:
+                setattr(mcp_client, "_closed", True) # Mark as closed by general shutdown
+                closing[asyncio.create_task(mcp_client.__aexit__(None, None, None))] = session_id # type: ignore
+        report: Dict[str, Any] = {"closed": [], "timed_out": [], "failed": {}}
+        if not closing:
             logger.info("No active MCP clients found in sessions to close.")
+            return report
+        done, pending = await asyncio.wait(closing, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task, session_id in closing.items():
+            if task in pending or task.cancelled():
+                report["timed_out"].append(session_id)
+            elif task.exception() is not None:
+                logger.error(f"Error closing MCP client for session {session_id}: {task.exception()}")
+                report["failed"][session_id] = str(task.exception())
+            else:
+                report["closed"].append(session_id)
+        logger.info(f"Closed {len(report['closed'])}/{len(closing)} MCP clients ({len(report['timed_out'])} timed out and killed, "
+                    f"{len(report['failed'])} failed).")
+        return report
 
     def shutdown(self):
         """Gracefully shuts down the agent service components."""
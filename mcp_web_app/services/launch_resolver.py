@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import time
+import shlex
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .capability_cache import launch_fingerprint
+from ..utils.proc_stats import children_map, proc_available, read_cmdline, read_environ, read_link
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_CACHE_PATH = Path(os.getenv("MCP_LAUNCH_CACHE_PATH", str(Path(__file__).parent.parent / "launch_cache.json")))
+LAUNCH_RESOLVER_ENABLED = os.getenv("MCP_LAUNCH_RESOLVER_ENABLED", "true").lower() in ("1", "true", "yes")
+# A resolved launch is re-checked against the real launcher (in the background) at most this often
+LAUNCH_REVALIDATE_INTERVAL_SECONDS = float(os.getenv("MCP_LAUNCH_REVALIDATE_INTERVAL_SECONDS", str(6 * 3600)))
+
+# Package runners that resolve (and maybe download) a package before exec'ing the real server.
+# None: any args; a set: only with one of these subcommands (e.g. "uv run", "npm exec")
+LAUNCHERS: Dict[str, Optional[set]] = {
+    "npx": None, "uvx": None, "pnpx": None, "bunx": None,
+    "uv": {"run", "tool"}, "npm": {"exec"}, "pnpm": {"dlx", "exec"},
+}
+# The first descendant running one of these is the server itself
+INTERPRETER_PATTERN = re.compile(r"^(node|nodejs|bun|deno|python[\d.]*|pypy[\d.]*)$")
+
+def launcher_of(config: Any) -> Optional[str]:
+    """The package runner a server config launches through (npx, uvx, ...), or None."""
+    if getattr(config, "shell", False):
+        try:
+            tokens = shlex.split(config.command) + list(config.args or [])
+        except ValueError:
+            return None
+    else:
+        tokens = [config.command, *(config.args or [])]
+    if not tokens:
+        return None
+    name = os.path.basename(tokens[0])
+    if name not in LAUNCHERS:
+        return None
+    subcommands = LAUNCHERS[name]
+    if subcommands is not None and (len(tokens) < 2 or tokens[1] not in subcommands):
+        return None
+    return name
+
+def _base_env(config: Any) -> Dict[str, str]:
+    env = os.environ.copy()
+    env.update(getattr(config, "env", None) or {})
+    return env
+
+def resolve_process_tree(root_pid: int, base_env: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Follow the launcher's chain of single children (npx -> sh -> node script, uvx -> python
+    entry point) to the first interpreter process, and return how to exec it directly: its
+    argv (with the interpreter's absolute path), cwd, and the env vars the launcher added.
+    """
+    children = children_map()
+    pid = root_pid
+    while True:
+        kids = children.get(pid, [])
+        if len(kids) != 1:
+            break # Ambiguous (or a leaf): stop here
+        pid = kids[0]
+        argv = read_cmdline(pid)
+        if argv and INTERPRETER_PATTERN.match(os.path.basename(argv[0])):
+            break
+    if pid == root_pid:
+        return None
+    argv = read_cmdline(pid)
+    exe = read_link(pid, "exe")
+    if not argv or not exe or not os.access(exe, os.X_OK):
+        return None
+    environ = read_environ(pid) or {}
+    return {
+        "argv": [exe, *argv[1:]],
+        "cwd": read_link(pid, "cwd"),
+        # Only what the launcher added or changed (PATH, npm_*/VIRTUAL_ENV...); the config's own env is re-applied at spawn
+        "env": {key: value for key, value in environ.items() if base_env.get(key) != value and key != "_"},
+        "files": [arg for arg in argv[1:] if os.path.isabs(arg) and os.path.isfile(arg)],
+    }
+
+class LaunchResolver:
+    """
+    Remembers what npx/uvx-style launch commands actually exec, so later starts skip the
+    package runner (its resolution step, and any registry round trip) and run the server's
+    interpreter directly. Entries are keyed by the config's launch fingerprint, checked for
+    missing files before use, and revalidated against the real launcher in the background.
+    Spawn-to-ready latency is tracked per launch mode ("original" vs "resolved").
+    """
+
+    def __init__(self, path: Path = LAUNCH_CACHE_PATH, enabled: bool = LAUNCH_RESOLVER_ENABLED):
+        self.path = Path(path)
+        self.enabled = enabled and proc_available()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._latency: Dict[str, Dict[str, Dict[str, Any]]] = {} # server_id -> mode -> stats
+        self._revalidating: set = set()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable launch cache {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to write launch cache {self.path}: {e}")
+
+    def applies_to(self, config: Any) -> bool:
+        return self.enabled and launcher_of(config) is not None
+
+    def get(self, server_id: str, config: Any) -> Optional[Dict[str, Any]]:
+        """The resolved launch for this config, if still valid (config unchanged, files still there)."""
+        if not self.applies_to(config):
+            return None
+        entry = self._entries.get(server_id)
+        if not entry:
+            return None
+        if entry.get("fingerprint") != launch_fingerprint(config):
+            self.invalidate(server_id, "server config or launcher changed")
+            return None
+        missing = [path for path in [entry["argv"][0], *entry.get("files", [])] if not os.path.exists(path)]
+        if missing:
+            self.invalidate(server_id, f"resolved files are gone ({missing[0]})")
+            return None
+        return entry
+
+    def invalidate(self, server_id: str, reason: str) -> None:
+        if self._entries.pop(server_id, None) is not None:
+            logger.info(f"Resolved launch of {server_id} dropped: {reason}. Next start uses the original command.")
+            self._save()
+
+    async def capture(self, server_id: str, config: Any, root_pid: int) -> Optional[Dict[str, Any]]:
+        """Record what a running original launch resolved to (call once its MCP handshake is done)."""
+        resolved = await asyncio.to_thread(resolve_process_tree, root_pid, _base_env(config))
+        if resolved is None:
+            logger.debug(f"Could not resolve the launch of {server_id} (PID {root_pid}); keeping the original command.")
+            return None
+        now = time.time()
+        previous = self._entries.get(server_id)
+        self._entries[server_id] = {
+            "fingerprint": launch_fingerprint(config),
+            "launcher": launcher_of(config),
+            **resolved,
+            "resolved_at": previous["resolved_at"] if previous and previous["argv"] == resolved["argv"] else now,
+            "validated_at": now,
+            "original_ready_ms": (self._latency.get(server_id, {}).get("original") or {}).get("avg_ms")
+                                 or (previous or {}).get("original_ready_ms"),
+        }
+        self._save()
+        if previous is None:
+            logger.info(f"Resolved launch of {server_id}: {' '.join(resolved['argv'])}")
+        elif previous["argv"] != resolved["argv"] or previous.get("cwd") != resolved["cwd"]:
+            logger.info(f"Resolved launch of {server_id} changed: {' '.join(previous['argv'])} -> {' '.join(resolved['argv'])}")
+        return self._entries[server_id]
+
+    def revalidation_due(self, server_id: str) -> bool:
+        entry = self._entries.get(server_id)
+        return (entry is not None and server_id not in self._revalidating
+                and time.time() - entry.get("validated_at", 0) > LAUNCH_REVALIDATE_INTERVAL_SECONDS)
+
+    def begin_revalidation(self, server_id: str) -> bool:
+        if not self.revalidation_due(server_id):
+            return False
+        self._revalidating.add(server_id)
+        return True
+
+    def end_revalidation(self, server_id: str) -> None:
+        self._revalidating.discard(server_id)
+
+    def record_ready(self, server_id: str, mode: str, ready_ms: float) -> None:
+        stats = self._latency.setdefault(server_id, {}).setdefault(mode, {"starts": 0, "last_ms": None, "avg_ms": None})
+        stats["starts"] += 1
+        stats["last_ms"] = round(ready_ms, 1)
+        stats["avg_ms"] = round(ready_ms if stats["avg_ms"] is None else stats["avg_ms"] + (ready_ms - stats["avg_ms"]) / stats["starts"], 1)
+        entry = self._entries.get(server_id)
+        if mode == "original" and entry is not None:
+            entry["original_ready_ms"] = stats["last_ms"] # Persisted, so "before" survives an app restart
+
+    def server_info(self, server_id: str) -> Dict[str, Any]:
+        entry = self._entries.get(server_id)
+        latency = self._latency.get(server_id, {})
+        original_ms = (latency.get("original") or {}).get("avg_ms") or (entry or {}).get("original_ready_ms")
+        resolved_ms = (latency.get("resolved") or {}).get("avg_ms")
+        return {
+            "resolved_argv": entry["argv"] if entry else None,
+            "resolved_at": entry.get("resolved_at") if entry else None,
+            "validated_at": entry.get("validated_at") if entry else None,
+            "spawn_to_ready_ms": latency,
+            "speedup": round(original_ms / resolved_ms, 2) if original_ms and resolved_ms else None,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "revalidate_interval_seconds": LAUNCH_REVALIDATE_INTERVAL_SECONDS,
+            "servers": {server_id: self.server_info(server_id) for server_id in {*self._entries, *self._latency}},
+        }
+
+launch_resolver = LaunchResolver()
@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Breaker tuning (env-overridable)
+HEALTH_WINDOW_SECONDS = float(os.getenv("MCP_LLM_HEALTH_WINDOW_SECONDS", "120"))
+HEALTH_MIN_REQUESTS = int(os.getenv("MCP_LLM_HEALTH_MIN_REQUESTS", "4"))
+HEALTH_ERROR_RATE_THRESHOLD = float(os.getenv("MCP_LLM_HEALTH_ERROR_RATE", "0.5"))
+HEALTH_CONSECUTIVE_FAILURES = int(os.getenv("MCP_LLM_HEALTH_CONSECUTIVE_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("MCP_LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("MCP_LLM_BREAKER_MAX_COOLDOWN_SECONDS", "600"))
+PROBE_TIMEOUT_SECONDS = float(os.getenv("MCP_LLM_PROBE_TIMEOUT_SECONDS", "20"))
+
+class BreakerState:
+    CLOSED = "closed"       # Healthy: traffic flows
+    OPEN = "open"           # Failing: selection routes around this config until the cooldown ends
+    HALF_OPEN = "half_open" # Cooldown over: a background probe decides whether to close again
+
+class LLMHealth:
+    """Rolling error rate, latency EWMA and circuit breaker of one LLM config."""
+
+    def __init__(self, config_id: str):
+        self.config_id = config_id
+        self.outcomes: Deque[Tuple[float, bool]] = deque(maxlen=200) # (timestamp, ok)
+        self.latency_ms_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.cooldown_seconds = BREAKER_COOLDOWN_SECONDS
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self.probes = 0
+
+    def _prune(self, now: float) -> None:
+        while self.outcomes and now - self.outcomes[0][0] > HEALTH_WINDOW_SECONDS:
+            self.outcomes.popleft()
+
+    @property
+    def error_rate(self) -> float:
+        self._prune(time.time())
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _ts, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def record_success(self, latency_ms: Optional[float], started_at: Optional[float] = None) -> None:
+        """Record a successful call that started at started_at (None if unknown)."""
+        self.outcomes.append((time.time(), True))
+        if latency_ms is not None:
+            self.latency_ms_ewma = latency_ms if self.latency_ms_ewma is None else 0.8 * self.latency_ms_ewma + 0.2 * latency_ms
+        if self.state == BreakerState.CLOSED:
+            self.consecutive_failures = 0
+        elif started_at is not None and self.opened_at is not None and started_at >= self.opened_at:
+            self.close()
+        # else: a straggler from before the breaker opened says nothing about recovery; the probe decides
+
+    def record_failure(self, error: BaseException) -> bool:
+        """Record a failed call; returns True if this tripped the breaker open."""
+        now = time.time()
+        self.outcomes.append((now, False))
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:500]
+        self.last_error_at = now
+        if self.state == BreakerState.OPEN:
+            return False
+        self._prune(now)
+        tripped = self.consecutive_failures >= HEALTH_CONSECUTIVE_FAILURES or (
+            len(self.outcomes) >= HEALTH_MIN_REQUESTS and self.error_rate >= HEALTH_ERROR_RATE_THRESHOLD
+        )
+        if tripped:
+            self.open()
+        return tripped
+
+    def open(self) -> None:
+        if self.state == BreakerState.HALF_OPEN:
+            # Failed probe: back off before trying again
+            self.cooldown_seconds = min(self.cooldown_seconds * 2, BREAKER_MAX_COOLDOWN_SECONDS)
+        self.state = BreakerState.OPEN
+        self.opened_at = time.time()
+        logger.warning(f"LLM config '{self.config_id}': circuit OPEN for {self.cooldown_seconds:.0f}s (error rate {self.error_rate:.0%}, last error: {self.last_error}).")
+
+    def close(self) -> None:
+        logger.info(f"LLM config '{self.config_id}': circuit CLOSED (was {self.state}).")
+        self.state = BreakerState.CLOSED
+        self.opened_at = None
+        self.cooldown_seconds = BREAKER_COOLDOWN_SECONDS
+        self.consecutive_failures = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether selection may route live traffic here (half-open configs wait for their probe)."""
+        return self.state == BreakerState.CLOSED
+
+    def probe_due(self, now: float) -> bool:
+        return self.state == BreakerState.OPEN and self.opened_at is not None and now - self.opened_at >= self.cooldown_seconds
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "config_id": self.config_id,
+            "state": self.state,
+            "error_rate": round(self.error_rate, 3),
+            "requests_in_window": len(self.outcomes),
+            "latency_ms_ewma": round(self.latency_ms_ewma, 1) if self.latency_ms_ewma is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(time.time() - self.opened_at, 1) if self.opened_at else None,
+            "cooldown_seconds": self.cooldown_seconds,
+            "last_error": self.last_error,
+            "probes": self.probes,
+        }
+
+class LLMHealthTracker:
+    """
+    Health of all LLM configs plus breaker-aware selection over fallback chains.
+    Half-open probes run in a background task, started lazily when a breaker first opens.
+    """
+
+    def __init__(self, probe_interval_seconds: float = 5.0):
+        self._health: Dict[str, LLMHealth] = {}
+        self._probe_fn: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self.probe_interval_seconds = probe_interval_seconds
+
+    def get(self, config_id: str) -> LLMHealth:
+        health = self._health.get(config_id)
+        if health is None:
+            health = self._health[config_id] = LLMHealth(config_id)
+        return health
+
+    def set_probe(self, probe_fn: Callable[[str], Awaitable[Any]]) -> None:
+        """Coroutine function that performs a minimal request against a config (raises on failure)."""
+        self._probe_fn = probe_fn
+
+    def record_success(self, config_id: str, latency_ms: Optional[float] = None, started_at: Optional[float] = None) -> None:
+        self.get(config_id).record_success(latency_ms, started_at)
+
+    def record_failure(self, config_id: str, error: BaseException) -> None:
+        if self.get(config_id).record_failure(error):
+            self._ensure_probe_loop()
+
+    def select(self, config_id: str, fallback_chain: Sequence[str] = ()) -> str:
+        """First config of [config_id, *fallback_chain] whose breaker is closed (config_id if none is)."""
+        for candidate in [config_id, *fallback_chain]:
+            if candidate and self.get(candidate).available:
+                if candidate != config_id:
+                    logger.info(f"LLM config '{config_id}' circuit is {self.get(config_id).state}; routing to fallback '{candidate}'.")
+                return candidate
+        return config_id
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [health.info() for health in self._health.values()]
+
+    def _ensure_probe_loop(self) -> None:
+        if self._probe_fn is None or (self._probe_task and not self._probe_task.done()):
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+        except RuntimeError:
+            logger.debug("No running event loop; LLM half-open probes not started.")
+
+    async def _probe_loop(self) -> None:
+        while any(health.state != BreakerState.CLOSED for health in self._health.values()):
+            now = time.time()
+            for health in list(self._health.values()):
+                if health.probe_due(now):
+                    await self._probe(health)
+            await asyncio.sleep(self.probe_interval_seconds)
+        logger.info("All LLM circuits closed; stopping half-open probe loop.")
+
+    async def _probe(self, health: LLMHealth) -> None:
+        health.state = BreakerState.HALF_OPEN
+        health.probes += 1
+        started = time.time()
+        try:
+            await asyncio.wait_for(self._probe_fn(health.config_id), timeout=PROBE_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e_probe:
+            health.last_error = f"probe: {type(e_probe).__name__}: {e_probe}"[:500]
+            health.open()
+            return
+        health.record_success((time.time() - started) * 1000, started)
+
+    async def stop(self) -> None:
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+
+class LLMHealthCallbackHandler(AsyncCallbackHandler):
+    """Records the outcome and first-token latency of every LLM run of a request against one config."""
+
+    def __init__(self, tracker: LLMHealthTracker, config_id: str):
+        super().__init__()
+        self.tracker = tracker
+        self.config_id = config_id
+        self._started: Dict[UUID, float] = {}
+        self._first_token_ms: Dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID) -> None:
+        self._started[run_id] = time.time()
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id not in self._first_token_ms and run_id in self._started:
+            self._first_token_ms[run_id] = (time.time() - self._started[run_id]) * 1000
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        latency_ms = self._first_token_ms.pop(run_id, None)
+        if latency_ms is None and started is not None:
+            latency_ms = (time.time() - started) * 1000
+        self.tracker.record_success(self.config_id, latency_ms, started)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+        self._first_token_ms.pop(run_id, None)
+        if isinstance(error, asyncio.CancelledError):
+            return # Client went away; says nothing about the provider
+        self.tracker.record_failure(self.config_id, error)
+
+llm_health_tracker = LLMHealthTracker()
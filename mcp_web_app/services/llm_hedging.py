@@ -0,0 +1,194 @@
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from pydantic import ConfigDict
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from ..models.models import HedgingPolicy
+
+logger = logging.getLogger(__name__)
+
+class HedgeStats:
+    """Counters for one hedged (primary) LLM config."""
+
+    def __init__(self, config_id: str, secondary_config_id: str):
+        self.config_id = config_id
+        self.secondary_config_id = secondary_config_id
+        self.requests = 0
+        self.hedged = 0
+        self.budget_denied = 0   # Threshold exceeded but the hedge fraction was used up
+        self.primary_wins = 0    # Hedged races won by the primary
+        self.secondary_wins = 0  # Hedged races won by the secondary
+        self.both_failed = 0
+        self.first_token_ms_ewma: Optional[float] = None
+
+    def allow_hedge(self, max_fraction: float) -> bool:
+        """Hedge budget: at most max_fraction of requests (plus a burst of one) may be hedged."""
+        if self.hedged < max_fraction * self.requests + 1:
+            return True
+        self.budget_denied += 1
+        return False
+
+    def record_first_token(self, elapsed_ms: float) -> None:
+        if self.first_token_ms_ewma is None:
+            self.first_token_ms_ewma = elapsed_ms
+        else:
+            self.first_token_ms_ewma = 0.8 * self.first_token_ms_ewma + 0.2 * elapsed_ms
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "config_id": self.config_id,
+            "secondary_config_id": self.secondary_config_id,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_fraction": round(self.hedged / self.requests, 3) if self.requests else 0.0,
+            "budget_denied": self.budget_denied,
+            "primary_wins": self.primary_wins,
+            "secondary_wins": self.secondary_wins,
+            "both_failed": self.both_failed,
+            "first_token_ms_ewma": round(self.first_token_ms_ewma, 1) if self.first_token_ms_ewma is not None else None,
+        }
+
+_hedge_stats: Dict[str, HedgeStats] = {}
+
+def get_hedging_stats() -> List[Dict[str, Any]]:
+    """Win/loss and budget counters of all hedged LLM configs."""
+    return [stats.info() for stats in _hedge_stats.values()]
+
+async def _close_stream(iterator, task: Optional[asyncio.Future]) -> None:
+    """Cancel a losing stream's pending read and close its generator (closes the HTTP response)."""
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+    try:
+        await iterator.aclose()
+    except Exception as e_close:
+        logger.debug(f"Error closing losing LLM stream: {e_close}")
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Streams from a primary chat model, hedging to a secondary one on a slow first token.
+
+    If the primary has not produced its first chunk within policy.first_token_timeout_ms
+    (and the hedge budget allows), the same request is started on the secondary. Whichever
+    stream yields a chunk first is streamed to the caller and the other is cancelled.
+    Tool bindings and stop sequences are forwarded to both models unchanged.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    policy: HedgingPolicy
+    config_id: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    @property
+    def stats(self) -> HedgeStats:
+        stats = _hedge_stats.get(self.config_id)
+        if stats is None or stats.secondary_config_id != self.policy.secondary_config_id:
+            stats = _hedge_stats[self.config_id] = HedgeStats(self.config_id, self.policy.secondary_config_id)
+        return stats
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Let the primary format the tool schema, then forward the same kwargs to whichever model runs
+        return self.bind(**self.primary.bind_tools(tools, **kwargs).kwargs)
+
+    def _should_stream(self, *, async_api: bool, **kwargs: Any) -> bool:
+        # Racing first tokens only makes sense on the streaming path
+        return self.disable_streaming is not True and async_api
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        # Synchronous calls are not hedged
+        return self.primary._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        return self.primary._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        stats = self.stats
+        stats.requests += 1
+        started = time.time()
+        timeout = max(self.policy.first_token_timeout_ms, 0) / 1000.0
+
+        # Inner models stream without callbacks; tokens are reported once, from the winner only
+        streams = {"primary": self.primary._astream(messages, stop=stop, **kwargs).__aiter__()}
+        reads = {"primary": asyncio.ensure_future(streams["primary"].__anext__())}
+        winner, first_chunk, errors = None, None, {}
+        try:
+            done, _pending = await asyncio.wait(set(reads.values()), timeout=timeout)
+            if not done and stats.allow_hedge(self.policy.max_hedge_fraction):
+                stats.hedged += 1
+                logger.info(f"LLM '{self.config_id}': no first token after {self.policy.first_token_timeout_ms}ms, hedging to '{self.policy.secondary_config_id}'.")
+                streams["secondary"] = self.secondary._astream(messages, stop=stop, **kwargs).__aiter__()
+                reads["secondary"] = asyncio.ensure_future(streams["secondary"].__anext__())
+
+            while reads and winner is None:
+                done, _pending = await asyncio.wait(set(reads.values()), return_when=asyncio.FIRST_COMPLETED)
+                for name, task in list(reads.items()):
+                    if task not in done:
+                        continue
+                    del reads[name]
+                    try:
+                        first_chunk = task.result()
+                        winner = name
+                        break
+                    except StopAsyncIteration:
+                        first_chunk = None
+                        winner = name # An empty response is still an answer
+                        break
+                    except Exception as e_stream:
+                        errors[name] = e_stream
+                        logger.warning(f"LLM '{self.config_id}': {name} stream failed before its first token: {e_stream}")
+        finally:
+            # Cancel the loser (or everything, if we were cancelled ourselves)
+            for name in list(reads):
+                await _close_stream(streams[name], reads.pop(name))
+
+        hedged = "secondary" in streams
+
+        if winner is None:
+            if hedged:
+                stats.both_failed += 1
+            raise errors.get("primary") or next(iter(errors.values()))
+        if hedged:
+            if winner == "primary":
+                stats.primary_wins += 1
+            else:
+                stats.secondary_wins += 1
+                logger.info(f"LLM '{self.config_id}': secondary '{self.policy.secondary_config_id}' won the hedged race.")
+        stats.record_first_token((time.time() - started) * 1000)
+        if first_chunk is None:
+            return
+
+        winning_stream = streams[winner]
+        try:
+            chunk = first_chunk
+            while True:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                try:
+                    chunk = await winning_stream.__anext__()
+                except StopAsyncIteration:
+                    break
+        finally:
+            await _close_stream(winning_stream, None)
@@ -0,0 +1,260 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import ipaddress
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from ..models.models import ServerConfig
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: while on, the gateway (not the standby pools) serves the servers the ProcessManager keeps running
+MCP_GATEWAY_ENABLED = os.getenv("MCP_GATEWAY_ENABLED", "false").lower() in ("1", "true", "yes")
+MCP_GATEWAY_PATH = "/mcp-gateway"
+# Requests one client may have in flight on a server; further requests wait for a slot
+MCP_GATEWAY_MAX_INFLIGHT_PER_CLIENT = int(os.getenv("MCP_GATEWAY_MAX_INFLIGHT_PER_CLIENT", "8"))
+MCP_GATEWAY_REQUEST_TIMEOUT_SECONDS = float(os.getenv("MCP_GATEWAY_REQUEST_TIMEOUT_SECONDS", "300"))
+MCP_GATEWAY_SESSION_IDLE_TTL_SECONDS = float(os.getenv("MCP_GATEWAY_SESSION_IDLE_TTL_SECONDS", "3600"))
+
+# JSON-RPC error codes
+INVALID_REQUEST = -32600
+INTERNAL_ERROR = -32603
+
+def is_local_client(scope: Dict[str, Any]) -> bool:
+    """Whether an ASGI request comes from this host (loopback, or the address it connected to)."""
+    client = (scope.get("client") or (None,))[0]
+    server = (scope.get("server") or (None,))[0]
+    if not client:
+        return False
+    try:
+        return ipaddress.ip_address(client).is_loopback or client == server
+    except ValueError:
+        return False
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+class GatewayClient:
+    """One MCP client session (e.g. one agent session's connection) on one gateway server endpoint."""
+
+    def __init__(self, server_id: str, max_in_flight: int):
+        self.session_id = uuid.uuid4().hex
+        self.server_id = server_id
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight: Dict[Any, str] = {} # Client request id -> gateway request id
+        self.waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "server_id": self.server_id,
+            "in_flight": len(self.in_flight),
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.time() - self.last_seen, 1),
+        }
+
+class MCPGateway:
+    """
+    Streamable-HTTP MCP endpoints in front of the ProcessManager's stdio servers.
+
+    Agent sessions connect here instead of spawning private copies, so the server the
+    dashboard shows as running is the one serving tool calls. Every client gets its own
+    Mcp-Session-Id and is answered `initialize` from the managed server's handshake; its
+    requests are forwarded over the single managed session with ids remapped to gateway-unique
+    ones (and mapped back on the response), at most MCP_GATEWAY_MAX_INFLIGHT_PER_CLIENT at a
+    time per client. Responses are plain JSON; there is no server-to-client stream (GET),
+    so server notifications and requests are not relayed to gateway clients.
+
+    Only servers the ProcessManager is keeping up are fronted: the gateway never starts a
+    server, so a dashboard stop or a supervisor crash_loop verdict stands, and agent sessions
+    for other servers spawn their own copy (or lease a standby instance) as before.
+    """
+
+    def __init__(self, process_manager, config_manager, enabled: bool = MCP_GATEWAY_ENABLED,
+                 base_url: Optional[str] = None, max_in_flight: int = MCP_GATEWAY_MAX_INFLIGHT_PER_CLIENT):
+        self._process_manager = process_manager
+        self._config_manager = config_manager
+        self.enabled = enabled
+        # Where agent sessions reach this app's gateway routes. Read at construction (main.py's --host/--port
+        # export it before the app module is imported); otherwise learned from the first request's socket.
+        self.base_url: Optional[str] = (base_url or os.getenv("MCP_GATEWAY_BASE_URL") or "").rstrip("/") or None
+        self.max_in_flight = max_in_flight
+        self._clients: Dict[str, GatewayClient] = {}
+        self._next_id = 0
+        self.forwarded = 0
+
+    def learn_address(self, scope: Dict[str, Any]) -> None:
+        """Take the base URL from the socket an ASGI request arrived on (unless it is configured)."""
+        if self.base_url is not None or not scope.get("server"):
+            return
+        host, port = scope["server"][:2]
+        if port is None:
+            return # Unix socket: not reachable over HTTP
+        host = f"[{host}]" if ":" in host else host
+        self.base_url = f"http://{host}:{port}"
+        logger.info(f"MCP gateway: agent sessions will connect to {self.base_url}{MCP_GATEWAY_PATH}.")
+
+    def fronts(self, server_id: str, config: Optional[ServerConfig] = None) -> bool:
+        """Whether agent sessions are served by the managed process of this server (kept up, not crash-looping)."""
+        config = config or self._config_manager.get_tool_server_config(server_id)
+        if not self.enabled or config is None or config.transport != "stdio":
+            return False
+        if not self._process_manager.is_desired_running(server_id):
+            return False # Stopped from the dashboard (or never started): the gateway doesn't start it
+        return self._process_manager.get_server_status(server_id).get("status") != "crash_loop"
+
+    def connection_for(self, server_name: str, config: ServerConfig) -> Optional[Dict[str, Any]]:
+        """MultiServerMCPClient connection that goes through the gateway, or None to connect directly."""
+        if not self.fronts(server_name, config):
+            return None
+        if self.base_url is None:
+            logger.error(f"MCP gateway address unknown (set MCP_GATEWAY_BASE_URL); session connects to {server_name} directly.")
+            return None
+        return {
+            "transport": "streamable_http",
+            "url": f"{self.base_url}{MCP_GATEWAY_PATH}/{quote(server_name, safe='')}",
+            "timeout": timedelta(seconds=30),
+            "sse_read_timeout": timedelta(seconds=MCP_GATEWAY_REQUEST_TIMEOUT_SECONDS),
+        }
+
+    def _prune_idle(self) -> None:
+        now = time.time()
+        for session_id, client in list(self._clients.items()):
+            if not client.in_flight and now - client.last_seen > MCP_GATEWAY_SESSION_IDLE_TTL_SECONDS:
+                del self._clients[session_id]
+
+    async def _ready_session(self, server_id: str):
+        """The managed server's MCP session, or None if it is stopped, restarting or crash-looping."""
+        if not self.fronts(server_id) or not self._process_manager.is_server_running(server_id):
+            return None
+        return await self._process_manager.get_session(server_id)
+
+    async def handle_post(self, server_id: str, body: Any, session_id: Optional[str]) -> Tuple[int, Dict[str, str], Any]:
+        """One POST to a server endpoint: (HTTP status, extra headers, JSON body or None)."""
+        if self._config_manager.get_tool_server_config(server_id) is None:
+            return 404, {}, _error(None, INVALID_REQUEST, f"Unknown server '{server_id}'")
+        messages: List[Any] = body if isinstance(body, list) else [body]
+        if not messages or not all(isinstance(message, dict) and message.get("jsonrpc") == "2.0" for message in messages):
+            return 400, {}, _error(None, INVALID_REQUEST, "Expected JSON-RPC 2.0 message(s)")
+
+        initialize = next((message for message in messages if message.get("method") == "initialize"), None)
+        if initialize is not None:
+            if len(messages) > 1:
+                return 400, {}, _error(initialize.get("id"), INVALID_REQUEST, "initialize must not be batched")
+            return await self._initialize(server_id, initialize)
+
+        client = self._clients.get(session_id or "")
+        if client is None or client.server_id != server_id:
+            return (400 if not session_id else 404), {}, _error(None, INVALID_REQUEST, "Missing or unknown Mcp-Session-Id")
+        client.last_seen = time.time()
+        requests = [message for message in messages if "method" in message and "id" in message]
+        for message in messages:
+            if "method" in message and "id" not in message:
+                await self._notify(client, message)
+        if not requests:
+            return 202, {}, None # Notifications (or responses) only
+        responses = await asyncio.gather(*(self._forward(client, message) for message in requests))
+        return 200, {}, responses if isinstance(body, list) else responses[0]
+
+    async def _initialize(self, server_id: str, message: Dict[str, Any]) -> Tuple[int, Dict[str, str], Any]:
+        session = await self._ready_session(server_id)
+        if session is None or session.init_result is None:
+            return 200, {}, _error(message.get("id"), INTERNAL_ERROR, f"Server '{server_id}' is not running")
+        self._prune_idle()
+        client = GatewayClient(server_id, self.max_in_flight)
+        self._clients[client.session_id] = client
+        # The managed server was initialized once; every client gets that handshake's result
+        result = session.init_result.model_dump(by_alias=True, mode="json", exclude_none=True)
+        logger.info(f"MCP gateway: client session {client.session_id[:8]} opened on {server_id}.")
+        return 200, {"Mcp-Session-Id": client.session_id}, {"jsonrpc": "2.0", "id": message.get("id"), "result": result}
+
+    async def _notify(self, client: GatewayClient, message: Dict[str, Any]) -> None:
+        method = message["method"]
+        if method == "notifications/initialized":
+            return # The managed session already sent it
+        if method == "notifications/cancelled":
+            forward_id = client.in_flight.get((message.get("params") or {}).get("requestId"))
+            if forward_id is None:
+                return # Already answered
+            message = {**message, "params": {**message["params"], "requestId": forward_id}}
+        session = await self._process_manager.get_session(client.server_id)
+        if session is not None:
+            try:
+                await session.send_raw(message)
+            except Exception as e:
+                logger.warning(f"MCP gateway: could not forward {method} to {client.server_id}: {e}")
+
+    async def _forward(self, client: GatewayClient, message: Dict[str, Any]) -> Dict[str, Any]:
+        request_id = message["id"]
+        client.requests += 1
+        if message["method"] == "ping":
+            return {"jsonrpc": "2.0", "id": request_id, "result": {}}
+        if request_id in client.in_flight:
+            client.errors += 1
+            return _error(request_id, INVALID_REQUEST, f"Request id {request_id!r} is already in flight")
+        self._next_id += 1
+        forward_id = f"gw-{self._next_id}"
+        client.in_flight[request_id] = forward_id # Registered before waiting, so a cancel can find it
+        client.waiting += 1
+        waiting = True
+        try:
+            async with client.slots:
+                client.waiting -= 1
+                waiting = False
+                session = await self._ready_session(client.server_id)
+                if session is None:
+                    client.errors += 1
+                    return _error(request_id, INTERNAL_ERROR, f"Server '{client.server_id}' is not running")
+                self.forwarded += 1
+                response = await session.forward_request({**message, "id": forward_id}, timeout=MCP_GATEWAY_REQUEST_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            client.errors += 1
+            return _error(request_id, INTERNAL_ERROR, f"Timed out after {MCP_GATEWAY_REQUEST_TIMEOUT_SECONDS:.0f}s")
+        except Exception as e:
+            client.errors += 1
+            return _error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+        finally:
+            if waiting:
+                client.waiting -= 1
+            client.in_flight.pop(request_id, None)
+        return {**response, "id": request_id}
+
+    def close_session(self, server_id: str, session_id: Optional[str]) -> bool:
+        client = self._clients.get(session_id or "")
+        if client is None or client.server_id != server_id:
+            return False
+        del self._clients[session_id]
+        logger.info(f"MCP gateway: client session {session_id[:8]} closed on {server_id}.")
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "base_url": self.base_url,
+            "fronted": sorted(server_id for server_id in self._config_manager.get_all_tool_server_configs() if self.fronts(server_id)),
+            "max_in_flight_per_client": self.max_in_flight,
+            "forwarded": self.forwarded,
+            "clients": {session_id[:8]: client.info() for session_id, client in self._clients.items()},
+        }
+
+class GatewayAddressMiddleware:
+    """ASGI middleware that lets the gateway learn the app's bound address from the first request."""
+
+    def __init__(self, app, gateway: MCPGateway):
+        self.app = app
+        self.gateway = gateway
+
+    async def __call__(self, scope, receive, send):
+        if self.gateway.base_url is None and scope["type"] in ("http", "websocket"):
+            self.gateway.learn_address(scope)
+        await self.app(scope, receive, send)
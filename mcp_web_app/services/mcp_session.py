@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+from mcp import ClientSession, types
+from mcp.shared.message import SessionMessage
+
+logger = logging.getLogger(__name__)
+
+SESSION_INIT_TIMEOUT_SECONDS = float(os.getenv("MCP_SESSION_INIT_TIMEOUT_SECONDS", "30"))
+SESSION_REQUEST_TIMEOUT_SECONDS = float(os.getenv("MCP_SESSION_REQUEST_TIMEOUT_SECONDS", "30"))
+# asyncio.StreamReader's default 64 KiB line limit is too small for large tools/list responses
+STDIO_LINE_LIMIT = int(os.getenv("MCP_STDIO_LINE_LIMIT", str(16 * 1024 * 1024)))
+
+class ManagedMCPSession:
+    """
+    One long-lived MCP ClientSession over the stdin/stdout pipes of a process we already started.
+
+    ProcessManager used to spawn a second copy of every server (via stdio_client) just to
+    call list_tools(). Instead, the managed process' own stdout is parsed as newline-delimited
+    JSON-RPC and fed to a ClientSession; requests are written to its stdin. Lines on stdout
+    that aren't JSON-RPC go to the server's log buffer. The session lives in its own task (the MCP
+    session's task group must be entered and exited by the same task) until close().
+    """
+
+    def __init__(self, server_id: str, process: asyncio.subprocess.Process,
+                 message_handler: Optional[Callable[[Any], Awaitable[None]]] = None, log_buffer=None):
+        self.server_id = server_id
+        self.process = process
+        self.message_handler = message_handler # Server notifications (e.g. tools/list_changed)
+        self.log_buffer = log_buffer # ServerLogBuffer for stdout lines that aren't protocol
+        self.session: Optional[ClientSession] = None
+        self.init_result: Optional[types.InitializeResult] = None
+        self.last_error: Optional[str] = None
+        self.last_ping_ms: Optional[float] = None
+        self.last_ping_at: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._forwarded: Dict[str, asyncio.Future] = {} # Gateway request id -> future of the raw response
+
+    @property
+    def initialized(self) -> bool:
+        return self.session is not None and self._ready.is_set() and not self._closing.is_set()
+
+    async def start(self, timeout: float = SESSION_INIT_TIMEOUT_SECONDS) -> bool:
+        """Run the MCP initialize handshake over the process pipes; True once the session is usable."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        ready = asyncio.create_task(self._ready.wait())
+        try:
+            await asyncio.wait({ready, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready.cancel()
+        if not self.initialized and self.last_error is None:
+            self.last_error = f"MCP initialize did not complete within {timeout:.0f}s"
+        return self.initialized
+
+    async def _run(self) -> None:
+        read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+        write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+        try:
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(self._stdout_reader, read_stream_writer)
+                task_group.start_soon(self._stdin_writer, write_stream_reader)
+                try:
+                    async with ClientSession(
+                        read_stream, write_stream,
+                        read_timeout_seconds=timedelta(seconds=SESSION_REQUEST_TIMEOUT_SECONDS),
+                        message_handler=self._on_message,
+                    ) as session:
+                        self.init_result = await session.initialize()
+                        self.session = session
+                        self._ready.set()
+                        server_info = self.init_result.serverInfo
+                        logger.info(f"[MCP] Session for {self.server_id} initialized over the process pipes ({server_info.name} {server_info.version}).")
+                        await self._closing.wait()
+                finally:
+                    self.session = None
+                    self._fail_forwarded(f"MCP session for {self.server_id} closed")
+                    task_group.cancel_scope.cancel()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.error(f"[MCP] Session for {self.server_id} failed: {self.last_error}")
+
+    async def _stdout_reader(self, read_stream_writer) -> None:
+        stdout = self.process.stdout
+        try:
+            async with read_stream_writer:
+                while True:
+                    line = await stdout.readline()
+                    if not line:
+                        logger.debug(f"STDOUT stream for {self.server_id} ended.")
+                        break
+                    if not line.lstrip().startswith(b"{"):
+                        if not line.strip():
+                            continue
+                        if self.log_buffer is not None: # Plain log output, not protocol
+                            self.log_buffer.append("stdout", line.rstrip(b"\r\n"))
+                        else:
+                            logger.info(f"[{self.server_id} STDOUT]: {line.decode(errors='ignore').strip()}")
+                        await anyio.lowlevel.checkpoint()
+                        continue
+                    if self._forwarded and self._resolve_forwarded(line):
+                        continue # Response to a gateway client's request: not for our ClientSession
+                    text = line.decode(errors="ignore").strip()
+                    try:
+                        message = types.JSONRPCMessage.model_validate_json(text)
+                    except Exception as e_parse:
+                        logger.warning(f"[{self.server_id} STDOUT] Unparseable JSON-RPC line: {e_parse}. Line: {text[:200]}")
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+        except Exception as e:
+            logger.error(f"Error reading STDOUT for {self.server_id}: {e}", exc_info=True)
+        finally:
+            self._fail_forwarded(f"{self.server_id} closed its stdout")
+
+    async def _stdin_writer(self, write_stream_reader) -> None:
+        stdin = self.process.stdin
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    payload = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    stdin.write((payload + "\n").encode())
+                    await stdin.drain()
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning(f"STDIN of {self.server_id} closed: {e}")
+
+    async def _on_message(self, message: Any) -> None:
+        if isinstance(message, Exception):
+            logger.warning(f"[MCP] {self.server_id} sent an invalid message: {message}")
+            return
+        if self.message_handler is not None:
+            await self.message_handler(message)
+
+    def _require_session(self) -> ClientSession:
+        if not self.initialized:
+            raise RuntimeError(f"MCP session for {self.server_id} is not initialized ({self.last_error or 'not started'}).")
+        return self.session
+
+    async def list_tools(self, timeout: float = SESSION_REQUEST_TIMEOUT_SECONDS) -> List[types.Tool]:
+        session = self._require_session()
+        response = await asyncio.wait_for(session.list_tools(), timeout=timeout)
+        return list(response.tools)
+
+    async def ping(self, timeout: float = 5.0) -> float:
+        """Round-trip an MCP ping; returns the latency in ms (raises on failure or timeout)."""
+        session = self._require_session()
+        started = time.perf_counter()
+        await asyncio.wait_for(session.send_ping(), timeout=timeout)
+        self.last_ping_ms = (time.perf_counter() - started) * 1000
+        self.last_ping_at = time.time()
+        return self.last_ping_ms
+
+    def _resolve_forwarded(self, line: bytes) -> bool:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(message, dict) or "method" in message:
+            return False
+        future = self._forwarded.get(message.get("id")) if isinstance(message.get("id"), str) else None
+        if future is None:
+            return False
+        if not future.done():
+            future.set_result(message)
+        return True
+
+    def _fail_forwarded(self, reason: str) -> None:
+        for future in self._forwarded.values():
+            if not future.done():
+                future.set_exception(ConnectionError(reason))
+
+    async def send_raw(self, message: Dict[str, Any]) -> None:
+        """Write one JSON-RPC message to the server's stdin as-is (gateway notifications)."""
+        self._require_session()
+        self.process.stdin.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+        await self.process.stdin.drain()
+
+    async def forward_request(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        Send a raw JSON-RPC request on behalf of a gateway client and return the raw response.
+        The id must be a string unique on this session (the gateway remaps ids); the response is
+        taken off stdout before it reaches our own ClientSession. On timeout the server is told
+        to cancel the request.
+        """
+        forward_id = message["id"]
+        future = asyncio.get_running_loop().create_future()
+        self._forwarded[forward_id] = future
+        try:
+            await self.send_raw(message)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            try:
+                await self.send_raw({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                     "params": {"requestId": forward_id, "reason": "Gateway request timed out"}})
+            except Exception:
+                pass
+            raise
+        finally:
+            self._forwarded.pop(forward_id, None)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        self._closing.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception:
+                pass
+
+    def info(self) -> dict:
+        server_info = self.init_result.serverInfo if self.init_result else None
+        return {
+            "initialized": self.initialized,
+            "server_info": {"name": server_info.name, "version": server_info.version} if server_info else None,
+            "protocol_version": self.init_result.protocolVersion if self.init_result else None,
+            "last_ping_ms": round(self.last_ping_ms, 1) if self.last_ping_ms is not None else None,
+            "last_ping_at": self.last_ping_at,
+            "last_error": self.last_error,
+        }
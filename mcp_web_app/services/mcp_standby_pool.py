@@ -0,0 +1,333 @@
+import os
+import time
+import signal
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+from ..models.models import ServerConfig
+from .mcp_session import ManagedMCPSession
+from .capability_cache import launch_fingerprint
+from .process_manager import spawn_server_process, read_stream_into_log, signal_process_tree
+from .server_logs import server_log_registry
+from .launch_resolver import launch_resolver
+
+logger = logging.getLogger(__name__)
+
+STANDBY_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MCP_STANDBY_MAINTENANCE_INTERVAL_SECONDS", "5"))
+# Leases within this window raise the idle target above min_idle (up to 2x) to absorb bursts
+STANDBY_BURST_WINDOW_SECONDS = float(os.getenv("MCP_STANDBY_BURST_WINDOW_SECONDS", "60"))
+STANDBY_WARM_TIMEOUT_SECONDS = float(os.getenv("MCP_STANDBY_WARM_TIMEOUT_SECONDS", "60"))
+
+class StandbyInstance:
+    """A spawned server process with its MCP handshake done and its tools already loaded."""
+
+    def __init__(self, server_id: str, process: asyncio.subprocess.Process, session: ManagedMCPSession, tools: List[BaseTool]):
+        self.server_id = server_id
+        self.process = process
+        self.session = session
+        self.tools = tools
+        self.created_at = time.time()
+        self.idle_since = self.created_at
+        self.on_close: Optional[Callable[["StandbyInstance"], None]] = None
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None and self.session.initialized
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self.session.close()
+        if self.process.returncode is None:
+            try:
+                signal_process_tree(self.process, signal.SIGTERM)
+                await asyncio.wait_for(self.process.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                signal_process_tree(self.process, signal.SIGKILL)
+                await self.process.wait()
+            except ProcessLookupError:
+                pass
+        if self.on_close is not None:
+            self.on_close(self)
+
+class StandbyPool:
+    """
+    Pre-warmed instances of one stdio MCP server, leased to new agent sessions.
+
+    min_idle instances are kept spawned, initialized and with their tools loaded, so a lease
+    skips the cold start (uvx/npx resolution, interpreter start, MCP handshake). Leases hand
+    the instance over to the session for good; the pool refills in the background. A burst of
+    leases raises the idle target (up to 2 * min_idle); the extra instances are only closed
+    after idling for idle_ttl_seconds, so a short lull doesn't throw them away. max_total
+    (0: no cap) bounds everything the pool has running: idle, warming and still-leased
+    instances. Once it is reached, leases miss and sessions cold-start their own server.
+    """
+
+    def __init__(self, server_id: str, config: ServerConfig):
+        self.server_id = server_id
+        self.config = config
+        self.fingerprint = launch_fingerprint(config)
+        self.min_idle = config.standby.min_idle
+        self.max_total = config.standby.max_total # 0: no cap
+        self.idle_ttl_seconds = config.standby.idle_ttl_seconds
+        self._idle: Deque[StandbyInstance] = deque()
+        self._warming = 0
+        self._leased: Set[StandbyInstance] = set() # Leased instances still running
+        self._lease_times: Deque[float] = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.capped = 0 # Misses because max_total instances were already leased
+        self.warmed = 0
+        self.warm_failures = 0
+        self.shrunk = 0
+        self.warm_ms_ewma: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._consecutive_failures = 0
+        self._retry_at = 0.0 # Warm-up backoff for a server that keeps failing to start
+
+    @property
+    def leased(self) -> int:
+        return len(self._leased)
+
+    def target_idle(self, now: float) -> int:
+        while self._lease_times and now - self._lease_times[0] > STANDBY_BURST_WINDOW_SECONDS:
+            self._lease_times.popleft()
+        target = min(max(self.min_idle, len(self._lease_times)), 2 * self.min_idle)
+        if self.max_total:
+            target = min(target, max(self.max_total - self.leased, 0))
+        return target
+
+    def lease(self) -> Optional[StandbyInstance]:
+        """An initialized instance (now owned by the caller), or None on a pool miss."""
+        now = time.time()
+        self._lease_times.append(now)
+        instance = None
+        if self.max_total and self.leased >= self.max_total:
+            self.misses += 1
+            self.capped += 1
+            return None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.alive:
+                instance = candidate
+                break
+            asyncio.create_task(candidate.close()) # Died while idle
+        if instance is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._leased.add(instance)
+            instance.on_close = self._on_leased_closed
+        self.schedule_refill()
+        return instance
+
+    def _on_leased_closed(self, instance: StandbyInstance) -> None:
+        self._leased.discard(instance)
+        self.schedule_refill() # Frees room under max_total
+
+    def adopt_leased(self, previous: "StandbyPool") -> None:
+        """Take over the still-running leases of the pool this one replaces, so they keep counting against max_total."""
+        for instance in previous._leased:
+            instance.on_close = self._on_leased_closed
+        self._leased.update(previous._leased)
+        previous._leased.clear()
+
+    def schedule_refill(self) -> None:
+        if self._closed or (self._refill_task and not self._refill_task.done()) or time.time() < self._retry_at:
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        deficit = self.target_idle(time.time()) - len(self._idle) - self._warming
+        if deficit <= 0:
+            return
+        self._warming += deficit
+        try:
+            instances = await asyncio.gather(*(self._warm_one() for _ in range(deficit)))
+        finally:
+            self._warming -= deficit
+        for instance in instances:
+            if instance is None:
+                continue
+            if self._closed:
+                await instance.close()
+            else:
+                self._idle.append(instance)
+
+    async def _warm_one(self) -> Optional[StandbyInstance]:
+        started = time.perf_counter()
+        process = None
+        session = None
+        try:
+            process = await spawn_server_process(self.config, launch_resolver.get(self.server_id, self.config))
+            log_buffer = server_log_registry.get_or_create(f"{self.server_id}:standby")
+            asyncio.create_task(read_stream_into_log(process.stderr, self.server_id, log_buffer, "stderr"))
+            session = ManagedMCPSession(self.server_id, process, log_buffer=log_buffer)
+            if not await session.start(timeout=STANDBY_WARM_TIMEOUT_SECONDS):
+                raise RuntimeError(session.last_error or "MCP initialize failed")
+            tools = await load_mcp_tools(session.session)
+        except Exception as e:
+            self.warm_failures += 1
+            self._consecutive_failures += 1
+            self._retry_at = time.time() + min(2 ** self._consecutive_failures, 300)
+            self.last_error = f"{type(e).__name__}: {e}"[:500]
+            logger.warning(f"Standby instance of {self.server_id} failed to warm up: {self.last_error}")
+            if session is not None:
+                await session.close()
+            if process is not None and process.returncode is None:
+                signal_process_tree(process, signal.SIGKILL)
+                await process.wait()
+            return None
+        warm_ms = (time.perf_counter() - started) * 1000
+        self.warm_ms_ewma = warm_ms if self.warm_ms_ewma is None else 0.8 * self.warm_ms_ewma + 0.2 * warm_ms
+        self.warmed += 1
+        self._consecutive_failures = 0
+        logger.info(f"Standby instance of {self.server_id} ready (PID: {process.pid}, {warm_ms:.0f}ms, {len(tools)} tools).")
+        return StandbyInstance(self.server_id, process, session, tools)
+
+    async def shrink(self) -> None:
+        """Close idle instances beyond the target that have been idle longer than idle_ttl_seconds."""
+        now = time.time()
+        excess = len(self._idle) - self.target_idle(now)
+        while excess > 0 and self._idle and now - self._idle[0].idle_since > self.idle_ttl_seconds:
+            instance = self._idle.popleft()
+            excess -= 1
+            self.shrunk += 1
+            await instance.close()
+        dead = [instance for instance in self._idle if not instance.alive]
+        for instance in dead:
+            self._idle.remove(instance)
+            await instance.close()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        idle, self._idle = list(self._idle), deque()
+        await asyncio.gather(*(instance.close() for instance in idle), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        leases = self.hits + self.misses
+        return {
+            "min_idle": self.min_idle,
+            "max_total": self.max_total,
+            "idle": len(self._idle),
+            "warming": self._warming,
+            "leased": self.leased,
+            "total": len(self._idle) + self._warming + self.leased,
+            "target_idle": self.target_idle(time.time()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "capped": self.capped,
+            "hit_rate": round(self.hits / leases, 3) if leases else None,
+            "warmed": self.warmed,
+            "warm_failures": self.warm_failures,
+            "shrunk": self.shrunk,
+            "warm_ms_ewma": round(self.warm_ms_ewma, 1) if self.warm_ms_ewma is not None else None,
+            "last_error": self.last_error,
+        }
+
+class StandbyPoolManager:
+    """
+    Standby pools of all stdio servers whose config has a standby section, kept in sync with the configs.
+    A server the MCP gateway fronts gets no pool: its agent sessions use the managed process instead.
+    """
+
+    def __init__(self):
+        self._config_manager = None
+        self.gateway = None # MCPGateway, set by the app
+        self._pools: Dict[str, StandbyPool] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, config_manager) -> None:
+        self._config_manager = config_manager
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"MCP standby pool manager started (maintenance every {STANDBY_MAINTENANCE_INTERVAL_SECONDS:.0f}s).")
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        pools, self._pools = list(self._pools.values()), {}
+        await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
+
+    async def _sync_configs(self) -> None:
+        """Create, rebuild (launch fingerprint changed) or drop pools to match the server configs."""
+        wanted: Dict[str, ServerConfig] = {
+            server_id: config for server_id, config in self._config_manager.get_all_tool_server_configs().items()
+            if config.standby is not None and config.standby.min_idle > 0 and config.transport == "stdio"
+            and not (self.gateway is not None and self.gateway.fronts(server_id, config))
+        }
+        replaced: Dict[str, StandbyPool] = {}
+        for server_id in list(self._pools):
+            pool = self._pools[server_id]
+            config = wanted.get(server_id)
+            if config is None or launch_fingerprint(config) != pool.fingerprint or config.standby != pool.config.standby:
+                del self._pools[server_id]
+                replaced[server_id] = pool
+                await pool.close()
+        for server_id, config in wanted.items():
+            if server_id not in self._pools:
+                self._pools[server_id] = StandbyPool(server_id, config)
+                if server_id in replaced:
+                    self._pools[server_id].adopt_leased(replaced[server_id])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._sync_configs()
+                for pool in list(self._pools.values()):
+                    await pool.shrink()
+                    pool.schedule_refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MCP standby pool maintenance error: {e}", exc_info=True)
+            await asyncio.sleep(STANDBY_MAINTENANCE_INTERVAL_SECONDS)
+
+    def lease(self, server_id: str) -> Optional[StandbyInstance]:
+        pool = self._pools.get(server_id)
+        return pool.lease() if pool else None
+
+    def attach_to_client(self, mcp_client: Any) -> List[str]:
+        """
+        Serve a MultiServerMCPClient's stdio connections from standby instances where possible.
+        Leased servers are wired in as ready sessions (and closed with the client's exit stack)
+        and removed from its connections, so __aenter__ only cold-starts the pool misses.
+        """
+        leased = []
+        for server_name, connection in list(mcp_client.connections.items()):
+            if connection.get("transport") != "stdio":
+                continue # e.g. served by the MCP gateway
+            instance = self.lease(server_name)
+            if instance is None:
+                continue
+            mcp_client.sessions[server_name] = instance.session.session
+            mcp_client.server_name_to_tools[server_name] = instance.tools
+            mcp_client.exit_stack.push_async_callback(instance.close)
+            del mcp_client.connections[server_name]
+            leased.append(server_name)
+        return leased
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {server_id: pool.stats() for server_id, pool in self._pools.items()}
+
+standby_pool_manager = StandbyPoolManager()
@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.ollama import list_running_ollama_models_helper, load_ollama_model_helper
+
+logger = logging.getLogger(__name__)
+
+RESIDENCY_POLL_SECONDS = float(os.getenv("MCP_OLLAMA_RESIDENCY_POLL_SECONDS", "30"))
+# A model used within this window counts as hot and is kept (re)loaded
+HOT_WINDOW_SECONDS = float(os.getenv("MCP_OLLAMA_HOT_WINDOW_SECONDS", "900"))
+# Never evict (by preloading another model) a model used more recently than this
+MIN_RESIDENCY_SECONDS = float(os.getenv("MCP_OLLAMA_MIN_RESIDENCY_SECONDS", "120"))
+DEFAULT_MAX_RESIDENT_MODELS = int(os.getenv("MCP_OLLAMA_MAX_RESIDENT_MODELS", "1"))
+
+def _normalize_model_name(model: str) -> str:
+    """Ollama reports 'llama3' as 'llama3:latest'."""
+    return model if ":" in model else f"{model}:latest"
+
+class ModelResidency:
+    """What we know about one model on one Ollama host."""
+
+    def __init__(self, base_url: str, model: str):
+        self.base_url = base_url
+        self.model = model
+        self.config_ids: List[str] = []
+        self.keep_alive: Optional[Any] = None
+        self.preload = False
+        self.resident = False
+        self.size_vram: Optional[int] = None
+        self.expires_at: Optional[str] = None
+        self.last_load_seconds: Optional[float] = None
+        self.last_loaded_at: Optional[float] = None
+        self.last_used_at: Optional[float] = None
+        self.preloads = 0
+        self.last_error: Optional[str] = None
+
+    def is_hot(self, now: float) -> bool:
+        return self.preload or (self.last_used_at is not None and now - self.last_used_at <= HOT_WINDOW_SECONDS)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "config_ids": self.config_ids,
+            "resident": self.resident,
+            "size_vram": self.size_vram,
+            "expires_at": self.expires_at,
+            "keep_alive": self.keep_alive,
+            "preload": self.preload,
+            "last_load_seconds": round(self.last_load_seconds, 2) if self.last_load_seconds is not None else None,
+            "last_loaded_at": self.last_loaded_at,
+            "last_used_at": self.last_used_at,
+            "preloads": self.preloads,
+            "last_error": self.last_error,
+        }
+
+class OllamaResidencyManager:
+    """
+    Keeps hot Ollama models loaded so the first request after a quiet period doesn't pay the model load.
+
+    A background loop polls /api/ps on every configured Ollama host and preloads hot models
+    (configs with preload=true, or models used within the hot window) with their keep_alive.
+    To avoid thrashing a shared GPU box, at most max_resident_models are kept per host, loads on
+    a host are serialized, and a preload never evicts a model that was used very recently.
+    """
+
+    def __init__(self):
+        self._config_manager = None
+        self._models: Dict[Tuple[str, str], ModelResidency] = {}
+        self._max_resident: Dict[str, int] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_poll_at: Optional[float] = None
+
+    def start(self, config_manager) -> None:
+        self._config_manager = config_manager
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Ollama residency manager started (poll every {RESIDENCY_POLL_SECONDS:.0f}s).")
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _sync_configs(self) -> None:
+        """Pick up the Ollama LLM configs (model, keep_alive, preload, per-host limit)."""
+        seen = set()
+        self._max_resident = {}
+        for llm_config in (self._config_manager.get_llm_configs() if self._config_manager else []):
+            if llm_config.provider != "ollama" or not llm_config.ollama_config:
+                continue
+            ollama_config = llm_config.ollama_config
+            base_url = ollama_config.base_url.rstrip('/')
+            key = (base_url, _normalize_model_name(ollama_config.model))
+            residency = self._models.get(key)
+            if residency is None:
+                residency = self._models[key] = ModelResidency(*key)
+            if key not in seen:
+                residency.config_ids, residency.preload, residency.keep_alive = [], False, None
+                seen.add(key)
+            residency.config_ids.append(llm_config.config_id)
+            residency.preload = residency.preload or bool(ollama_config.preload)
+            residency.keep_alive = ollama_config.keep_alive if ollama_config.keep_alive is not None else residency.keep_alive
+            if ollama_config.max_resident_models:
+                # Several configs on one host: the strictest limit wins
+                self._max_resident[base_url] = min(self._max_resident.get(base_url, ollama_config.max_resident_models), ollama_config.max_resident_models)
+        for key in [key for key in self._models if key not in seen]:
+            del self._models[key]
+
+    def touch(self, base_url: str, model: str) -> None:
+        """Record that a request is using this model (keeps it hot)."""
+        key = (base_url.rstrip('/'), _normalize_model_name(model))
+        residency = self._models.get(key)
+        if residency is None:
+            residency = self._models[key] = ModelResidency(*key)
+        residency.last_used_at = time.time()
+
+    async def refresh(self) -> None:
+        """Poll /api/ps on every host and update residency."""
+        self._sync_configs()
+        for base_url in {base_url for base_url, _model in self._models}:
+            result = await list_running_ollama_models_helper(base_url)
+            if not result.get("success"):
+                logger.debug(f"Ollama residency: cannot poll {base_url}: {result.get('message')}")
+                continue
+            running = {_normalize_model_name(entry.get("name") or entry.get("model", "")): entry for entry in result["models"]}
+            for (host, model), residency in self._models.items():
+                if host != base_url:
+                    continue
+                entry = running.get(model)
+                residency.resident = entry is not None
+                residency.size_vram = entry.get("size_vram") if entry else None
+                residency.expires_at = entry.get("expires_at") if entry else None
+        self.last_poll_at = time.time()
+
+    async def preload(self, base_url: str, model: str, force: bool = False) -> Dict[str, Any]:
+        """Load a model (honouring the host's residency limit unless forced)."""
+        key = (base_url.rstrip('/'), _normalize_model_name(model))
+        residency = self._models.get(key) or ModelResidency(*key)
+        self._models.setdefault(key, residency)
+        lock = self._host_locks.setdefault(key[0], asyncio.Lock())
+        async with lock: # One load at a time per GPU box
+            if not force and not self._may_load(residency):
+                return {"success": False, "message": f"Not loading '{residency.model}': would evict a recently used model on {residency.base_url}."}
+            started = time.time()
+            result = await load_ollama_model_helper(residency.base_url, residency.model, residency.keep_alive)
+            if result.get("success"):
+                residency.resident = True
+                residency.preloads += 1
+                residency.last_loaded_at = time.time()
+                residency.last_load_seconds = result.get("load_seconds") or (time.time() - started)
+                residency.last_error = None
+                logger.info(f"Ollama residency: loaded '{residency.model}' on {residency.base_url} in {residency.last_load_seconds:.1f}s (keep_alive={residency.keep_alive}).")
+            else:
+                residency.last_error = result.get("message")
+                logger.warning(f"Ollama residency: failed to load '{residency.model}' on {residency.base_url}: {residency.last_error}")
+            return result
+
+    def _may_load(self, residency: ModelResidency) -> bool:
+        if residency.resident:
+            return True
+        now = time.time()
+        resident = [other for (host, _m), other in self._models.items() if host == residency.base_url and other.resident]
+        if len(resident) < self._max_resident.get(residency.base_url, DEFAULT_MAX_RESIDENT_MODELS):
+            return True
+        # Loading will push something out: only if every resident model has been idle long enough
+        return all(other.last_used_at is None or now - other.last_used_at >= MIN_RESIDENCY_SECONDS for other in resident)
+
+    async def _reconcile(self) -> None:
+        now = time.time()
+        for base_url in {base_url for base_url, _model in self._models}:
+            limit = self._max_resident.get(base_url, DEFAULT_MAX_RESIDENT_MODELS)
+            hot = sorted(
+                (residency for (host, _m), residency in self._models.items() if host == base_url and residency.is_hot(now)),
+                key=lambda residency: residency.last_used_at or 0.0,
+                reverse=True,
+            )[:limit]
+            for residency in hot:
+                if not residency.resident:
+                    await self.preload(residency.base_url, residency.model)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                await self._reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ollama residency loop error: {e}", exc_info=True)
+            await asyncio.sleep(RESIDENCY_POLL_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "last_poll_at": self.last_poll_at,
+            "max_resident_models": {host: self._max_resident.get(host, DEFAULT_MAX_RESIDENT_MODELS) for host, _model in self._models},
+            "models": [residency.info() for residency in self._models.values()],
+        }
+
+ollama_residency_manager = OllamaResidencyManager()
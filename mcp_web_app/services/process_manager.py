@@ -1,16 +1,178 @@
+import time
+import signal
 import asyncio
-from typing import Dict, Optional, Any
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+from mcp import types
+from mcp.shared.exceptions import McpError
 from ..models.models import ServerConfig
+from .mcp_session import ManagedMCPSession, STDIO_LINE_LIMIT
+from .capability_cache import CapabilityCache, launch_fingerprint
+from .server_logs import ServerLogBuffer, ServerLogRegistry, server_log_registry, SERVER_LOG_YIELD_EVERY_LINES
+from .event_bus import EventBus, server_event_bus
+from .launch_resolver import LaunchResolver, launch_resolver as default_launch_resolver
 import os 
 import logging
 
 logger = logging.getLogger(__name__) 
 
+# SIGTERM grace before SIGKILL; stop_all applies it once to all servers together
+SERVER_STOP_TIMEOUT_SECONDS = float(os.getenv("MCP_SERVER_STOP_TIMEOUT_SECONDS", "5"))
+# Each server leads its own process group, so stopping it also reaches wrapper children
+NEW_PROCESS_GROUP = os.name == "posix"
+
+async def spawn_server_process(config: ServerConfig, resolved_launch: Optional[Dict[str, Any]] = None) -> asyncio.subprocess.Process:
+    """
+    Launch a stdio MCP server with piped stdin/stdout/stderr (shared by managed and standby instances).
+    With a resolved_launch from the launch resolver, exec what npx/uvx would have run, directly.
+    """
+    current_env = os.environ.copy()
+    config_env = getattr(config, 'env', None) or {}
+    current_env.update(config_env)
+    use_shell = getattr(config, 'shell', False)
+
+    if resolved_launch is not None:
+        current_env.update(resolved_launch.get("env") or {})
+        current_env.update(config_env) # The config's own env still wins
+        logger.debug(f"Starting resolved launch: {resolved_launch['argv']}")
+        return await asyncio.create_subprocess_exec(
+            *resolved_launch["argv"],
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=current_env,
+            cwd=resolved_launch.get("cwd") or None,
+            limit=STDIO_LINE_LIMIT,
+            start_new_session=NEW_PROCESS_GROUP
+        )
+
+    if use_shell:
+        full_command_str = config.command
+        if config.args:
+            full_command_str += " " + " ".join(config.args)
+        logger.debug(f"Starting with shell: {full_command_str}")
+        return await asyncio.create_subprocess_shell(
+            full_command_str,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=current_env,
+            limit=STDIO_LINE_LIMIT,
+            start_new_session=NEW_PROCESS_GROUP
+        )
+    logger.debug(f"Starting with exec: {config.command} {config.args}")
+    return await asyncio.create_subprocess_exec(
+        config.command,
+        *config.args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=current_env,
+        limit=STDIO_LINE_LIMIT,
+        start_new_session=NEW_PROCESS_GROUP
+    )
+
+def signal_process_tree(process: asyncio.subprocess.Process, sig: int) -> None:
+    """Signal the server's whole process group (e.g. the node process behind npx), else just the process."""
+    if NEW_PROCESS_GROUP:
+        try:
+            os.killpg(process.pid, sig)
+            return
+        except (ProcessLookupError, PermissionError):
+            pass
+    process.send_signal(sig)
+
+async def read_stream_into_log(stream: Optional[asyncio.StreamReader], server_id: str, log_buffer: ServerLogBuffer, stream_name: str):
+    """Capture a pipe line by line into the server's log buffer (raw bytes, decoded on read)."""
+    if not stream:
+        logger.warning(f"Stream {stream_name} for {server_id} is None.")
+        return
+    try:
+        lines_read = 0
+        while True:
+            line = await stream.readline()
+            if not line:
+                logger.debug(f"{stream_name} stream for {server_id} ended.")
+                break
+            log_buffer.append(stream_name, line.rstrip(b"\r\n"))
+            lines_read += 1
+            if lines_read % SERVER_LOG_YIELD_EVERY_LINES == 0:
+                await asyncio.sleep(0) # readline() doesn't yield while the pipe has buffered lines
+    except Exception as e:
+        logger.error(f"Error reading {stream_name} for {server_id}: {e}", exc_info=True)
+
 class ProcessManager:
-    def __init__(self):
+    def __init__(self, capability_cache: Optional[CapabilityCache] = None, log_registry: Optional[ServerLogRegistry] = None,
+                 event_bus: Optional[EventBus] = None, launch_resolver: Optional[LaunchResolver] = None):
         self._active_processes: Dict[str, asyncio.subprocess.Process] = {}
         self._server_status: Dict[str, str] = {}
         self._discovered_capabilities: Dict[str, list] = {}  # server_id -> list of tools
+        self._capabilities_source: Dict[str, str] = {}  # server_id -> "cache" or "live"
+        self._sessions: Dict[str, ManagedMCPSession] = {}  # server_id -> MCP session over the process pipes
+        self._configs: Dict[str, ServerConfig] = {}  # server_id -> config it was started with
+        self._capability_cache = capability_cache or CapabilityCache()
+        self._logs = log_registry or server_log_registry  # Server stdout/stderr, kept out of the app log
+        self._desired_running: set = set()  # Servers that should be running (started and not stopped on purpose)
+        self._started_at: Dict[str, float] = {}  # server_id -> when the current process was spawned
+        self._exit_listeners: List[Callable[[str, Optional[int], bool], Awaitable[None]]] = []
+        self._status_providers: Dict[str, Callable[[str], Optional[Dict[str, Any]]]] = {}  # Extra status sections, e.g. "health"
+        self.events = event_bus or server_event_bus  # Live status/capability/resource changes for dashboards
+        self._launch_resolver = launch_resolver or default_launch_resolver  # Direct exec of what npx/uvx resolved to
+        self._launch_mode: Dict[str, str] = {}  # server_id -> "original" or "resolved"
+        self._spawn_started: Dict[str, float] = {}  # server_id -> perf_counter at spawn, until the first handshake
+        self.add_status_provider("launch", self._launch_info)
+
+    def add_exit_listener(self, listener: Callable[[str, Optional[int], bool], Awaitable[None]]) -> None:
+        """Called as listener(server_id, return_code, intentional) whenever a managed process exits."""
+        self._exit_listeners.append(listener)
+
+    def add_status_provider(self, key: str, provider: Callable[[str], Optional[Dict[str, Any]]]) -> None:
+        """Adds status[key] = provider(server_id) to get_server_status (supervisor health, resource use)."""
+        self._status_providers[key] = provider
+
+    def publish_event(self, topic: str, server_id: str, data: Any) -> None:
+        """Push a change about a server to live subscribers (also used by the supervisor and resource sampler)."""
+        self.events.publish(topic, server_id, data)
+
+    def _set_status(self, server_id: str, status: str) -> None:
+        previous = self._server_status.get(server_id)
+        self._server_status[server_id] = status
+        if status != previous:
+            self.publish_event("status", server_id, {"status": status, "previous": previous, "pid": self.get_server_pid(server_id)})
+
+    def _set_capabilities(self, server_id: str, tools: list, source: Optional[str] = None) -> None:
+        self._discovered_capabilities[server_id] = tools
+        if source is not None:
+            self._capabilities_source[server_id] = source
+        self.publish_event("capabilities", server_id, {"source": self._capabilities_source.get(server_id) if tools else None,
+                                                       "tools": tools})
+
+    def get_server_config(self, server_id: str) -> Optional[ServerConfig]:
+        return self._configs.get(server_id)
+
+    def is_desired_running(self, server_id: str) -> bool:
+        return server_id in self._desired_running
+
+    def get_started_at(self, server_id: str) -> Optional[float]:
+        return self._started_at.get(server_id) if self.is_server_running(server_id) else None
+
+    def set_server_status(self, server_id: str, status: str, require_running: bool = True) -> None:
+        """Health-driven status change (never overrides a stop in progress)."""
+        if require_running and not self.is_server_running(server_id):
+            return
+        if self._server_status.get(server_id) != "stopping":
+            self._set_status(server_id, status)
+
+    def prime_capabilities_from_cache(self, server_configs: Dict[str, ServerConfig]) -> int:
+        """At boot: serve each server's last known tools (if its launch fingerprint still matches)."""
+        primed = 0
+        for server_id, config in server_configs.items():
+            tools = self._capability_cache.get(server_id, launch_fingerprint(config))
+            if tools is not None and server_id not in self._discovered_capabilities:
+                self._set_capabilities(server_id, tools, "cache")
+                primed += 1
+        logger.info(f"Primed capabilities of {primed}/{len(server_configs)} servers from {self._capability_cache.path}.")
+        return primed
 
     async def start_server(self, server_id: str, config: ServerConfig) -> Optional[int]:
         if self.is_server_running(server_id):
@@ -18,103 +180,97 @@ class ProcessManager:
             process = self._active_processes.get(server_id)
             return process.pid if process and isinstance(process, asyncio.subprocess.Process) else None
 
+        resolved_launch = self._launch_resolver.get(server_id, config)
         try:
-            logger.info(f"Attempting to start server {server_id}: {config.command} {' '.join(config.args)}")
-            
-            current_env = os.environ.copy()
-            config_env = getattr(config, 'env', {})
-            current_env.update(config_env)
-            use_shell = getattr(config, 'shell', False)
-            process: asyncio.subprocess.Process
-
-            if use_shell:
-                full_command_str = config.command
-                if config.args:
-                    full_command_str += " " + " ".join(config.args)
-                logger.debug(f"Starting with shell: {full_command_str}")
-                process = await asyncio.create_subprocess_shell(
-                    full_command_str,
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    env=current_env
-                )
-            else:
-                logger.debug(f"Starting with exec: {config.command} {config.args}")
-                process = await asyncio.create_subprocess_exec(
-                    config.command,
-                    *config.args,
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    env=current_env
-                )
+            logger.info(f"Attempting to start server {server_id}: {config.command} {' '.join(config.args)}"
+                        + (f" (resolved: {' '.join(resolved_launch['argv'])})" if resolved_launch else ""))
+            spawn_started = time.perf_counter()
+            process = await spawn_server_process(config, resolved_launch)
             
             logger.info(f"Subprocess for {server_id} created with PID {process.pid}.")
+            log_buffer = self._logs.get_or_create(server_id)
+            if resolved_launch:
+                log_buffer.append_system(f"Started PID {process.pid} (resolved launch): {' '.join(resolved_launch['argv'])}")
+            else:
+                log_buffer.append_system(f"Started PID {process.pid}: {config.command} {' '.join(config.args)}")
             self._active_processes[server_id] = process
-            self._server_status[server_id] = "connecting"
+            self._configs[server_id] = config
+            self._desired_running.add(server_id)
+            self._started_at[server_id] = time.time()
+            self._spawn_started[server_id] = spawn_started
+            self._launch_mode[server_id] = "resolved" if resolved_launch else "original"
+            self._set_status(server_id, "connecting")
             
-            asyncio.create_task(self._read_stream(process.stdout, server_id, "STDOUT"))
-            asyncio.create_task(self._read_stream(process.stderr, server_id, "STDERR"))
+            # stdout carries the MCP protocol: the managed session reads it (and logs non-protocol lines)
+            self._sessions[server_id] = ManagedMCPSession(server_id, process, message_handler=partial(self._on_server_message, server_id),
+                                                          log_buffer=log_buffer)
+            asyncio.create_task(read_stream_into_log(process.stderr, server_id, log_buffer, "stderr"))
             asyncio.create_task(self._monitor_process(server_id, process))
 
             await asyncio.sleep(0.2) # Give a moment for the process to start or fail
             
-            if process.returncode is None: # Still running
-                self._server_status[server_id] = "connected"
+            if process.returncode is None: # Still running; "connected" once the MCP handshake succeeds
                 logger.info(f"Server {server_id} (PID: {process.pid}) started successfully and appears to be running.")
+                cached_tools = self._capability_cache.get(server_id, launch_fingerprint(config))
+                if cached_tools is not None:
+                    # Answer from cache right away; the discovery below revalidates it
+                    self._set_capabilities(server_id, cached_tools, "cache")
                 # Schedule background discovery of capabilities
                 asyncio.create_task(self.discover_and_store_capabilities(server_id, config))
                 return process.pid
             else:
-                self._server_status[server_id] = "error"
-                logger.error(f"Server {server_id} (PID: {process.pid}) failed to start or exited immediately. Exit code: {process.returncode}")
                 if server_id in self._active_processes:
                     del self._active_processes[server_id] # Clean up
+                if resolved_launch:
+                    self._launch_resolver.invalidate(server_id, f"resolved launch exited immediately with code {process.returncode}")
+                    return await self.start_server(server_id, config) # Fall back to the original command
+                self._set_status(server_id, "error")
+                logger.error(f"Server {server_id} (PID: {process.pid}) failed to start or exited immediately. Exit code: {process.returncode}")
                 return None
 
         except Exception as e:
-            self._server_status[server_id] = "error"
+            if resolved_launch:
+                self._launch_resolver.invalidate(server_id, f"resolved launch failed: {e}")
+                return await self.start_server(server_id, config)
+            self._set_status(server_id, "error")
             logger.error(f"Exception during server {server_id} start: {e}", exc_info=True)
             return None
 
-    async def _read_stream(self, stream: Optional[asyncio.StreamReader], server_id: str, stream_name: str):
-        if not stream:
-            logger.warning(f"Stream {stream_name} for {server_id} is None.")
-            return
-        try:
-            while True:
-                line = await stream.readline()
-                if line:
-                    logger.info(f"[{server_id} {stream_name}]: {line.decode(errors='ignore').strip()}")
-                else:
-                    logger.info(f"{stream_name} stream for {server_id} ended.")
-                    break
-        except Exception as e:
-            logger.error(f"Error reading {stream_name} for {server_id}: {e}", exc_info=True)
-
     async def _monitor_process(self, server_id: str, process: asyncio.subprocess.Process):
         pid_for_logging = process.pid
         try:
             return_code = await process.wait()
             logger.info(f"Server {server_id} (PID: {pid_for_logging}) exited with code {return_code}.")
+            self._logs.get_or_create(server_id).append_system(f"PID {pid_for_logging} exited with code {return_code}")
         except Exception as e:
             logger.error(f"Exception while waiting for process {server_id} (PID: {pid_for_logging}): {e}", exc_info=True)
             # Process might be gone or other issue
         finally:
             # Ensure cleanup regardless of how wait() concludes
-            if self._active_processes.get(server_id) == process:
+            superseded = self._active_processes.get(server_id) is not process # Stopped (and maybe restarted) already
+            if not superseded:
                 del self._active_processes[server_id]
+            session = self._sessions.get(server_id)
+            if session is not None and session.process is process:
+                del self._sessions[server_id]
+                await session.close()
             
             # Update status based on exit, unless it was intentionally stopped
             current_status = self._server_status.get(server_id)
-            if current_status != "stopping": # if not being stopped by user
+            intentional = superseded or current_status == "stopping" or server_id not in self._desired_running
+            if not intentional: # if not being stopped by user
                 if process.returncode != 0:
-                    self._server_status[server_id] = "error"
-                    logger.warning(f"Server {server_id} (PID: {pid_for_logging}) status set to 'error' (exit code {process.returncode}).")
+                    self._set_status(server_id, "error")
+                    logger.warning(f"Server {server_id} (PID: {pid_for_logging}) status set to 'error' (exit code {process.returncode}). "
+                                   f"Last stderr: {self._logs.get_or_create(server_id).last_lines_text(5, 'stderr') or '(none)'}")
                 else:
-                    self._server_status[server_id] = "disconnected"
+                    self._set_status(server_id, "disconnected")
                     logger.info(f"Server {server_id} (PID: {pid_for_logging}) status set to 'disconnected'.")
+            for listener in self._exit_listeners:
+                try:
+                    await listener(server_id, process.returncode, intentional)
+                except Exception as e_listener:
+                    logger.error(f"Exit listener failed for {server_id}: {e_listener}", exc_info=True)
 
     async def refresh_capabilities(self, server_id: str, config):
         """Refresh the capabilities of a running server."""
@@ -124,35 +280,44 @@ class ProcessManager:
         
         try:
             logger.info(f"Refreshing capabilities for server {server_id}")
-            await self.discover_and_store_capabilities(server_id, config)
-            return True
+            return await self.discover_and_store_capabilities(server_id, config)
         except Exception as e:
             logger.error(f"Error refreshing capabilities for {server_id}: {e}", exc_info=True)
             return False
 
-    async def stop_server(self, server_id: str):
+    async def stop_server(self, server_id: str, timeout: float = SERVER_STOP_TIMEOUT_SECONDS) -> Optional[str]:
+        """Stop a server (SIGTERM, SIGKILL after `timeout`); returns "terminated", "killed" or "exited", None if not running."""
+        self._desired_running.discard(server_id)
         process = self._active_processes.get(server_id)
         if not process:
             logger.info(f"Server {server_id} not found in active processes or already stopped.")
-            self._server_status[server_id] = "disconnected" # Ensure status consistency
-            return
+            self._set_status(server_id, "disconnected") # Ensure status consistency
+            return None
 
         if process.returncode is not None:
             logger.info(f"Server {server_id} (PID: {process.pid}) was already stopped (exit code {process.returncode}). Removing from active list.")
             del self._active_processes[server_id]
-            self._server_status[server_id] = "disconnected"
-            return
+            self._set_status(server_id, "disconnected")
+            return None
 
         logger.info(f"Attempting to stop server {server_id} (PID: {process.pid}).")
-        self._server_status[server_id] = "stopping"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self._set_status(server_id, "stopping")
+        session = self._sessions.pop(server_id, None)
+        outcome = "exited"
         try:
-            process.terminate()
-            await asyncio.wait_for(process.wait(), timeout=5.0)
+            signal_process_tree(process, signal.SIGTERM) # First, so a session stuck mid-request can't eat into the grace period
+            if session is not None:
+                await session.close(timeout=max(deadline - loop.time(), 0.1)) # Ends with the process's stdout
+            await asyncio.wait_for(process.wait(), timeout=max(deadline - loop.time(), 0.1))
+            outcome = "terminated"
             logger.info(f"Server {server_id} (PID: {process.pid}) terminated gracefully.")
         except asyncio.TimeoutError:
             logger.warning(f"Server {server_id} (PID: {process.pid}) did not terminate, killing.")
-            process.kill()
+            signal_process_tree(process, signal.SIGKILL)
             await process.wait() # Give kill a chance to be processed
+            outcome = "killed"
             logger.info(f"Server {server_id} (PID: {process.pid}) killed.")
         except ProcessLookupError:
             logger.warning(f"ProcessLookupError for server {server_id} (PID: {process.pid}) during stop. Already gone?")
@@ -160,10 +325,30 @@ class ProcessManager:
             logger.error(f"Exception stopping server {server_id} (PID: {process.pid}): {e}", exc_info=True)
         finally:
             # Final cleanup and status update
-            if server_id in self._active_processes:
+            if self._active_processes.get(server_id) is process:
                 del self._active_processes[server_id]
-            self._server_status[server_id] = "disconnected"
+            self._set_status(server_id, "disconnected")
             logger.info(f"Server {server_id} definitively marked as stopped and disconnected.")
+        return outcome
+
+    async def stop_all(self, timeout: float = SERVER_STOP_TIMEOUT_SECONDS) -> Dict[str, Any]:
+        """
+        Stop every running server at once: all get SIGTERM together and whatever is still alive
+        when the shared `timeout` runs out gets SIGKILL, so shutdown takes at most ~timeout
+        instead of timeout per server. Returns which PIDs exited how.
+        """
+        started = time.perf_counter()
+        pids = {server_id: self.get_server_pid(server_id) for server_id in self.get_running_server_ids()}
+        outcomes = await asyncio.gather(*(self.stop_server(server_id, timeout=timeout) for server_id in pids), return_exceptions=True)
+        report: Dict[str, Any] = {"terminated": {}, "killed": {}, "exited": {}, "failed": {}}
+        for (server_id, pid), outcome in zip(pids.items(), outcomes):
+            if isinstance(outcome, BaseException):
+                report["failed"][server_id] = f"{type(outcome).__name__}: {outcome}"
+            else:
+                report[outcome or "exited"][server_id] = pid
+        report["still_running"] = self.get_running_server_ids()
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return report
 
     def get_server_status(self, server_id: str) -> Dict[str, Any]:
         status_str = "disconnected"
@@ -180,13 +365,17 @@ class ProcessManager:
             # PID is not relevant or available if not running
             
         capabilities = self._discovered_capabilities.get(server_id, [])
+        session = self._sessions.get(server_id)
         
         return {
             "server_name": server_id,
             "status": status_str,
             "pid": pid,
             "message": f"Server is {status_str}", # Generic message, can be enhanced
-            "discovered_capabilities": capabilities
+            "discovered_capabilities": capabilities,
+            "capabilities_source": self._capabilities_source.get(server_id) if capabilities else None,
+            "mcp_session": session.info() if session else None,
+            **{key: provider(server_id) for key, provider in self._status_providers.items()}
             # Consider adding "url" and "last_ping" if ProcessManager tracks them
         }
 
@@ -196,79 +385,144 @@ class ProcessManager:
             return process.returncode is None
         return False
 
+    def get_running_server_ids(self) -> List[str]:
+        return [server_id for server_id in list(self._active_processes) if self.is_server_running(server_id)]
+
     def get_server_pid(self, server_id: str) -> Optional[int]:
         process = self._active_processes.get(server_id)
         if process and isinstance(process, asyncio.subprocess.Process) and process.returncode is None:
             return process.pid
         return None
 
-    async def discover_and_store_capabilities(self, server_id: str, config: ServerConfig):
-        """Connect to the running server and call list_tools(), storing the result."""
+    async def _ensure_session(self, server_id: str) -> Optional[ManagedMCPSession]:
+        """The server's MCP session, running the initialize handshake on first use."""
+        session = self._sessions.get(server_id)
+        if session is None or not self.is_server_running(server_id):
+            return None
+        if not session.initialized and not await session.start():
+            logger.error(f"[MCP] Could not initialize MCP session for {server_id}: {session.last_error}")
+            if self._launch_mode.get(server_id) == "resolved" and session.process is self._active_processes.get(server_id):
+                self._launch_resolver.invalidate(server_id, "no MCP handshake over the resolved launch")
+            return None
+        if self._server_status.get(server_id) == "connecting":
+            self.set_server_status(server_id, "connected") # Handshake done: the server actually answers
+        spawn_started = self._spawn_started.pop(server_id, None)
+        if spawn_started is not None: # First handshake of this process
+            self._on_first_ready(server_id, session.process, (time.perf_counter() - spawn_started) * 1000)
+        return session
+
+    def _on_first_ready(self, server_id: str, process: asyncio.subprocess.Process, ready_ms: float) -> None:
+        config = self._configs.get(server_id)
+        if config is None or not self._launch_resolver.applies_to(config):
+            return
+        mode = self._launch_mode.get(server_id, "original")
+        self._launch_resolver.record_ready(server_id, mode, ready_ms)
+        logger.info(f"Server {server_id} ready {ready_ms:.0f}ms after spawn ({mode} launch).")
+        if mode == "original":
+            asyncio.create_task(self._launch_resolver.capture(server_id, config, process.pid))
+        elif self._launch_resolver.begin_revalidation(server_id):
+            asyncio.create_task(self._revalidate_launch(server_id, config))
+
+    async def _revalidate_launch(self, server_id: str, config: ServerConfig) -> None:
+        """
+        Run the original npx/uvx command once on the side (handshake only) and record what it
+        resolves to now, so a package update or changed resolution replaces the cached launch.
+        """
+        process = None
+        session = None
         try:
-            from mcp import ClientSession, StdioServerParameters
-            from mcp.client.stdio import stdio_client
-            import asyncio
-            import os
-
-            # Set up a new client connection for tool discovery rather than using the running process
-            # This prevents the "method:initialize" command from going to stderr
-            command = config.command
-            args = config.args or []
-            cwd = getattr(config, 'cwd', None)
-            env = getattr(config, 'env', None)
-            
-            # We'll use the exact same command that started the server for npx commands
-            # This ensures we have the same execution environment with the same packages
-            if command == "npx":
-                logger.info(f"[MCP] Using npx for capability discovery: {command} {args}")
-                # No transformation needed - use exactly as configured
-            # For other JS-based servers or scripts
-            elif command == "node":
-                if any(arg.endswith('.js') for arg in args):
-                    logger.info(f"[MCP] Using node with JS script: {command} {args}")
-                    # No transformation needed
-                else:
-                    logger.info(f"[MCP] Using direct node command: {command} {args}")
-            # Python scripts
-            elif command.endswith('.py'):
-                logger.info(f"[MCP] Detected Python script for {server_id}: {command} {args}")
-                args = [command] + args
-                command = "python"
-            # JS scripts as main command
-            elif command.endswith('.js'):
-                logger.info(f"[MCP] Detected JS script for {server_id}: {command} {args}")
-                args = [command] + args
-                command = "node"
+            process = await spawn_server_process(config)
+            asyncio.create_task(read_stream_into_log(process.stderr, server_id, self._logs.get_or_create(f"{server_id}:revalidate"), "stderr"))
+            session = ManagedMCPSession(f"{server_id}:revalidate", process)
+            if await session.start():
+                await self._launch_resolver.capture(server_id, config, process.pid)
             else:
-                logger.info(f"[MCP] Using raw command for {server_id}: {command} {args}")
-
-            server_params = StdioServerParameters(
-                command=command,
-                args=args,
-                env=env,
-                cwd=cwd
-            )
-            
-            self._discovered_capabilities[server_id] = []
-            logger.info(f"[MCP] Discovering tools for {server_id} using: {command} {args}")
-            
-            try:
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        logger.info(f"[MCP] Initializing session for {server_id}")
-                        await session.initialize()
-                        logger.info(f"[MCP] Listing tools for {server_id}")
-                        response = await session.list_tools()
-                        tools = getattr(response, 'tools', response)
-                        logger.info(f"[MCP] Discovered tools for {server_id}: {tools}")
-                        self._discovered_capabilities[server_id] = tools
-            except Exception as e:
-                logger.error(f"[MCP] Error during MCP session for {server_id}: {e}", exc_info=True)
-                # Try fallback to direct connection if this is a running process
-                if self.is_server_running(server_id):
-                    logger.info(f"[MCP] Falling back to process connection for {server_id}")
-                    # This is a fallback implementation that could be developed if needed
-                    pass
+                logger.warning(f"Launch revalidation of {server_id} failed: {session.last_error}; keeping the resolved launch.")
+        except Exception as e:
+            logger.warning(f"Launch revalidation of {server_id} failed: {e}")
+        finally:
+            self._launch_resolver.end_revalidation(server_id)
+            if session is not None:
+                await session.close(timeout=1.0)
+            if process is not None and process.returncode is None:
+                signal_process_tree(process, signal.SIGKILL)
+                await process.wait()
+
+    def _launch_info(self, server_id: str) -> Optional[Dict[str, Any]]:
+        config = self._configs.get(server_id)
+        if config is None or not self._launch_resolver.applies_to(config):
+            return None
+        return {"mode": self._launch_mode.get(server_id), **self._launch_resolver.server_info(server_id)}
+
+    async def get_session(self, server_id: str) -> Optional[ManagedMCPSession]:
+        """The running server's initialized MCP session (shared with the MCP gateway), or None."""
+        return await self._ensure_session(server_id)
+
+    async def wait_until_ready(self, server_id: str) -> bool:
+        """True once the server's MCP handshake has completed (runs it if nothing else has yet)."""
+        return await self._ensure_session(server_id) is not None
+
+    async def discover_and_store_capabilities(self, server_id: str, config: Optional[ServerConfig] = None) -> bool:
+        """Call list_tools() over the running server's own MCP session and store the result."""
+        session = await self._ensure_session(server_id)
+        if session is None:
+            self._set_capabilities(server_id, [])
+            self.set_server_status(server_id, "unresponsive")
+            return False
+        try:
+            logger.info(f"[MCP] Listing tools for {server_id}")
+            tools = await session.list_tools()
+            logger.info(f"[MCP] Discovered tools for {server_id}: {[tool.name for tool in tools]}")
+            self._set_capabilities(server_id, tools, "live")
+            config = config or self._configs.get(server_id)
+            if config is not None:
+                self._capability_cache.put(server_id, launch_fingerprint(config), tools)
+            return True
         except Exception as e:
             logger.error(f"[MCP] Failed to discover capabilities for {server_id}: {e}", exc_info=True)
-            self._discovered_capabilities[server_id] = [] 
\ No newline at end of file
+            self._set_capabilities(server_id, [])
+            return False
+
+    async def _on_server_message(self, server_id: str, message: Any) -> None:
+        """Server-initiated notifications arriving on a managed session."""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info(f"[MCP] {server_id} reported tools/list_changed; re-discovering.")
+            self._capability_cache.invalidate(server_id)
+            asyncio.create_task(self.discover_and_store_capabilities(server_id))
+
+    async def probe_server(self, server_id: str, timeout: float = 5.0) -> float:
+        """
+        MCP-level health probe over the existing session; returns the round-trip in ms and raises
+        if the server does not answer. Servers that reject ping are probed with tools/list instead.
+        """
+        session = await self._ensure_session(server_id)
+        if session is None:
+            raise RuntimeError(f"No MCP session for {server_id}: {self._sessions[server_id].last_error if server_id in self._sessions else 'not running'}")
+        try:
+            return await session.ping(timeout=timeout)
+        except McpError as e:
+            logger.debug(f"[MCP] {server_id} rejected ping ({e}); probing with tools/list.")
+        started = time.perf_counter()
+        await session.list_tools(timeout=timeout)
+        return (time.perf_counter() - started) * 1000
+
+    async def ping_server(self, server_id: str) -> Optional[float]:
+        """MCP-level health check over the existing session; round-trip ms, or None if unhealthy."""
+        try:
+            return await self.probe_server(server_id)
+        except Exception as e:
+            session = self._sessions.get(server_id)
+            if session is not None:
+                session.last_error = f"ping: {type(e).__name__}: {e}"
+            logger.warning(f"[MCP] Ping to {server_id} failed: {e}")
+            return None
+
+    async def restart_server(self, server_id: str) -> Optional[int]:
+        """Stop (if running) and start again with the config the server was last started with."""
+        config = self._configs.get(server_id)
+        if config is None:
+            logger.error(f"Cannot restart {server_id}: it was never started by this process manager.")
+            return None
+        await self.stop_server(server_id)
+        self._desired_running.add(server_id) # Still wanted even if this spawn fails
+        return await self.start_server(server_id, config)
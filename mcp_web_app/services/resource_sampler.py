@@ -0,0 +1,182 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from ..utils.proc_stats import CLOCK_TICKS, children_map, proc_available, process_tree, sample_tree
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_SAMPLE_INTERVAL_SECONDS = float(os.getenv("MCP_RESOURCE_SAMPLE_INTERVAL_SECONDS", "5"))
+RESOURCE_HISTORY_SAMPLES = int(os.getenv("MCP_RESOURCE_HISTORY_SAMPLES", "60")) # Rolling window per server
+MAX_RECENT_ALERTS = 20
+
+class ServerResources:
+    """Rolling CPU/RSS/FD samples of one server's process tree and its soft-limit state."""
+
+    def __init__(self, server_id: str):
+        self.server_id = server_id
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=RESOURCE_HISTORY_SAMPLES)
+        self.root_pid: Optional[int] = None
+        self._prev_ticks: Dict[int, int] = {}
+        self._prev_at: Optional[float] = None
+        self.over_limit_samples = 0
+        self.alerts: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_ALERTS)
+        self.limit_restarts = 0
+
+    def record(self, root_pid: int, tree_sample: Dict[str, Any], now: float) -> Dict[str, Any]:
+        if root_pid != self.root_pid: # Restarted: CPU deltas against the old tree are meaningless
+            self.root_pid = root_pid
+            self._prev_ticks, self._prev_at = {}, None
+        ticks: Dict[int, int] = tree_sample["ticks"]
+        cpu_percent = None
+        if self._prev_at is not None and now > self._prev_at:
+            # Only pids present in both samples; a child that exited in between contributes nothing
+            delta_ticks = sum(max(ticks[pid] - self._prev_ticks[pid], 0) for pid in ticks if pid in self._prev_ticks)
+            cpu_percent = round(delta_ticks / CLOCK_TICKS / (now - self._prev_at) * 100, 1)
+        self._prev_ticks, self._prev_at = ticks, now
+        sample = {
+            "at": now,
+            "cpu_percent": cpu_percent,
+            "rss_bytes": tree_sample["rss_bytes"],
+            "peak_rss_bytes": tree_sample["peak_rss_bytes"],
+            "threads": tree_sample["threads"],
+            "fds": tree_sample["fds"],
+            "processes": tree_sample["processes"],
+        }
+        self.samples.append(sample)
+        return sample
+
+    def info(self) -> Optional[Dict[str, Any]]:
+        if not self.samples:
+            return None
+        cpu = [sample["cpu_percent"] for sample in self.samples if sample["cpu_percent"] is not None]
+        rss = [sample["rss_bytes"] for sample in self.samples]
+        fds = [sample["fds"] for sample in self.samples]
+        return {
+            "pid": self.root_pid,
+            "current": self.samples[-1],
+            "window_samples": len(self.samples),
+            "cpu_percent_avg": round(sum(cpu) / len(cpu), 1) if cpu else None,
+            "cpu_percent_max": max(cpu) if cpu else None,
+            "rss_bytes_avg": int(sum(rss) / len(rss)),
+            "rss_bytes_max": max(rss),
+            "fds_max": max(fds),
+            "over_limit_samples": self.over_limit_samples,
+            "limit_restarts": self.limit_restarts,
+            "alerts": list(self.alerts),
+        }
+
+class ResourceSampler:
+    """
+    Samples CPU, RSS, threads and open FDs of every managed server from /proc.
+
+    Each tick walks the server's process tree (the command plus its descendants, so an
+    npx/uvx wrapper's real worker is counted) in a worker thread, keeps a rolling window
+    per server and checks the optional resource_limits of its config: a limit exceeded for
+    sustained_samples consecutive samples logs an alert or restarts the server.
+    """
+
+    def __init__(self, process_manager, interval_seconds: float = RESOURCE_SAMPLE_INTERVAL_SECONDS):
+        self._process_manager = process_manager
+        self.interval_seconds = interval_seconds
+        self._servers: Dict[str, ServerResources] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_sample_at: Optional[float] = None
+        self.last_sample_ms: Optional[float] = None
+        process_manager.add_status_provider("resources", self.server_info)
+
+    def start(self) -> None:
+        if not proc_available():
+            logger.info("No /proc on this platform; MCP server resource sampling disabled.")
+            return
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"MCP server resource sampler started (every {self.interval_seconds:.0f}s).")
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Resource sampler error: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    @staticmethod
+    def _sample_pids(root_pids: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+        children = children_map()
+        return {server_id: sample_tree(process_tree(pid, children)) for server_id, pid in root_pids.items()}
+
+    async def sample(self) -> None:
+        root_pids = {server_id: self._process_manager.get_server_pid(server_id)
+                     for server_id in self._process_manager.get_running_server_ids()}
+        root_pids = {server_id: pid for server_id, pid in root_pids.items() if pid is not None}
+        for server_id in list(self._servers):
+            if server_id not in root_pids:
+                self._servers[server_id].root_pid = None # Stopped: keep the history, drop the CPU baseline
+        if not root_pids:
+            return
+        started = time.perf_counter()
+        tree_samples = await asyncio.to_thread(self._sample_pids, root_pids) # Many small file reads: off the event loop
+        now = time.time()
+        self.last_sample_at = now
+        self.last_sample_ms = round((time.perf_counter() - started) * 1000, 1)
+        for server_id, tree_sample in tree_samples.items():
+            if not tree_sample["processes"]:
+                continue # Exited while we were sampling
+            resources = self._servers.setdefault(server_id, ServerResources(server_id))
+            sample = resources.record(root_pids[server_id], tree_sample, now)
+            self._process_manager.publish_event("resources", server_id, sample)
+            await self._check_limits(server_id, resources, sample)
+
+    async def _check_limits(self, server_id: str, resources: ServerResources, sample: Dict[str, Any]) -> None:
+        config = self._process_manager.get_server_config(server_id)
+        limits = getattr(config, "resource_limits", None)
+        if limits is None:
+            return
+        breaches = []
+        if limits.max_rss_mb is not None and sample["rss_bytes"] > limits.max_rss_mb * 1024 * 1024:
+            breaches.append(f"RSS {sample['rss_bytes'] / 1048576:.0f}MB > {limits.max_rss_mb:.0f}MB")
+        if limits.max_cpu_percent is not None and (sample["cpu_percent"] or 0) > limits.max_cpu_percent:
+            breaches.append(f"CPU {sample['cpu_percent']:.0f}% > {limits.max_cpu_percent:.0f}%")
+        if limits.max_fds is not None and sample["fds"] > limits.max_fds:
+            breaches.append(f"FDs {sample['fds']} > {limits.max_fds}")
+        if not breaches:
+            resources.over_limit_samples = 0
+            return
+        resources.over_limit_samples += 1
+        if resources.over_limit_samples < limits.sustained_samples:
+            return
+        resources.over_limit_samples = 0
+        resources.alerts.append({"at": sample["at"], "action": limits.action, "breaches": breaches})
+        if limits.action == "restart":
+            resources.limit_restarts += 1
+            logger.warning(f"Server {server_id} over its resource limits ({', '.join(breaches)}); restarting.")
+            asyncio.create_task(self._process_manager.restart_server(server_id))
+        else:
+            logger.warning(f"Server {server_id} over its resource limits ({', '.join(breaches)}).")
+
+    def server_info(self, server_id: str) -> Optional[Dict[str, Any]]:
+        resources = self._servers.get(server_id)
+        return resources.info() if resources else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "last_sample_at": self.last_sample_at,
+            "last_sample_ms": self.last_sample_ms,
+            "servers": {server_id: resources.info() for server_id, resources in self._servers.items()},
+        }
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Retained output per server (raw bytes, oldest lines evicted first)
+SERVER_LOG_BUFFER_BYTES = int(os.getenv("MCP_SERVER_LOG_BUFFER_BYTES", str(1024 * 1024)))
+SERVER_LOG_MAX_LINE_BYTES = int(os.getenv("MCP_SERVER_LOG_MAX_LINE_BYTES", "8192"))
+# Token bucket per server: lines beyond the rate are dropped (and counted), never queued
+SERVER_LOG_RATE_LINES_PER_SECOND = float(os.getenv("MCP_SERVER_LOG_RATE_LINES_PER_SECOND", "200"))
+SERVER_LOG_RATE_BURST = float(os.getenv("MCP_SERVER_LOG_RATE_BURST", "2000"))
+# Readers yield to the event loop after this many consecutive lines from one pipe
+SERVER_LOG_YIELD_EVERY_LINES = 64
+
+LogLine = Tuple[int, float, str, bytes] # (offset, timestamp, stream, raw line)
+
+class ServerLogBuffer:
+    """
+    Recent stdout/stderr lines of one MCP server, kept as raw bytes in a ring buffer bounded
+    by total size and decoded only when someone reads them. Lines get monotonically increasing
+    offsets (starting at 1) across restarts, so clients can page and follow without gaps.
+    A token bucket caps how many lines per second are kept; the rest are dropped and counted.
+    """
+
+    def __init__(self, server_id: str, max_bytes: int = SERVER_LOG_BUFFER_BYTES,
+                 rate: float = SERVER_LOG_RATE_LINES_PER_SECOND, burst: float = SERVER_LOG_RATE_BURST):
+        self.server_id = server_id
+        self.max_bytes = max_bytes
+        self.rate = rate
+        self.burst = burst
+        self.lines: Deque[LogLine] = deque()
+        self.bytes = 0
+        self.last_offset = 0
+        self.dropped_lines = 0 # Total lines dropped by the rate limiter
+        self._dropped_since_marker = 0
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._new_line = asyncio.Event()
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _store(self, stream: str, line: bytes) -> int:
+        if len(line) > SERVER_LOG_MAX_LINE_BYTES:
+            line = line[:SERVER_LOG_MAX_LINE_BYTES] + b"... [truncated]"
+        self.last_offset += 1
+        self.lines.append((self.last_offset, time.time(), stream, line))
+        self.bytes += len(line)
+        while self.bytes > self.max_bytes and len(self.lines) > 1:
+            self.bytes -= len(self.lines.popleft()[3])
+        return self.last_offset
+
+    def append(self, stream: str, line: bytes) -> Optional[int]:
+        """Buffer one line (without its newline); returns its offset, or None if rate limited."""
+        if not self._allow():
+            self.dropped_lines += 1
+            self._dropped_since_marker += 1
+            return None
+        if self._dropped_since_marker:
+            self._store("system", f"[{self._dropped_since_marker} lines dropped: output rate limit]".encode())
+            self._dropped_since_marker = 0
+        offset = self._store(stream, line)
+        self._wake()
+        return offset
+
+    def append_system(self, text: str) -> int:
+        """Lifecycle note (start, exit) from the process manager; never rate limited."""
+        offset = self._store("system", text.encode())
+        self._wake()
+        return offset
+
+    def _wake(self) -> None:
+        self._new_line.set()
+        self._new_line = asyncio.Event()
+
+    @property
+    def first_retained_offset(self) -> int:
+        return self.lines[0][0] if self.lines else self.last_offset + 1
+
+    def lines_after(self, offset: int, limit: int, stream: Optional[str] = None) -> Tuple[List[LogLine], bool]:
+        """Up to `limit` lines with offset > `offset`, and whether some after it were already evicted."""
+        gap = offset + 1 < self.first_retained_offset and offset < self.last_offset
+        if offset >= self.last_offset:
+            return [], False
+        start = max(offset - self.first_retained_offset + 1, 0) # Offsets are contiguous within the deque
+        result = []
+        for index in range(start, len(self.lines)):
+            line = self.lines[index]
+            if stream is None or line[2] == stream:
+                result.append(line)
+                if len(result) >= limit:
+                    break
+        return result, gap
+
+    def tail(self, count: int, stream: Optional[str] = None) -> List[LogLine]:
+        result = []
+        for line in reversed(self.lines):
+            if len(result) >= count:
+                break
+            if stream is None or line[2] == stream:
+                result.append(line)
+        result.reverse()
+        return result
+
+    def last_lines_text(self, count: int, stream: str) -> str:
+        return " | ".join(format_line(line)["text"] for line in self.tail(count, stream))
+
+    async def wait_for_lines(self, offset: int, timeout: float) -> bool:
+        """Wait until a line newer than `offset` exists."""
+        if self.last_offset > offset:
+            return True
+        waiter = self._new_line
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "first_offset": self.first_retained_offset,
+            "last_offset": self.last_offset,
+            "retained_lines": len(self.lines),
+            "retained_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "dropped_lines": self.dropped_lines,
+        }
+
+def format_line(line: LogLine) -> Dict[str, Any]:
+    offset, timestamp, stream, raw = line
+    return {"offset": offset, "ts": timestamp, "stream": stream, "text": raw.decode("utf-8", errors="replace")}
+
+class ServerLogRegistry:
+    """One log buffer per server id, kept across restarts so a crash's output stays readable."""
+
+    def __init__(self):
+        self._buffers: Dict[str, ServerLogBuffer] = {}
+
+    def get_or_create(self, server_id: str) -> ServerLogBuffer:
+        buffer = self._buffers.get(server_id)
+        if buffer is None:
+            buffer = self._buffers[server_id] = ServerLogBuffer(server_id)
+        return buffer
+
+    def get(self, server_id: str) -> Optional[ServerLogBuffer]:
+        return self._buffers.get(server_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {server_id: buffer.info() for server_id, buffer in self._buffers.items()}
+
+server_log_registry = ServerLogRegistry()
+
+async def sse_log_events(buffer: ServerLogBuffer, offset: int, stream: Optional[str] = None,
+                         is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                         keepalive_seconds: float = 15.0) -> AsyncIterator[str]:
+    """Server-Sent Events following a server's log from `offset`; the line offset is the SSE id."""
+    while True:
+        lines, gap = buffer.lines_after(offset, limit=500, stream=stream)
+        if gap:
+            yield f"event: gap\ndata: {json.dumps({'from_offset': offset, 'first_offset': buffer.first_retained_offset})}\n\n"
+        for line in lines:
+            yield f"id: {line[0]}\nevent: log\ndata: {json.dumps(format_line(line), ensure_ascii=False)}\n\n"
+        if lines:
+            offset = lines[-1][0]
+        elif offset < buffer.last_offset:
+            offset = buffer.last_offset # Only lines of other streams were new
+        if is_disconnected is not None and await is_disconnected():
+            return
+        if not await buffer.wait_for_lines(offset, keepalive_seconds):
+            yield ": keep-alive\n\n"
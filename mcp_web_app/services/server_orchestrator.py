@@ -0,0 +1,162 @@
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+
+from ..models.models import ServerConfig
+
+logger = logging.getLogger(__name__)
+
+class DependencyError(ValueError):
+    """Unknown server names or a depends_on cycle in a bulk request."""
+
+def dependency_closure(names: List[str], configs: Dict[str, ServerConfig]) -> List[str]:
+    """names plus everything they (transitively) depend on, in first-seen order."""
+    result: List[str] = []
+    stack = list(reversed(names))
+    while stack:
+        name = stack.pop()
+        if name in result:
+            continue
+        if name not in configs:
+            raise DependencyError(f"Unknown server '{name}'")
+        result.append(name)
+        stack.extend(reversed(configs[name].depends_on or []))
+    return result
+
+def check_acyclic(names: List[str], configs: Dict[str, ServerConfig]) -> None:
+    visiting: Set[str] = set()
+    done: Set[str] = set()
+
+    def visit(name: str, path: List[str]) -> None:
+        if name in done or name not in configs:
+            return
+        if name in visiting:
+            raise DependencyError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dependency in configs[name].depends_on or []:
+            visit(dependency, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in names:
+        visit(name, [])
+
+class ServerOrchestrator:
+    """
+    Bulk start/stop/restart of tool servers with bounded concurrency.
+
+    With dependency ordering, each server's task waits for the servers it depends_on (only
+    those in the same batch) before taking a concurrency slot: starts wait until dependencies
+    have completed their MCP handshake, stops wait until dependents are down. Independent
+    servers proceed in parallel. A dependency that fails skips its dependents.
+    """
+
+    def __init__(self, process_manager, config_manager, supervisor=None):
+        self._process_manager = process_manager
+        self._config_manager = config_manager
+        self._supervisor = supervisor
+
+    def _configs(self) -> Dict[str, ServerConfig]:
+        return self._config_manager.get_all_tool_server_configs()
+
+    async def _run_ordered(self, names: List[str], prerequisites: Dict[str, List[str]], operation, concurrency: int,
+                           skip_on_failure: bool = True) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run(name: str) -> Dict[str, Any]:
+            for prerequisite in prerequisites.get(name, []):
+                outcome = await tasks[prerequisite]
+                if not outcome["ok"] and skip_on_failure:
+                    return {"server_name": name, "ok": False, "skipped": True,
+                            "error": f"'{prerequisite}' failed: {outcome.get('error')}"}
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    outcome = await operation(name)
+                except Exception as e:
+                    logger.error(f"Bulk operation on {name} failed: {e}", exc_info=True)
+                    outcome = {"ok": False, "error": str(e)}
+                outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            status = self._process_manager.get_server_status(name)
+            return {"server_name": name, "status": status["status"], "pid": status["pid"], **outcome}
+
+        for name in names: # All tasks exist before any of them awaits another
+            tasks[name] = asyncio.ensure_future(run(name))
+        return list(await asyncio.gather(*tasks.values()))
+
+    async def _start_one(self, name: str) -> Dict[str, Any]:
+        if self._process_manager.is_server_running(name):
+            return {"ok": await self._process_manager.wait_until_ready(name), "already_running": True}
+        if self._supervisor is not None:
+            self._supervisor.reset(name) # A manual start clears a crash-loop verdict
+        pid = await self._process_manager.start_server(name, self._configs()[name])
+        if pid is None:
+            return {"ok": False, "error": "process failed to start"}
+        if not await self._process_manager.wait_until_ready(name):
+            return {"ok": False, "error": "MCP handshake did not complete"}
+        return {"ok": True}
+
+    async def _stop_one(self, name: str) -> Dict[str, Any]:
+        await self._process_manager.stop_server(name)
+        return {"ok": not self._process_manager.is_server_running(name)}
+
+    async def start_many(self, names: Optional[List[str]], concurrency: int, respect_dependencies: bool = True) -> List[Dict[str, Any]]:
+        configs = self._configs()
+        names = list(names) if names is not None else list(configs)
+        prerequisites: Dict[str, List[str]] = {}
+        if respect_dependencies:
+            names = dependency_closure(names, configs)
+            check_acyclic(names, configs)
+            prerequisites = {name: [dep for dep in configs[name].depends_on or [] if dep in names] for name in names}
+        else:
+            unknown = [name for name in names if name not in configs]
+            if unknown:
+                raise DependencyError(f"Unknown servers: {unknown}")
+        return await self._run_ordered(names, prerequisites, self._start_one, concurrency)
+
+    async def stop_many(self, names: Optional[List[str]], concurrency: int, respect_dependencies: bool = True) -> List[Dict[str, Any]]:
+        configs = self._configs()
+        names = list(names) if names is not None else self._process_manager.get_running_server_ids()
+        prerequisites: Dict[str, List[str]] = {}
+        if respect_dependencies:
+            check_acyclic(names, configs)
+            # Reverse edges: a server goes down only after the servers in this batch that depend on it
+            for name in names:
+                for dependency in (configs[name].depends_on if name in configs else None) or []:
+                    if dependency in names:
+                        prerequisites.setdefault(dependency, []).append(name)
+        # Stopping goes ahead even when a dependent failed to stop
+        return await self._run_ordered(names, prerequisites, self._stop_one, concurrency, skip_on_failure=False)
+
+    async def restart_many(self, names: Optional[List[str]], concurrency: int, respect_dependencies: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        names = list(names) if names is not None else self._process_manager.get_running_server_ids()
+        stopped = await self.stop_many(names, concurrency, respect_dependencies)
+        started = await self.start_many(names, concurrency, respect_dependencies)
+        return {"stopped": stopped, "started": started}
+
+    def status_all(self, detail: bool = False) -> Dict[str, Any]:
+        """
+        Status of every configured (or running) server in one payload, with an ETag over it.
+        Without detail, volatile sections (probe timestamps, resource samples, session pings)
+        are reduced to their state so the ETag only changes when something meaningful does.
+        """
+        server_ids = list(dict.fromkeys([*self._configs(), *self._process_manager.get_running_server_ids()]))
+        servers = {}
+        for server_id in server_ids:
+            status = self._process_manager.get_server_status(server_id)
+            if not detail:
+                health = status.get("health")
+                status["health"] = {"state": health["state"], "restarts": health["restarts"]} if health else None
+                session = status.get("mcp_session")
+                status["mcp_session"] = {"initialized": session["initialized"]} if session else None
+                status.pop("resources", None)
+            servers[server_id] = status
+        payload = jsonable_encoder({"servers": servers})
+        etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest() + '"'
+        return {"etag": etag, "payload": payload}
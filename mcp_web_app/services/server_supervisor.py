@@ -0,0 +1,265 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Supervision tuning (env-overridable)
+PROBE_INTERVAL_SECONDS = float(os.getenv("MCP_SUPERVISOR_PROBE_INTERVAL_SECONDS", "15"))
+PROBE_TIMEOUT_SECONDS = float(os.getenv("MCP_SUPERVISOR_PROBE_TIMEOUT_SECONDS", "5"))
+PROBE_FAILURES_BEFORE_RESTART = int(os.getenv("MCP_SUPERVISOR_PROBE_FAILURES", "3"))
+STARTUP_GRACE_SECONDS = float(os.getenv("MCP_SUPERVISOR_STARTUP_GRACE_SECONDS", "30"))
+RESTART_BACKOFF_BASE_SECONDS = float(os.getenv("MCP_SUPERVISOR_BACKOFF_BASE_SECONDS", "1"))
+RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("MCP_SUPERVISOR_BACKOFF_MAX_SECONDS", "60"))
+CRASH_LOOP_MAX_RESTARTS = int(os.getenv("MCP_SUPERVISOR_CRASH_LOOP_MAX_RESTARTS", "5"))
+CRASH_LOOP_WINDOW_SECONDS = float(os.getenv("MCP_SUPERVISOR_CRASH_LOOP_WINDOW_SECONDS", "300"))
+
+class HealthState:
+    STARTING = "starting"         # Spawned, MCP handshake not confirmed yet
+    HEALTHY = "healthy"           # Last probe answered
+    UNRESPONSIVE = "unresponsive" # Process alive but probes fail or time out
+    RESTARTING = "restarting"     # Exited or unresponsive; a restart is scheduled
+    CRASH_LOOP = "crash_loop"     # Too many restarts in the window: no more automatic restarts
+    STOPPED = "stopped"           # Not supposed to run
+
+class ServerHealth:
+    """Probe latency, failure counters and restart history of one MCP server."""
+
+    def __init__(self, server_id: str):
+        self.server_id = server_id
+        self.state = HealthState.STARTING
+        self.latency_ms_ewma: Optional[float] = None
+        self.last_latency_ms: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.restart_times: Deque[float] = deque(maxlen=max(CRASH_LOOP_MAX_RESTARTS, 1) + 1)
+        self.backoff_attempt = 0
+        self.next_restart_at: Optional[float] = None
+        self.last_exit_code: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    def record_success(self, latency_ms: float) -> None:
+        now = time.time()
+        self.probes += 1
+        self.last_probe_at = self.last_success_at = now
+        self.last_latency_ms = latency_ms
+        self.latency_ms_ewma = latency_ms if self.latency_ms_ewma is None else 0.8 * self.latency_ms_ewma + 0.2 * latency_ms
+        self.consecutive_failures = 0
+        self.backoff_attempt = 0 # Answering again: the next failure starts from the base delay
+        self.state = HealthState.HEALTHY
+
+    def record_failure(self, error: BaseException) -> None:
+        self.probes += 1
+        self.probe_failures += 1
+        self.last_probe_at = time.time()
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:500]
+        self.state = HealthState.UNRESPONSIVE
+
+    def restarts_in_window(self, now: float) -> int:
+        return sum(1 for ts in self.restart_times if now - ts <= CRASH_LOOP_WINDOW_SECONDS)
+
+    def next_backoff(self) -> float:
+        """Exponential backoff with jitter: uniform in [base/2, min(max, base * 2^attempt)] seconds."""
+        ceiling = min(RESTART_BACKOFF_MAX_SECONDS, RESTART_BACKOFF_BASE_SECONDS * (2 ** self.backoff_attempt))
+        self.backoff_attempt += 1
+        return random.uniform(min(RESTART_BACKOFF_BASE_SECONDS / 2, ceiling), ceiling)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "latency_ms_ewma": round(self.latency_ms_ewma, 1) if self.latency_ms_ewma is not None else None,
+            "last_latency_ms": round(self.last_latency_ms, 1) if self.last_latency_ms is not None else None,
+            "last_probe_at": self.last_probe_at,
+            "last_success_at": self.last_success_at,
+            "consecutive_failures": self.consecutive_failures,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "restarts": self.restarts,
+            "crashes": self.crashes,
+            "restarts_in_window": self.restarts_in_window(time.time()),
+            "next_restart_at": self.next_restart_at,
+            "last_exit_code": self.last_exit_code,
+            "last_error": self.last_error,
+        }
+
+class ServerSupervisor:
+    """
+    Keeps managed MCP servers up and their status honest.
+
+    A background loop probes every running server over its MCP session (ping, or tools/list
+    for servers without ping) and records latency; the status becomes "unresponsive" when a
+    probe fails and "connected" again when one answers. A server that exits unexpectedly, or
+    fails PROBE_FAILURES_BEFORE_RESTART probes in a row, is restarted after an exponential
+    backoff with jitter. More than CRASH_LOOP_MAX_RESTARTS restarts within the crash-loop
+    window marks it "crash_loop" and automatic restarts stop until it is started by hand.
+    """
+
+    def __init__(self, process_manager):
+        self._process_manager = process_manager
+        self._health: Dict[str, ServerHealth] = {}
+        self._restart_tasks: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self.last_cycle_at: Optional[float] = None
+        process_manager.add_exit_listener(self._on_exit)
+        process_manager.add_status_provider("health", self.health_info)
+
+    def _get(self, server_id: str) -> ServerHealth:
+        health = self._health.get(server_id)
+        if health is None:
+            health = self._health[server_id] = ServerHealth(server_id)
+        return health
+
+    def _publish(self, server_id: str) -> None:
+        self._process_manager.publish_event("health", server_id, self._get(server_id).info())
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stopped = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"MCP server supervisor started (probe every {PROBE_INTERVAL_SECONDS:.0f}s).")
+
+    async def stop(self) -> None:
+        self._stopped = True # Exits seen from now on (app shutdown) are not restarted
+        tasks = [task for task in [self._task, *self._restart_tasks.values()] if task and not task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._restart_tasks.clear()
+
+    def reset(self, server_id: str) -> None:
+        """Manual (re)start: forget the crash-loop verdict and backoff, cancel a pending restart."""
+        pending = self._restart_tasks.pop(server_id, None)
+        if pending and not pending.done():
+            pending.cancel()
+        health = self._get(server_id)
+        health.restart_times.clear()
+        health.backoff_attempt = 0
+        health.consecutive_failures = 0
+        health.next_restart_at = None
+        health.state = HealthState.STARTING
+        self._publish(server_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MCP server supervisor loop error: {e}", exc_info=True)
+            await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+    async def probe_all(self) -> None:
+        """Probe all running servers concurrently (one slow server doesn't delay the others)."""
+        self.last_cycle_at = time.time()
+        server_ids = [server_id for server_id in self._process_manager.get_running_server_ids() if server_id not in self._restart_tasks]
+        if server_ids:
+            await asyncio.gather(*(self.probe(server_id) for server_id in server_ids))
+
+    async def probe(self, server_id: str) -> Optional[float]:
+        health = self._get(server_id)
+        started_at = self._process_manager.get_started_at(server_id)
+        try:
+            latency_ms = await self._process_manager.probe_server(server_id, timeout=PROBE_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if started_at is not None and time.time() - started_at < STARTUP_GRACE_SECONDS:
+                logger.debug(f"Probe of {server_id} failed during its startup grace period: {e}")
+                return None
+            health.record_failure(e)
+            self._process_manager.set_server_status(server_id, "unresponsive")
+            self._publish(server_id)
+            logger.warning(f"Health probe of {server_id} failed ({health.consecutive_failures}/{PROBE_FAILURES_BEFORE_RESTART}): {health.last_error}")
+            if health.consecutive_failures >= PROBE_FAILURES_BEFORE_RESTART:
+                self._schedule_restart(server_id, f"{health.consecutive_failures} failed health probes")
+            return None
+        health.record_success(latency_ms)
+        self._process_manager.set_server_status(server_id, "connected")
+        self._publish(server_id)
+        return latency_ms
+
+    async def _on_exit(self, server_id: str, return_code: Optional[int], intentional: bool) -> None:
+        health = self._get(server_id)
+        health.last_exit_code = return_code
+        if return_code is None or self._stopped:
+            return # Monitor cancelled (event loop shutting down) or supervision stopped
+        if intentional or not self._process_manager.is_desired_running(server_id):
+            if server_id not in self._restart_tasks:
+                health.state = HealthState.STOPPED
+                self._publish(server_id)
+            return
+        health.crashes += 1
+        self._schedule_restart(server_id, f"exited unexpectedly with code {return_code}")
+
+    def _schedule_restart(self, server_id: str, reason: str) -> None:
+        if server_id in self._restart_tasks:
+            return
+        health = self._get(server_id)
+        now = time.time()
+        if health.restarts_in_window(now) >= CRASH_LOOP_MAX_RESTARTS:
+            health.state = HealthState.CRASH_LOOP
+            health.next_restart_at = None
+            self._process_manager.set_server_status(server_id, "crash_loop", require_running=False)
+            self._publish(server_id)
+            logger.error(f"Server {server_id} {reason}; {CRASH_LOOP_MAX_RESTARTS} restarts within {CRASH_LOOP_WINDOW_SECONDS:.0f}s, "
+                         f"giving up (crash loop). Start it manually once fixed.")
+            return
+        delay = health.next_backoff()
+        health.state = HealthState.RESTARTING
+        health.next_restart_at = now + delay
+        self._publish(server_id)
+        logger.warning(f"Server {server_id} {reason}; restarting in {delay:.1f}s (attempt {health.backoff_attempt}).")
+        self._restart_tasks[server_id] = asyncio.create_task(self._restart_after(server_id, delay))
+
+    async def _restart_after(self, server_id: str, delay: float) -> None:
+        health = self._get(server_id)
+        pid: Optional[int] = None
+        try:
+            await asyncio.sleep(delay)
+            if not self._process_manager.is_desired_running(server_id):
+                logger.info(f"Skipping restart of {server_id}: it was stopped in the meantime.")
+                health.state = HealthState.STOPPED
+                return
+            health.restarts += 1
+            health.restart_times.append(time.time())
+            health.consecutive_failures = 0
+            health.state = HealthState.STARTING
+            pid = await self._process_manager.restart_server(server_id)
+            if pid is not None:
+                logger.info(f"Server {server_id} restarted by the supervisor (PID: {pid}, restart #{health.restarts}).")
+        finally:
+            health.next_restart_at = None
+            if self._restart_tasks.get(server_id) is asyncio.current_task():
+                del self._restart_tasks[server_id]
+            self._publish(server_id)
+        if pid is None and self._process_manager.is_desired_running(server_id):
+            health.last_error = "restart failed"
+            self._schedule_restart(server_id, "failed to restart") # Counts towards the crash-loop window
+
+    def health_info(self, server_id: str) -> Optional[Dict[str, Any]]:
+        health = self._health.get(server_id)
+        return health.info() if health else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "last_cycle_at": self.last_cycle_at,
+            "probe_interval_seconds": PROBE_INTERVAL_SECONDS,
+            "servers": {server_id: health.info() for server_id, health in self._health.items()},
+        }
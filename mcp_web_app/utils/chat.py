@@ -1,24 +1,178 @@
 import time
 import json
+import hashlib
 import logging
 import asyncio
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
-from mcp_web_app.utils.events import websocket_output_stream_fn_factory, error_generator
+from mcp_web_app.utils.events import stream_record_output_fn_factory, error_generator
+from mcp_web_app.utils.stream_buffer import stream_registry
+from mcp_web_app.utils.event_projection import EventVerbosity
+from mcp_web_app.utils.logging_pipeline import hot_path
 
 logger = logging.getLogger(__name__)
 
+class StreamProtocol:
+    """Chat stream wire protocol versions, negotiated per connection."""
+    LEGACY = 1 # Tokens, then the full answer again in on_chain_end/message and the final frame
+    DELTA = 2  # Tokens only; the final frame carries length/sha256 of the streamed text plus any unstreamed remainder
+
+    SUPPORTED = (LEGACY, DELTA)
+
+    @classmethod
+    def negotiate(cls, requested) -> int:
+        """Return the protocol version to use for a client request, defaulting to legacy."""
+        try:
+            version = int(requested) if requested not in (None, "") else cls.LEGACY
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid stream protocol version '{requested}', using legacy protocol.")
+            return cls.LEGACY
+        if version not in cls.SUPPORTED:
+            logger.warning(f"Unsupported stream protocol version {version}, using {max(cls.SUPPORTED)}.")
+            return max(cls.SUPPORTED) if version > max(cls.SUPPORTED) else cls.LEGACY
+        return version
+
+# Events that repeat the already-streamed answer; folded into the final frame under the delta protocol
+ANSWER_EVENT_TYPES = ("on_chain_end", "message")
+
+def _message_content(data, session_id: str = "unknown") -> str:
+    """Extract the answer text from an on_chain_end / message event payload."""
+    if isinstance(data, dict) and "content" in data:
+        return data["content"]
+    if isinstance(data, str):
+        return data
+    try:
+        if isinstance(data, dict):
+            return data.get("content") or data.get("output") or str(data)
+        return str(data)
+    except Exception as e_format:
+        logger.error(f"WS session {session_id}: Error formatting 'message' data: {e_format}", exc_info=True)
+        return f"Error processing message data: {str(e_format)}"
+
+def _unstreamed_remainder(content: str, streamed_text: str) -> str:
+    """Part of an answer that the client has not already received as tokens."""
+    if not content:
+        return ""
+    content = str(content)
+    if content in streamed_text or content.strip() in streamed_text:
+        return ""
+    if streamed_text and content.startswith(streamed_text):
+        return content[len(streamed_text):]
+    return content
+
+def build_stream_frame(event_type: str, data, session_id: str = "unknown"):
+    """Translate a buffered agent event into the JSON frame sent to clients (None = skip)."""
+    # WebSocket JSON formatting
+    if event_type == "token":
+        return {"type": "token", "data": data if isinstance(data, str) else str(data)}
+
+    if event_type in ANSWER_EVENT_TYPES:
+        message_content = _message_content(data, session_id)
+        logger.info(f"WS session {session_id}: Received event '{event_type}'. Content: {str(message_content)[:100]}...")
+        if not message_content:
+            return None
+        return {"type": event_type, "data": message_content}
+
+    if event_type == "error":
+        error_msg = str(data.get("error", data)) if isinstance(data, dict) else str(data)
+        logger.error(f"WS session {session_id}: Yielding error event from stream: {error_msg}")
+        return {"type": "error_event", "data": {"error": error_msg, "recoverable": True}}
+
+    if event_type == "end":
+        return {"type": "end", "data": "complete"}
+
+    # Generic event pass-through
+    return {"type": event_type, "data": data}
+
+async def iter_stream_frames(record, offset: int, deadline: float, session_id: str,
+                             protocol: int = StreamProtocol.LEGACY, idle_interval: float = 15.0):
+    """Yield client frames for events after `offset` until the stream ends.
+
+    Every frame carries its "offset" so clients can resume from the last one they saw.
+    If the requested offset was already evicted from the ring buffer, a resume_snapshot
+    frame with the token text so far bridges the gap. Under the delta protocol the
+    answer events that duplicate the streamed tokens are skipped. Yields None on idle
+    ticks and raises asyncio.TimeoutError once `deadline` passes.
+    """
+    while True:
+        events, gap = record.events_after(offset)
+        if gap:
+            bridge_offset = record.first_retained_offset - 1
+            yield {
+                "type": "resume_snapshot",
+                "offset": bridge_offset,
+                "data": {"content": record.token_text_before(bridge_offset)}
+            }
+        for event_offset, event_type, data in events:
+            offset = event_offset
+            if protocol == StreamProtocol.DELTA and event_type in ANSWER_EVENT_TYPES:
+                continue
+            frame = build_stream_frame(event_type, data, session_id)
+            if frame is None:
+                continue
+            frame["offset"] = event_offset
+            yield frame
+            if event_type == "end":
+                return
+        if record.done and offset >= record.last_offset:
+            return
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        if not await record.wait_for_events(offset, timeout=min(remaining, idle_interval)):
+            yield None
+
+def build_final_frame(record, protocol: int = StreamProtocol.LEGACY):
+    """Closing frame of a stream (None if there is nothing to report).
+
+    Legacy clients get the re-joined token text. Delta clients already hold that text, so
+    they get its length (in UTF-16 code units, i.e. a JS string's .length) and sha256 for verification, plus any answer
+    content that was never streamed as tokens (e.g. from non-streaming models).
+    """
+    streamed_text = "".join(record.tokens)
+    if protocol == StreamProtocol.LEGACY:
+        if not streamed_text:
+            return None
+        return {"type": "final", "offset": record.last_offset, "data": streamed_text}
+
+    remainder = ""
+    for _offset, event_type, data in record.buffer:
+        if event_type in ANSWER_EVENT_TYPES:
+            remainder = _unstreamed_remainder(_message_content(data, record.session_id), streamed_text) or remainder
+    if not streamed_text and not remainder:
+        return None
+    return {
+        "type": "final",
+        "offset": record.last_offset,
+        "data": {
+            "length": len(streamed_text.encode("utf-16-le")) // 2,
+            "sha256": hashlib.sha256(streamed_text.encode("utf-8")).hexdigest(),
+            "remainder": remainder
+        }
+    }
+
+def agent_task_error(record):
+    """Return the exception raised by the record's agent task, if it failed."""
+    task = record.agent_task
+    if task and task.done() and not task.cancelled():
+        return task.exception()
+    return None
+
 async def websocket_chat_stream_handler(websocket: WebSocket, request_data: dict, agent_service, stream_timeout=180):
     """Handle WebSocket chat stream requests from clients.
     
     This function manages the streaming of chat responses through WebSockets.
     支持双向通信：接收客户端消息并发送响应。
+
+    The agent run is decoupled from the connection: events are buffered in a resumable
+    StreamRecord, and if the client drops the run keeps going for a grace period. A client
+    reconnects with {"resume_stream_id": ..., "last_offset": n} to continue without
+    recomputation.
     """
     overall_start_time = time.time()
     session_id = request_data.get('session_id', f'ws-{time.time()}')
     # Attach session_id to the websocket object for easy access in other functions
     setattr(websocket, 'session_id', session_id)
-    event_queue = asyncio.Queue()
     
     # Parse request data - print detailed debug logs
     prompt = request_data.get('prompt', '')
@@ -26,11 +180,40 @@ async def websocket_chat_stream_handler(websocket: WebSocket, request_data: dict
     llm_config_id = request_data.get('llm_config_id')
     agent_mode = request_data.get('agent_mode', 'chat')
     agent_data_source = request_data.get('agent_data_source')
+    event_verbosity = EventVerbosity.normalize(request_data.get('event_verbosity'))
+    protocol_version = StreamProtocol.negotiate(request_data.get('protocol_version'))
+    resume_stream_id = request_data.get('resume_stream_id')
     
     logger.info(f"WS session {session_id}: Starting WebSocket chat stream handler")
     logger.debug(f"WS session {session_id}: Request data: prompt length={len(prompt)}, "
                 f"tools_config keys={list(tools_config.keys()) if isinstance(tools_config, dict) else 'not a dict'}, "
-                f"llm_config_id={llm_config_id}, mode={agent_mode}")
+                f"llm_config_id={llm_config_id}, mode={agent_mode}, verbosity={event_verbosity}, resume={resume_stream_id}")
+
+    start_offset = 0
+    if resume_stream_id:
+        record = stream_registry.get(resume_stream_id)
+        if record is None:
+            logger.warning(f"WS session {session_id}: Cannot resume stream {resume_stream_id}: unknown or expired.")
+            try:
+                await websocket.send_json({
+                    "type": "error_event",
+                    "data": {
+                        "error": f"Stream '{resume_stream_id}' not found or expired.",
+                        "recoverable": False
+                    }
+                })
+                await websocket.close(code=1000)
+            except Exception as e_resume:
+                logger.warning(f"WS session {session_id}: Failed to report unknown stream: {e_resume}")
+            return
+        try:
+            start_offset = max(int(request_data.get('last_offset') or 0), 0)
+        except (TypeError, ValueError):
+            start_offset = 0
+        overall_start_time = record.created_at
+    else:
+        record = stream_registry.create(session_id)
+    stream_registry.attach(record)
 
     # 发送连接确认消息
     try:
@@ -38,217 +221,88 @@ async def websocket_chat_stream_handler(websocket: WebSocket, request_data: dict
             "type": "connection_established",
             "data": {
                 "session_id": session_id,
+                "stream_id": record.stream_id,
+                "resumed": bool(resume_stream_id),
+                "last_offset": record.last_offset,
+                "event_verbosity": event_verbosity,
+                "protocol_version": protocol_version,
                 "message": "WebSocket连接已建立，开始处理请求"
             }
         })
-        logger.info(f"WS session {session_id}: 发送连接确认消息")
+        logger.info(f"WS session {session_id}: 发送连接确认消息 (stream {record.stream_id})")
     except Exception as e:
         logger.error(f"WS session {session_id}: 发送确认消息失败: {e}", exc_info=True)
 
-    # Get the event pusher function from the factory
-    # This function will be called by the CustomAsyncIteratorCallbackHandler in the agent service
-    event_pusher_fn = websocket_output_stream_fn_factory(websocket, event_queue)
-
-    agent_task = None
+    timed_out = False
+    event_count = 0
     try:
-        logger.info(f"WS session {session_id}: Creating background task for agent_service.astream_ask_agent_events.")
-        # Debug log for the request
-        logger.debug(f"Request details: session_id={session_id}, llm_config_id={request_data.get('llm_config_id')}")
-
-        agent_task = asyncio.create_task(
-            agent_service.astream_ask_agent_events(
+        if not resume_stream_id:
+            logger.info(f"WS session {session_id}: Creating background task for agent_service.astream_ask_agent_events.")
+            # The pusher is called by the CustomAsyncIteratorCallbackHandler in the agent service
+            event_pusher_fn = stream_record_output_fn_factory(record)
+            stream_registry.start_agent_task(record, agent_service.astream_ask_agent_events(
                 session_id=session_id,
-                question=request_data.get('prompt', ''),
-                tools_config=request_data.get('tools_config', {}),
-                llm_config_id=request_data.get('llm_config_id'),
-                output_stream_fn=event_pusher_fn, # Pass the queue pusher
-                agent_mode=request_data.get('agent_mode', 'chat'),
-                agent_data_source=request_data.get('agent_data_source')
-            )
-        )
+                question=prompt,
+                tools_config=tools_config,
+                llm_config_id=llm_config_id,
+                output_stream_fn=event_pusher_fn, # Pass the ring buffer pusher
+                agent_mode=agent_mode,
+                agent_data_source=agent_data_source,
+                event_verbosity=event_verbosity
+            ))
+        else:
+            logger.info(f"WS session {session_id}: Resuming stream {record.stream_id} after offset {start_offset} (last offset {record.last_offset}).")
 
-        token_received = False
-        accumulated_tokens = []
-        event_count = 0
-        # Timeout for individual queue.get() operations
-        queue_get_timeout = stream_timeout # Or a shorter duration like 5-10 seconds
-
-        while True:
-            try:
-                # Wait for an event from the agent service
-                # Use a timeout to prevent indefinite blocking if the agent stalls
-                event_type, data = await asyncio.wait_for(event_queue.get(), timeout=queue_get_timeout)
+        try:
+            async for frame in iter_stream_frames(record, start_offset, overall_start_time + stream_timeout, session_id, protocol_version):
+                if frame is None:
+                    continue
                 event_count += 1
-                logger.debug(f"WS session {session_id}: Event {event_count} received from queue: Type: {event_type}, Data: {str(data)[:100]}...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("WS session %s: Sending frame %d: Type: %s", session_id, event_count, frame["type"], extra=hot_path(session_id))
+                await websocket.send_json(frame)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"WS session {session_id}: Overall stream timeout ({stream_timeout}s) exceeded.")
+            await websocket.send_json({
+                "type": "error_event",
+                "data": {
+                    "error": "Stream timeout exceeded",
+                    "recoverable": False
+                }
+            })
 
-                # WebSocket JSON formatting
-                if event_type == "token":
-                    token_received = True
-                    token_data = data
-                    if not isinstance(data, str):
-                        token_data = str(data)
-                    
-                    accumulated_tokens.append(token_data)
-                    # Send token as JSON object
-                    await websocket.send_json({
-                        "type": "token",
-                        "data": token_data
-                    })
-                
-                elif event_type == "on_chain_end" or event_type == "message":
-                    message_content = ""
-                    if isinstance(data, dict) and "content" in data:
-                        message_content = data["content"]
-                    elif isinstance(data, str):
-                        message_content = data
-                    else:
-                        try:
-                            if isinstance(data, dict):
-                                message_content = data.get("content") or data.get("output") or str(data)
-                            else:
-                                message_content = str(data)
-                        except Exception as e_format:
-                            logger.error(f"WS session {session_id}: Error formatting 'message' data: {e_format}", exc_info=True)
-                            message_content = f"Error processing message data: {str(e_format)}"
-                    
-                    logger.info(f"WS session {session_id}: Received event '{event_type}'. Content: {message_content[:100]}...")
-                    if message_content:
-                        await websocket.send_json({
-                            "type": event_type,
-                            "data": message_content
-                        })
+        e_agent = agent_task_error(record)
+        if e_agent is not None:
+            logger.error(f"WS session {session_id}: Agent task failed with: {e_agent}", exc_info=e_agent)
+            await websocket.send_json({
+                "type": "error_event",
+                "data": {
+                    "error": f"Agent task error: {str(e_agent)}",
+                    "recoverable": False
+                }
+            })
 
-                elif event_type == "error":
-                    error_msg = str(data.get("error", data)) if isinstance(data, dict) else str(data)
-                    logger.error(f"WS session {session_id}: Yielding error event from queue: {error_msg}")
-                    await websocket.send_json({
-                        "type": "error_event",
-                        "data": {
-                            "error": error_msg,
-                            "recoverable": True
-                        }
-                    })
-
-                elif event_type == "end":
-                    logger.info(f"WS session {session_id}: Received 'end' event from queue. Terminating stream.")
-                    await websocket.send_json({
-                        "type": "end",
-                        "data": "complete"
-                    })
-                    break # Exit the while loop
-
-                else: # Generic event pass-through
-                    logger.debug(f"WS session {session_id}: Sending generic event type '{event_type}' from queue.")
-                    # Send all other events as JSON objects
-                    if isinstance(data, str):
-                        await websocket.send_json({
-                            "type": event_type,
-                            "data": data
-                        })
-                    else:
-                        # Send complex data with proper serialization
-                        await websocket.send_json({
-                            "type": event_type,
-                            "data": data
-                        })
-
-                # Check overall stream timeout
-                if time.time() - overall_start_time > stream_timeout:
-                    logger.warning(f"WS session {session_id}: Overall stream timeout ({stream_timeout}s) exceeded.")
-                    await websocket.send_json({
-                        "type": "error_event",
-                        "data": {
-                            "error": "Stream timeout exceeded",
-                            "recoverable": False
-                        }
-                    })
-                    break
-                
-                event_queue.task_done()
-
-            except asyncio.TimeoutError:
-                logger.debug(f"WS session {session_id}: Timeout waiting for event from queue.")
-                # Check if the agent task is still running
-                if agent_task and agent_task.done():
-                    logger.info(f"WS session {session_id}: Agent task finished while waiting for queue. Checking for exceptions.")
-                    try:
-                        agent_task.result() # Raise exception if agent task failed
-                    except Exception as e_agent:
-                        logger.error(f"WS session {session_id}: Agent task failed with: {e_agent}", exc_info=True)
-                        await websocket.send_json({
-                            "type": "error_event",
-                            "data": {
-                                "error": f"Agent task error: {str(e_agent)}",
-                                "recoverable": False
-                            }
-                        })
-                    break
-                
-                # Check overall stream timeout
-                if time.time() - overall_start_time > stream_timeout:
-                    logger.warning(f"WS session {session_id}: Overall stream timeout ({stream_timeout}s) exceeded during queue wait.")
-                    await websocket.send_json({
-                        "type": "error_event",
-                        "data": {
-                            "error": "Stream timeout exceeded",
-                            "recoverable": False
-                        }
-                    })
-                    break
-                continue
-                
-            except WebSocketDisconnect:
-                logger.info(f"WS session {session_id}: WebSocket disconnected by client.")
-                break
-            
-            except Exception as e_send:
-                logger.error(f"WS session {session_id}: Error sending WebSocket message: {e_send}", exc_info=True)
-                # Check if the error is due to the connection being closed
-                if isinstance(e_send, RuntimeError) and "Cannot call \"send\" once a close message has been sent" in str(e_send):
-                    logger.warning(f"WS session {session_id}: Cannot send message, connection already closed.")
-                elif websocket.client_state != WebSocketState.CONNECTED:
-                    logger.warning(f"WS session {session_id}: WebSocket state is {websocket.client_state}, cannot send.")
-                else:
-                    # For other send errors, try to inform the client if possible
-                    try:
-                        if websocket.client_state == WebSocketState.CONNECTED:
-                            await websocket.send_json({
-                                "type": "error_event",
-                                "data": {
-                                    "error": f"Internal error sending message: {str(e_send)}",
-                                    "recoverable": True # May or may not be recoverable
-                                }
-                            })
-                    except Exception as e_inner:
-                         logger.error(f"WS session {session_id}: Failed to send error message about send failure: {e_inner}")
-                break # Break the loop on send error
-
-        logger.info(f"WS session {session_id}: Exited event processing loop. Token_received: {token_received}, Events processed: {event_count}")
+        logger.info(f"WS session {session_id}: Exited event processing loop. Tokens: {len(record.tokens)}, Frames sent: {event_count}")
         
-        # Send final accumulated message if tokens were received
-        final_message = "".join(accumulated_tokens)
-        if final_message:
-            logger.info(f"WS session {session_id}: Sending final accumulated message: {final_message[:100]}...")
+        # Send the final frame if tokens were received (including ones sent before a reconnect)
+        final_frame = build_final_frame(record, protocol_version)
+        if final_frame:
+            logger.info(f"WS session {session_id}: Sending final frame (protocol v{protocol_version}): {str(final_frame['data'])[:100]}...")
             try:
                 # Check state before sending final message
                 if websocket.client_state == WebSocketState.CONNECTED:
-                    await websocket.send_json({
-                        "type": "final",
-                        "data": final_message
-                    })
+                    await websocket.send_json(final_frame)
             except Exception as e_final:
                  logger.error(f"WS session {session_id}: Failed to send final message: {e_final}. State: {websocket.client_state}")
 
     except WebSocketDisconnect:
-        logger.info(f"WS session {session_id}: WebSocket disconnected during processing.")
-        if agent_task and not agent_task.done():
-            agent_task.cancel()
+        logger.info(f"WS session {session_id}: WebSocket disconnected during processing; stream {record.stream_id} stays resumable.")
     except asyncio.CancelledError:
-        logger.info(f"WS session {session_id}: websocket_chat_stream_handler task was cancelled.")
-        if agent_task and not agent_task.done():
-            agent_task.cancel()
+        logger.info(f"WS session {session_id}: websocket_chat_stream_handler task was cancelled; stream {record.stream_id} stays resumable.")
         raise
     except Exception as e_outer:
+        # Send failures on a closing socket land here too; the run stays resumable
         logger.error(f"WS session {session_id}: CRITICAL ERROR in WebSocket stream: {type(e_outer).__name__} - {e_outer}", exc_info=True)
         try:
              # Check state before sending critical error message
@@ -265,20 +319,12 @@ async def websocket_chat_stream_handler(websocket: WebSocket, request_data: dict
     finally:
         elapsed = time.time() - overall_start_time
         logger.info(f"WS session {session_id}: websocket_chat_stream_handler NORMALLY EXITING 'finally' block. Total Elapsed: {elapsed:.2f}s.")
-        # Ensure the agent task is cancelled if it's still running
-        if agent_task and not agent_task.done():
-            logger.info(f"WS session {session_id}: Cancelling agent task in finally block.")
-            agent_task.cancel()
-            try:
-                # Wait briefly for cancellation to propagate
-                await asyncio.wait_for(agent_task, timeout=5.0) 
-            except asyncio.CancelledError:
-                logger.info(f"WS session {session_id}: Agent task successfully cancelled.")
-            except asyncio.TimeoutError:
-                 logger.warning(f"WS session {session_id}: Timeout waiting for agent task cancellation.")
-            except Exception as e_cancel:
-                 logger.error(f"WS session {session_id}: Error during agent task cleanup: {e_cancel}", exc_info=True)
-                 # Don't try to send error if outer try failed, connection likely gone
+        # The agent task is NOT cancelled on disconnect: the registry keeps it running for the
+        # resume grace period. Only a stream timeout ends the run outright.
+        stream_registry.detach(record)
+        if timed_out:
+            logger.info(f"WS session {session_id}: Cancelling agent task after stream timeout.")
+            stream_registry.cancel(record)
 
         # Final check to close the WebSocket from the server side if it's still open
         if websocket.client_state == WebSocketState.CONNECTED:
@@ -290,6 +336,30 @@ async def websocket_chat_stream_handler(websocket: WebSocket, request_data: dict
         
         logger.info(f"WS session {session_id}: Cleaned up resources.")
 
+async def sse_stream_events(record, last_offset: int = 0, stream_timeout=180, protocol_version: int = StreamProtocol.LEGACY):
+    """Server-Sent Events view of a buffered stream, resuming after `last_offset`.
+
+    Each event uses the buffer offset as its SSE id, so browsers' automatic
+    Last-Event-ID reconnects continue exactly where they left off.
+    """
+    stream_registry.attach(record)
+    try:
+        try:
+            async for frame in iter_stream_frames(record, last_offset, record.created_at + stream_timeout, record.session_id, protocol_version):
+                if frame is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {frame['offset']}\nevent: {frame['type']}\ndata: {json.dumps(frame, ensure_ascii=False, default=str)}\n\n"
+        except asyncio.TimeoutError:
+            error_frame = {"type": "error_event", "data": {"error": "Stream timeout exceeded", "recoverable": False}}
+            yield f"event: error_event\ndata: {json.dumps(error_frame)}\n\n"
+            return
+        final_frame = build_final_frame(record, protocol_version)
+        if final_frame:
+            yield f"event: final\ndata: {json.dumps(final_frame, ensure_ascii=False)}\n\n"
+    finally:
+        stream_registry.detach(record)
+
 async def chat_bot_invoke(agent_service, request):
     try:
         session_id = request.session_id if hasattr(request, 'session_id') else None
@@ -6,6 +6,9 @@ from langchain_core.outputs import ChatGenerationChunk, GenerationChunk, LLMResu
 from langchain_core.messages import ChatMessage, AIMessage, HumanMessage, SystemMessage, FunctionMessage, ToolMessage, BaseMessage # ADDED ChatMessage here, and BaseMessage
 from langchain_core.agents import AgentAction, AgentFinish # ADDED: For type hints
 from langchain_core.prompt_values import ChatPromptValue
+from mcp_web_app.utils.event_projection import EventProjector
+from mcp_web_app.utils.logging_pipeline import hot_path
+from mcp_web_app.utils.react_stream_filter import ReActStreamFilter, ReActSection, ANSWER_TOKEN
 # from langchain_core.messages import BaseMessage # For type checking # MOVED BaseMessage to combined import
 import re
 
@@ -26,15 +29,26 @@ class EventType:
     AGENT_FINISH = "on_agent_finish"
     CHAT_MODEL_STREAM = "on_chat_model_stream" # Langchain standard for raw token chunks 
     START = "start"     # Added for model start events
+    AGENT_STEP = "agent_step" # Compact ReAct scaffolding (thought/action/action_input) when streaming is filtered
+    USAGE = "usage"     # Live tokens/s while streaming, then the turn's token usage summary (final=True)
 
 class CustomAsyncIteratorCallbackHandler(AsyncCallbackHandler):
     # run_inline, ignore_chain, ignore_llm, ignore_agent, ignore_tool, raise_error
     # are inherited from BaseCallbackHandler via AsyncCallbackHandler with default values.
     # No need to redefine them unless overriding the default.
 
-    def __init__(self, output_stream_fn: callable, **kwargs: Any):
+    def __init__(self, output_stream_fn: callable, verbosity: Optional[str] = None, session_id: Optional[str] = None,
+                 react_filter: bool = False, speculator: Optional[Any] = None, **kwargs: Any):
         super().__init__(**kwargs)
         self.output_stream_fn = output_stream_fn
+        self.session_id = session_id # Only used to key hot-path log sampling
+        # Projects chain/tool payloads down to the connection's verbosity level
+        self.projector = EventProjector(verbosity)
+        # In ReAct mode only "Final Answer:" text is streamed as tokens; scaffolding becomes agent_step events
+        self.react_filter = ReActStreamFilter() if react_filter else None
+        # Optional SpeculativeToolDispatcher: starts tool calls as soon as their arguments have streamed
+        self.speculator = speculator if speculator is not None and speculator.enabled else None
+        self._react_action: Optional[str] = None
         # Initialize queue for token handling
         self.queue = asyncio.Queue()
         # Initialize token counter
@@ -69,15 +83,20 @@ class CustomAsyncIteratorCallbackHandler(AsyncCallbackHandler):
             return str(data)
 
     async def on_llm_new_token(self, token: str, *, chunk: Optional[Union[GenerationChunk, ChatGenerationChunk]] = None, **kwargs: Any) -> None:
-        logger.debug(f"CustomAsyncIteratorCallbackHandler.on_llm_new_token: Received token '{token}'")
         try:
             # Send the token directly to the output stream
             # Important: We now directly call output_stream_fn, not expecting a return value
             # The output_stream_fn will directly yield the event to the client
-            self.output_stream_fn(EventType.TOKEN, token)
+            if self.react_filter is not None:
+                self._emit_filtered(self.react_filter.feed(token))
+            else:
+                self.output_stream_fn(EventType.TOKEN, token)
+            if self.speculator is not None:
+                self._observe_for_speculation(chunk)
             
-            # Log token for debugging
-            logger.info(f"Token directly sent to output_stream_fn: '{token}'")
+            # Per-token logging is hot-path: lazy formatting, sampled and rate limited per session
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Token sent to output_stream_fn: %r", token, extra=hot_path(self.session_id))
             
             self.tokens_sent = True
             
@@ -94,25 +113,85 @@ class CustomAsyncIteratorCallbackHandler(AsyncCallbackHandler):
         except Exception as e:
             logger.error(f"Error processing token in on_llm_new_token: {e}", exc_info=True)
 
+    def _emit_filtered(self, outputs) -> None:
+        """Push ReAct filter output: answer text as tokens, scaffolding as agent_step events."""
+        for kind, value in outputs:
+            if kind == ANSWER_TOKEN:
+                self.output_stream_fn(EventType.TOKEN, value)
+                continue
+            if value["step"] == ReActSection.ACTION:
+                self._react_action = value["text"]
+            if self.projector.allows(EventType.AGENT_STEP):
+                self.output_stream_fn(EventType.AGENT_STEP, self.projector.agent_step(value["step"], value["text"]))
+
+    def _observe_for_speculation(self, chunk) -> None:
+        """Hand the partial tool call seen so far to the speculative dispatcher."""
+        if self.react_filter is not None:
+            if self.react_filter.section == ReActSection.ACTION_INPUT:
+                self.speculator.observe_react(self._react_action, self.react_filter.section_text)
+            return
+        message = getattr(chunk, "message", None)
+        tool_call_chunks = getattr(message, "tool_call_chunks", None)
+        if tool_call_chunks:
+            self.speculator.observe_tool_call_chunks(tool_call_chunks)
+
+    def _reset_llm_run(self) -> None:
+        if self.react_filter is not None:
+            self.react_filter.reset()
+            self._react_action = None
+        if self.speculator is not None:
+            self.speculator.reset_stream()
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._reset_llm_run()
+
     async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
-        payload = {"name": serialized.get("name"), "input": input_str}
-        self.output_stream_fn("on_tool_start", self._serialize_data(payload))
+        if not self.projector.allows(EventType.TOOL_START):
+            return
+        tool_name = serialized.get("name") if serialized else None
+        if self.projector.is_debug:
+            payload = self._serialize_data({"name": tool_name, "input": input_str})
+        else:
+            payload = self.projector.tool_start(tool_name, input_str, kwargs.get("run_id"), kwargs.get("parent_run_id"))
+        self.output_stream_fn(EventType.TOOL_START, payload)
 
     async def on_tool_end(self, output: str, **kwargs: Any) -> None:
-        self.output_stream_fn("on_tool_end", self._serialize_data({"output": output}))
+        if not self.projector.allows(EventType.TOOL_END):
+            return
+        if self.projector.is_debug:
+            payload = self._serialize_data({"output": output})
+        else:
+            payload = self.projector.tool_end(output, kwargs.get("run_id"), kwargs.get("name"))
+        self.output_stream_fn(EventType.TOOL_END, payload)
 
     async def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs: Any) -> None:
+        if not self.projector.allows(EventType.CHAIN_START):
+            return
         chain_name = "Unknown Chain (serialized is None)"
         if serialized:
             chain_name = serialized.get("name", serialized.get("id", ["Unknown chain"])[-1])
-        payload = {"name": chain_name, "inputs": inputs}
-        self.output_stream_fn("on_chain_start", self._serialize_data(payload))
+        elif kwargs.get("name"):
+            chain_name = kwargs["name"]
+        if self.projector.is_debug:
+            payload = self._serialize_data({"name": chain_name, "inputs": inputs})
+        else:
+            # Never serialize inputs here: they carry the whole chat history and scratchpad
+            payload = self.projector.chain_start(chain_name, inputs, kwargs.get("run_id"), kwargs.get("parent_run_id"))
+        self.output_stream_fn(EventType.CHAIN_START, payload)
 
     async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
-        logger.debug(f"CustomAsyncIteratorCallbackHandler on_llm_end. Response: {response}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("CustomAsyncIteratorCallbackHandler on_llm_end. Response: %r", response, extra=hot_path(self.session_id))
         # Log the raw response from LLM
         # logger.debug(f"CustomAsyncIteratorCallbackHandler on_llm_end. Response: {response!r} llm_output={response.llm_output} run={kwargs.get('run_id')}")
 
+        if self.react_filter is not None:
+            self._emit_filtered(self.react_filter.flush())
+        elif self.speculator is not None:
+            # Tool-calling models: the final message's tool_calls are the authoritative parse
+            final_message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+            self.speculator.retain((call["name"], call["args"]) for call in getattr(final_message, "tool_calls", None) or [])
+
         # LLM streaming is finished. Clear the buffer if needed.
         # Do NOT send ON_CHAIN_END from here; let the service handle the final chain output.
         if self.token_buffer:
@@ -123,19 +202,31 @@ class CustomAsyncIteratorCallbackHandler(AsyncCallbackHandler):
             # logger.info("CustomAsyncIteratorCallbackHandler on_llm_end: LLM stream finished. Buffer was already empty.")
 
     async def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
-        logger.debug(f"CustomAsyncIteratorCallbackHandler on_chain_end. Outputs: {outputs}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("CustomAsyncIteratorCallbackHandler on_chain_end. Outputs: %r", outputs, extra=hot_path(self.session_id))
         
         # This method is called when a chain ends. We will log the output,
         # but we will NOT send the ON_CHAIN_END event from here.
         # The LangchainAgentService will determine the true final output and send it.
 
     async def on_agent_action(self, action: AgentAction, **kwargs: Any) -> None:
-        self.output_stream_fn("on_agent_action", self._serialize_data(action))
+        if self.speculator is not None and self.react_filter is not None:
+            # ReAct emits a single action per step; anything else started speculatively is wrong
+            self.speculator.retain([(action.tool, action.tool_input)])
+        if not self.projector.allows(EventType.AGENT_ACTION):
+            return
+        if self.projector.is_debug:
+            payload = self._serialize_data(action)
+        else:
+            payload = self.projector.agent_action(action.tool, action.tool_input, kwargs.get("run_id"))
+        self.output_stream_fn(EventType.AGENT_ACTION, payload)
         
     async def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
         # Send the final agent output as a 'message' type event
         # The 'output' key within return_values is commonly where the final string is.
         final_output_data = finish.return_values.get("output", finish.return_values)
+        if self.speculator is not None:
+            self.speculator.cancel_all()
         self.output_stream_fn("message", self._serialize_data(final_output_data))
         
     async def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
@@ -156,8 +247,10 @@ class CustomAsyncIteratorCallbackHandler(AsyncCallbackHandler):
     ) -> Any:
         logger.debug(f"CustomAsyncIteratorCallbackHandler.on_chat_model_start: Chat model starting")
         try:
+            self._reset_llm_run()
             await self.queue.put({"type": "on_chat_model_start"})
-            self.output_stream_fn(EventType.START, {"type": "chat_model"})
+            if self.projector.allows(EventType.START):
+                self.output_stream_fn(EventType.START, {"type": "chat_model"})
         except Exception as e:
             logger.error(f"Error in on_chat_model_start: {e}", exc_info=True)
 
@@ -174,7 +267,8 @@ class MCPEventCollector(AsyncCallbackHandler):
 
     async def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
         """Collects output when a chain ends."""
-        logger.debug(f"MCPEventCollector on_chain_end. Outputs: {outputs}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MCPEventCollector on_chain_end. Outputs: %r", outputs)
         self.collected_events.append({"event": "on_chain_end", "data": outputs})
         # Heuristic to find the final output string
         if isinstance(outputs, dict):
@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class EventVerbosity:
+    """Per-connection verbosity levels for agent callback events."""
+    TOKENS_ONLY = "tokens_only" # Tokens, final message, errors and end only
+    SUMMARY = "summary"         # Names, IDs, timings and bounded previews
+    DEBUG = "debug"             # Full serialized payloads (legacy behaviour)
+
+    ALL = (TOKENS_ONLY, SUMMARY, DEBUG)
+
+    @classmethod
+    def normalize(cls, value: Optional[str]) -> str:
+        """Return a valid verbosity level, falling back to the configured default."""
+        if isinstance(value, str) and value.strip().lower() in cls.ALL:
+            return value.strip().lower()
+        if value:
+            logger.warning(f"Unknown event verbosity '{value}', using '{DEFAULT_EVENT_VERBOSITY}'.")
+        return DEFAULT_EVENT_VERBOSITY
+
+DEFAULT_EVENT_VERBOSITY = os.getenv("MCP_EVENT_VERBOSITY", EventVerbosity.SUMMARY).lower()
+if DEFAULT_EVENT_VERBOSITY not in EventVerbosity.ALL:
+    DEFAULT_EVENT_VERBOSITY = EventVerbosity.SUMMARY
+
+# Maximum number of characters kept in previews of tool inputs/outputs
+DEFAULT_PREVIEW_CHARS = int(os.getenv("MCP_EVENT_PREVIEW_CHARS", "200"))
+
+# Event types that carry structural detail and are dropped entirely in tokens_only mode
+STRUCTURAL_EVENT_TYPES = {
+    "on_chain_start",
+    "on_tool_start",
+    "on_tool_end",
+    "on_agent_action",
+    "agent_step",
+    "start",
+}
+
+def bounded_preview(value: Any, limit: int = DEFAULT_PREVIEW_CHARS) -> Dict[str, Any]:
+    """Return a bounded string preview of value along with its full length."""
+    text = value if isinstance(value, str) else str(value)
+    return {
+        "preview": text[:limit],
+        "length": len(text),
+        "truncated": len(text) > limit,
+    }
+
+class EventProjector:
+    """
+    Projects chain/tool/agent callback data down to what a connection asked for.
+
+    In ``debug`` mode (``is_debug``) callers skip the projector and send the full
+    serialized data instead. In ``summary`` mode only names, run IDs, timings and
+    bounded previews are produced, and the (potentially huge) chain inputs are never
+    serialized at all. In ``tokens_only`` mode structural events are suppressed.
+    """
+
+    def __init__(self, verbosity: Optional[str] = None, preview_chars: int = DEFAULT_PREVIEW_CHARS):
+        self.verbosity = EventVerbosity.normalize(verbosity)
+        self.preview_chars = preview_chars
+        self._run_started: Dict[Any, float] = {}
+
+    @property
+    def is_debug(self) -> bool:
+        return self.verbosity == EventVerbosity.DEBUG
+
+    def allows(self, event_type: str) -> bool:
+        if self.verbosity == EventVerbosity.TOKENS_ONLY:
+            return event_type not in STRUCTURAL_EVENT_TYPES
+        return True
+
+    def mark_start(self, run_id: Any) -> float:
+        started = time.time()
+        if run_id is not None:
+            self._run_started[run_id] = started
+        return started
+
+    def elapsed_ms(self, run_id: Any) -> Optional[float]:
+        started = self._run_started.pop(run_id, None) if run_id is not None else None
+        if started is None:
+            return None
+        return round((time.time() - started) * 1000, 1)
+
+    def chain_start(self, name: str, inputs: Any, run_id: Any = None, parent_run_id: Any = None) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "run_id": str(run_id) if run_id else None,
+            "parent_run_id": str(parent_run_id) if parent_run_id else None,
+            "ts": time.time(), # Not tracked: chain ends carry no duration, so nothing would pop it
+            "input_keys": sorted(inputs.keys()) if isinstance(inputs, dict) else None,
+        }
+
+    def tool_start(self, name: Optional[str], input_str: Any, run_id: Any = None, parent_run_id: Any = None) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "run_id": str(run_id) if run_id else None,
+            "parent_run_id": str(parent_run_id) if parent_run_id else None,
+            "ts": self.mark_start(run_id),
+            "input": bounded_preview(input_str, self.preview_chars),
+        }
+
+    def tool_end(self, output: Any, run_id: Any = None, name: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "run_id": str(run_id) if run_id else None,
+            "duration_ms": self.elapsed_ms(run_id),
+            "output": bounded_preview(output, self.preview_chars),
+        }
+
+    def agent_step(self, step: str, text: str) -> Dict[str, Any]:
+        if self.is_debug:
+            return {"step": step, "text": text}
+        return {"step": step, "text": bounded_preview(text, self.preview_chars)}
+
+    def agent_action(self, tool: str, tool_input: Any, run_id: Any = None) -> Dict[str, Any]:
+        return {
+            "tool": tool,
+            "run_id": str(run_id) if run_id else None,
+            "tool_input": bounded_preview(tool_input, self.preview_chars),
+        }
@@ -0,0 +1,94 @@
+import os
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coalescing window and size cap for streamed text frames (env-overridable)
+STREAM_FLUSH_MAX_DELAY_MS = float(os.getenv("MCP_STREAM_FLUSH_MAX_DELAY_MS", "30"))
+STREAM_FLUSH_MAX_CHARS = int(os.getenv("MCP_STREAM_FLUSH_MAX_CHARS", "512"))
+
+class AdaptiveFlushPolicy:
+    """
+    When to write buffered stream text to the client.
+
+    A chunk that arrives after a quiet period (the first one, or any chunk more than
+    max_delay_ms after the previous flush) is flushed immediately. Chunks arriving in a
+    burst are coalesced into one frame for at most max_delay_ms or max_chars, whichever
+    comes first. A slow provider therefore still gets one frame per token with no added
+    delay, while a fast one is not throttled but sends fewer, larger frames.
+    """
+
+    def __init__(self, max_delay_ms: float = STREAM_FLUSH_MAX_DELAY_MS, max_chars: int = STREAM_FLUSH_MAX_CHARS):
+        self.max_delay = max(max_delay_ms, 0) / 1000.0
+        self.max_chars = max_chars
+        self.flushes = 0
+        self.last_flush_at: Optional[float] = None
+
+    def should_flush(self, buffered_chars: int, buffered_since: float, now: float) -> bool:
+        if self.last_flush_at is None or buffered_since - self.last_flush_at >= self.max_delay:
+            return True # Quiet stream: don't hold the token back
+        return buffered_chars >= self.max_chars or now - buffered_since >= self.max_delay
+
+    def flushed(self, now: float) -> None:
+        self.flushes += 1
+        self.last_flush_at = now
+
+    def remaining(self, buffered_since: float, now: float) -> float:
+        """Seconds until buffered text must be flushed even if no new chunk arrives."""
+        return max(self.max_delay - (now - buffered_since), 0.0)
+
+async def coalesce_text_stream(chunks: AsyncIterator[str], policy: Optional[AdaptiveFlushPolicy] = None) -> AsyncIterator[str]:
+    """Re-chunk a text stream according to policy; never holds text past the policy's deadline."""
+    policy = policy or AdaptiveFlushPolicy()
+    iterator = chunks.__aiter__()
+    buffer: List[str] = []
+    buffered_chars = 0
+    buffered_since = 0.0
+    next_chunk: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+            if buffer:
+                done, _pending = await asyncio.wait({next_chunk}, timeout=policy.remaining(buffered_since, time.monotonic()))
+                if not done: # Deadline hit while the provider is quiet: send what we have
+                    policy.flushed(time.monotonic())
+                    yield "".join(buffer)
+                    buffer, buffered_chars = [], 0
+                    continue
+            try:
+                chunk = await next_chunk
+            except StopAsyncIteration:
+                next_chunk = None
+                break
+            next_chunk = None
+            if not chunk:
+                continue
+            now = time.monotonic()
+            if not buffer:
+                buffered_since = now
+            buffer.append(chunk)
+            buffered_chars += len(chunk)
+            if policy.should_flush(buffered_chars, buffered_since, now):
+                policy.flushed(now)
+                yield "".join(buffer)
+                buffer, buffered_chars = [], 0
+        if buffer:
+            policy.flushed(time.monotonic())
+            yield "".join(buffer)
+    finally:
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+            try:
+                await next_chunk
+            except BaseException:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception as e_close:
+                logger.debug(f"Error closing coalesced stream: {e_close}")
@@ -0,0 +1,128 @@
+import os
+import logging
+import importlib.util
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool limits and default timeouts of the shared outbound clients (env-overridable)
+HTTP_MAX_CONNECTIONS = int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("MCP_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MCP_HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("MCP_HTTP_READ_TIMEOUT_SECONDS", "600"))
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2]); plain keep-alive HTTP/1.1 otherwise
+HTTP2_ENABLED = os.getenv("MCP_HTTP2", "1").lower() not in ("0", "false", "no") and importlib.util.find_spec("h2") is not None
+
+def _origin(base_url: str) -> str:
+    """Pool key: scheme://host:port, so '/v1' and '/api' paths on one host share connections."""
+    url = httpx.URL(base_url.strip())
+    port = url.port or (443 if url.scheme == "https" else 80)
+    return f"{url.scheme}://{url.host}:{port}"
+
+def _default_timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+class HTTPClientRegistry:
+    """
+    App-scoped httpx clients, one async (and, on demand, one sync) client per origin.
+
+    Ollama helpers and OpenAI-compatible providers (DeepSeek, EricAI) reuse warm keep-alive
+    connections instead of paying a TCP/TLS handshake per call. Callers that need a shorter
+    timeout pass timeout= on the individual request. Clients are closed on app shutdown.
+    """
+
+    def __init__(self):
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._requests: Dict[Tuple[str, str], int] = {}
+
+    def get_async_client(self, base_url: str) -> httpx.AsyncClient:
+        origin = _origin(base_url)
+        client = self._async_clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._async_clients[origin] = httpx.AsyncClient(
+                timeout=_default_timeout(),
+                limits=_limits(),
+                http2=HTTP2_ENABLED,
+                event_hooks={"request": [self._count_async(origin)]},
+            )
+            logger.info(f"Created pooled HTTP client for {origin} (http2={HTTP2_ENABLED}, max_connections={HTTP_MAX_CONNECTIONS}).")
+        return client
+
+    def get_sync_client(self, base_url: str) -> httpx.Client:
+        """Sync counterpart for libraries that also need a blocking client (e.g. ChatOpenAI's invoke())."""
+        origin = _origin(base_url)
+        client = self._sync_clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._sync_clients[origin] = httpx.Client(
+                timeout=_default_timeout(),
+                limits=_limits(),
+                http2=HTTP2_ENABLED,
+                event_hooks={"request": [self._count_sync(origin)]},
+            )
+        return client
+
+    def _count_async(self, origin: str):
+        async def on_request(request: httpx.Request) -> None:
+            self._requests[(origin, "async")] = self._requests.get((origin, "async"), 0) + 1
+        return on_request
+
+    def _count_sync(self, origin: str):
+        def on_request(request: httpx.Request) -> None:
+            self._requests[(origin, "sync")] = self._requests.get((origin, "sync"), 0) + 1
+        return on_request
+
+    def stats(self) -> Dict[str, Any]:
+        clients: List[Dict[str, Any]] = []
+        for kind, registry in (("async", self._async_clients), ("sync", self._sync_clients)):
+            for origin, client in registry.items():
+                clients.append({
+                    "origin": origin,
+                    "kind": kind,
+                    "closed": client.is_closed,
+                    "requests": self._requests.get((origin, kind), 0),
+                })
+        return {
+            "http2": HTTP2_ENABLED,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_seconds": HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            "clients": clients,
+        }
+
+    async def aclose(self) -> None:
+        """Close every pooled client (app shutdown)."""
+        async_clients, self._async_clients = self._async_clients, {}
+        sync_clients, self._sync_clients = self._sync_clients, {}
+        for origin, client in async_clients.items():
+            try:
+                await client.aclose()
+            except Exception as e_close:
+                logger.warning(f"Error closing HTTP client for {origin}: {e_close}")
+        for origin, client in sync_clients.items():
+            try:
+                client.close()
+            except Exception as e_close:
+                logger.warning(f"Error closing HTTP client for {origin}: {e_close}")
+        if async_clients or sync_clients:
+            logger.info(f"Closed {len(async_clients) + len(sync_clients)} pooled HTTP clients.")
+
+http_client_registry = HTTPClientRegistry()
+
+def get_async_client(base_url: str) -> httpx.AsyncClient:
+    """Shared async client for base_url's origin."""
+    return http_client_registry.get_async_client(base_url)
+
+def get_sync_client(base_url: str) -> httpx.Client:
+    """Shared sync client for base_url's origin."""
+    return http_client_registry.get_sync_client(base_url)
@@ -1,37 +1,72 @@
+import os
+import time
+import asyncio
 import logging
+from typing import Any, Awaitable, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
-async def shutdown_process_manager(process_manager):
+# One deadline for the whole shutdown: SIGTERM everything, SIGKILL whatever is left after this
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("MCP_SHUTDOWN_GRACE_SECONDS", "5"))
+
+async def shutdown_process_manager(process_manager, timeout: float = SHUTDOWN_GRACE_SECONDS) -> Dict[str, Any]:
+    """Stop all managed servers concurrently (SIGTERM, SIGKILL after the shared timeout)."""
     try:
-        active_servers = []
-        if hasattr(process_manager, "get_active_servers"):
-            active_servers = process_manager.get_active_servers()
-        elif hasattr(process_manager, "get_all_servers"):
-            active_servers = process_manager.get_all_servers()
-        elif hasattr(process_manager, "get_running_servers"):
-            active_servers = process_manager.get_running_servers()
-        else:
-            logger.warning("ProcessManager does not provide a method to get active servers. Cannot shut them down.")
-        for server_name in active_servers:
-            try:
-                process_manager.stop_server(server_name)
-                logger.info(f"Stopped server {server_name} during shutdown")
-            except Exception as e:
-                logger.error(f"Error stopping server {server_name} during shutdown: {e}")
+        return await process_manager.stop_all(timeout=timeout)
     except Exception as e:
-        logger.error(f"Error during ProcessManager shutdown: {e}")
+        logger.error(f"Error during ProcessManager shutdown: {e}", exc_info=True)
+        return {"error": str(e)}
 
-async def shutdown_agent_service(agent_service):
+async def shutdown_agent_service(agent_service, timeout: float = SHUTDOWN_GRACE_SECONDS) -> Dict[str, Any]:
     try:
         logger.info("Stopping agent service dispatcher...")
         agent_service.shutdown() # This will call stop_dispatcher()
         logger.info("Agent service dispatcher stopped.")
         if hasattr(agent_service, "close_mcp_clients"):
             logger.info("Closing MCP clients from agent service...")
-            await agent_service.close_mcp_clients()
-            logger.info("MCP clients closed.")
-        else:
-            logger.warning("Agent service does not have close_mcp_clients method.")
+            return await agent_service.close_mcp_clients(timeout=timeout)
+        logger.warning("Agent service does not have close_mcp_clients method.")
+        return {}
     except Exception as e:
-        logger.error(f"Error during agent service shutdown: {e}", exc_info=True) 
\ No newline at end of file
+        logger.error(f"Error during agent service shutdown: {e}", exc_info=True)
+        return {"error": str(e)}
+
+async def _bounded(name: str, awaitable: Awaitable[Any], timeout: float) -> Any:
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Shutdown step '{name}' did not finish within {timeout:.1f}s; abandoning it.")
+        return {"error": "timed out"}
+    except Exception as e:
+        logger.error(f"Shutdown step '{name}' failed: {e}", exc_info=True)
+        return {"error": str(e)}
+
+async def shutdown_servers_and_clients(process_manager, agent_service, standby_pool_manager=None,
+                                       grace_seconds: float = SHUTDOWN_GRACE_SECONDS) -> Dict[str, Any]:
+    """
+    Coordinated shutdown of every child process the app owns: managed servers, the stdio
+    servers behind session MCP clients and standby instances go down concurrently under one
+    grace period, so shutdown takes about grace_seconds no matter how many there are.
+    Returns (and logs) what was terminated, killed or left behind.
+    """
+    started = time.perf_counter()
+    # Hard cap for steps that hang past the grace period (SIGKILL and reaping take a moment)
+    hard_timeout = grace_seconds + 5.0
+    steps: Dict[str, Awaitable[Any]] = {
+        "servers": shutdown_process_manager(process_manager, timeout=grace_seconds),
+        "mcp_clients": shutdown_agent_service(agent_service, timeout=grace_seconds),
+    }
+    if standby_pool_manager is not None:
+        steps["standby_pools"] = standby_pool_manager.stop()
+    results = await asyncio.gather(*(_bounded(name, step, hard_timeout) for name, step in steps.items()))
+    report: Dict[str, Optional[Any]] = dict(zip(steps, results))
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    servers = report["servers"] or {}
+    clients = report["mcp_clients"] or {}
+    logger.info(
+        f"Shutdown reaped in {report['duration_ms']:.0f}ms: servers terminated={len(servers.get('terminated', {}))} "
+        f"killed={len(servers.get('killed', {}))} failed={len(servers.get('failed', {}))} "
+        f"still_running={servers.get('still_running', [])}; MCP clients closed={len(clients.get('closed', []))} "
+        f"killed={len(clients.get('timed_out', []))} failed={len(clients.get('failed', {}))}."
+    )
+    return report
@@ -0,0 +1,188 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DEFAULT_LOG_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'mcp_app.log')
+
+# Defaults for the logging section of config.json; env vars (MCP_LOG_*) take precedence
+DEFAULT_LOGGING_SETTINGS: Dict[str, Any] = {
+    "level": "INFO",
+    "file": DEFAULT_LOG_FILE,
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "console": True,
+    "levels": {},                  # e.g. {"mcp_web_app.utils.chat": "DEBUG", "httpx": "WARNING"}
+    "hot_path_rate_per_second": 20, # per (session, logger) token bucket
+    "hot_path_sample_every": 1,     # keep 1 in N hot-path records before rate limiting
+}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+def hot_path(session_id: Optional[str] = None) -> Dict[str, Any]:
+    """`extra` mapping that marks a log record as hot-path (sampled and rate limited)."""
+    return {"hot_path": True, "session_id": session_id}
+
+class HotPathRateLimiter(logging.Filter):
+    """
+    Samples and rate limits records marked with hot_path(), keyed per session and logger.
+    Records without the marker always pass. Runs in the calling thread, so it stays O(1).
+    """
+
+    def __init__(self, rate_per_second: float = 20, sample_every: int = 1):
+        super().__init__()
+        self.rate_per_second = max(float(rate_per_second), 0.0)
+        self.sample_every = max(int(sample_every), 1)
+        self._buckets: Dict[Tuple[Optional[str], str], list] = {} # key -> [tokens, last_refill, seen]
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "hot_path", False):
+            return True
+        key = (getattr(record, "session_id", None), record.name)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.rate_per_second, now, 0]
+                self._buckets[key] = bucket
+                if len(self._buckets) > 4096: # Sessions come and go; don't grow unbounded
+                    self._buckets.pop(next(iter(self._buckets)))
+            bucket[2] += 1
+            if bucket[2] % self.sample_every != 0:
+                self.dropped += 1
+                return False
+            bucket[0] = min(self.rate_per_second, bucket[0] + (now - bucket[1]) * self.rate_per_second)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                self.dropped += 1
+                return False
+            bucket[0] -= 1.0
+            self.passed += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"passed": self.passed, "dropped": self.dropped, "tracked_keys": len(self._buckets)}
+
+class DeferredFormatQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records as they are. The stock prepare() formats the message
+    (and any traceback) in the calling thread so records can be pickled; this queue never
+    leaves the process, so formatting is left to the listener thread's handlers.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _env_overrides(settings: Dict[str, Any]) -> Dict[str, Any]:
+    if os.getenv("MCP_LOG_LEVEL"):
+        settings["level"] = os.getenv("MCP_LOG_LEVEL")
+    if os.getenv("MCP_LOG_FILE"):
+        settings["file"] = os.getenv("MCP_LOG_FILE")
+    if os.getenv("MCP_LOG_MAX_BYTES"):
+        settings["max_bytes"] = int(os.getenv("MCP_LOG_MAX_BYTES"))
+    if os.getenv("MCP_LOG_BACKUP_COUNT"):
+        settings["backup_count"] = int(os.getenv("MCP_LOG_BACKUP_COUNT"))
+    if os.getenv("MCP_LOG_HOT_PATH_RATE"):
+        settings["hot_path_rate_per_second"] = float(os.getenv("MCP_LOG_HOT_PATH_RATE"))
+    if os.getenv("MCP_LOG_HOT_PATH_SAMPLE"):
+        settings["hot_path_sample_every"] = int(os.getenv("MCP_LOG_HOT_PATH_SAMPLE"))
+    # MCP_LOG_LEVELS="mcp_web_app.utils.chat=DEBUG,httpx=WARNING"
+    for item in filter(None, (os.getenv("MCP_LOG_LEVELS") or "").split(",")):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            settings["levels"][name.strip()] = level.strip()
+    return settings
+
+def resolve_logging_settings(app_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge defaults, the 'logging' section of config.json and MCP_LOG_* env vars."""
+    settings = dict(DEFAULT_LOGGING_SETTINGS)
+    settings["levels"] = dict(DEFAULT_LOGGING_SETTINGS["levels"])
+    file_settings = (app_config or {}).get("logging") or {}
+    if isinstance(file_settings, dict):
+        for key, value in file_settings.items():
+            if key == "levels" and isinstance(value, dict):
+                settings["levels"].update(value)
+            else:
+                settings[key] = value
+    return _env_overrides(settings)
+
+def configure_logging(app_config: Optional[Dict[str, Any]] = None) -> QueueListener:
+    """
+    Route all logging through a QueueHandler so callers on the event loop only enqueue
+    records; a QueueListener thread does the formatting and the (rotating) file writes.
+    Safe to call more than once: a previous pipeline is stopped and replaced.
+    """
+    global _listener, _queue_handler
+    settings = resolve_logging_settings(app_config)
+    shutdown_logging()
+
+    formatter = logging.Formatter(DEFAULT_LOG_FORMAT)
+    handlers = []
+    if settings.get("file"):
+        file_handler = RotatingFileHandler(
+            settings["file"],
+            maxBytes=int(settings["max_bytes"]),
+            backupCount=int(settings["backup_count"]),
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if settings.get("console", True):
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    _queue_handler = DeferredFormatQueueHandler(log_queue)
+    _queue_handler.addFilter(HotPathRateLimiter(
+        rate_per_second=settings["hot_path_rate_per_second"],
+        sample_every=settings["hot_path_sample_every"],
+    ))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_queue_handler)
+    root.setLevel(str(settings["level"]).upper())
+    for logger_name, level in settings["levels"].items():
+        logging.getLogger(logger_name).setLevel(str(level).upper())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging() -> None:
+    """Stop the background listener, flushing queued records to disk."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        try:
+            _listener.stop()
+        finally:
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Queue depth and hot-path limiter counters, for diagnostics endpoints."""
+    if _queue_handler is None:
+        return {"configured": False}
+    limiter = next((f for f in _queue_handler.filters if isinstance(f, HotPathRateLimiter)), None)
+    return {
+        "configured": True,
+        "queue_depth": _queue_handler.queue.qsize(),
+        "hot_path": limiter.stats() if limiter else None,
+    }
+
+atexit.register(shutdown_logging)
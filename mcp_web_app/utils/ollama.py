@@ -3,6 +3,7 @@ import logging
 from typing import Optional, List, Dict, Any
 from pydantic import ValidationError
 from mcp_web_app.models.ollama import OllamaTagsResponse
+from mcp_web_app.utils.http_clients import get_async_client
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +11,7 @@ async def test_ollama_connection_helper(base_url: str) -> Dict[str, Any]:
     base_url = base_url.rstrip('/') + '/'
     test_url = base_url
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(test_url)
+        response = await get_async_client(base_url).get(test_url, timeout=5.0)
         if response.status_code == 200:
             if "ollama is running" in response.text.lower():
                 return {"success": True, "message": "Successfully connected to Ollama and recognized the server."}
@@ -30,8 +30,7 @@ async def list_ollama_models_helper(base_url: str) -> Dict[str, Any]:
     base_url = base_url.rstrip('/')
     list_tags_url = f"{base_url}/api/tags"
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(list_tags_url)
+        response = await get_async_client(base_url).get(list_tags_url, timeout=10.0)
         if response.status_code == 200:
             try:
                 tags_data = response.json()
@@ -47,4 +46,47 @@ async def list_ollama_models_helper(base_url: str) -> Dict[str, Any]:
     except httpx.TimeoutException:
         return {"success": False, "message": "Request to fetch models from Ollama timed out."}
     except Exception as e:
-        return {"success": False, "message": f"An unexpected error occurred: {str(e)}"} 
\ No newline at end of file
+        return {"success": False, "message": f"An unexpected error occurred: {str(e)}"}
+
+async def list_running_ollama_models_helper(base_url: str) -> Dict[str, Any]:
+    """Models currently loaded in memory (GET /api/ps)."""
+    base_url = base_url.rstrip('/')
+    ps_url = f"{base_url}/api/ps"
+    try:
+        response = await get_async_client(base_url).get(ps_url, timeout=5.0)
+        if response.status_code == 200:
+            try:
+                running = response.json().get("models") or []
+                return {"success": True, "models": running}
+            except Exception as e_parse:
+                return {"success": False, "message": "Error processing data from Ollama server.", "details": str(e_parse)}
+        else:
+            return {"success": False, "message": f"Ollama server returned status {response.status_code}.", "details": response.text[:200]}
+    except httpx.TimeoutException:
+        return {"success": False, "message": "Request to list running models from Ollama timed out."}
+    except httpx.ConnectError:
+        return {"success": False, "message": "Connection to Ollama failed. Ensure the Base URL is correct and the Ollama server is running."}
+    except Exception as e:
+        return {"success": False, "message": f"An unexpected error occurred: {str(e)}"}
+
+async def load_ollama_model_helper(base_url: str, model: str, keep_alive: Optional[Any] = None, timeout: float = 300.0) -> Dict[str, Any]:
+    """Load a model into memory without generating (empty /api/generate request), keeping it for keep_alive."""
+    base_url = base_url.rstrip('/')
+    generate_url = f"{base_url}/api/generate"
+    payload: Dict[str, Any] = {"model": model}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    try:
+        response = await get_async_client(base_url).post(generate_url, json=payload, timeout=timeout)
+        if response.status_code == 200:
+            data = response.json()
+            load_duration_ns = data.get("load_duration") or data.get("total_duration")
+            return {"success": True, "load_seconds": load_duration_ns / 1e9 if load_duration_ns else None}
+        else:
+            return {"success": False, "message": f"Ollama server returned status {response.status_code}.", "details": response.text[:200]}
+    except httpx.TimeoutException:
+        return {"success": False, "message": f"Loading model '{model}' in Ollama timed out."}
+    except httpx.ConnectError:
+        return {"success": False, "message": "Connection to Ollama failed. Ensure the Base URL is correct and the Ollama server is running."}
+    except Exception as e:
+        return {"success": False, "message": f"An unexpected error occurred: {str(e)}"}
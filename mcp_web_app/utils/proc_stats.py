@@ -0,0 +1,131 @@
+import os
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def proc_available() -> bool:
+    """True on Linux-like systems with a readable /proc (the sampler is a no-op elsewhere)."""
+    return os.path.isdir(os.path.join(PROC_ROOT, "self"))
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except (OSError, ValueError):
+        return None # Process exited between listing and reading, or no permission
+
+def read_stat(pid: int) -> Optional[Dict[str, int]]:
+    """ppid, CPU ticks (user + system), thread count and RSS from /proc/<pid>/stat."""
+    data = _read(f"{PROC_ROOT}/{pid}/stat")
+    if not data:
+        return None
+    # comm (field 2) may contain spaces and parentheses; everything after the last ')' is fixed
+    fields = data[data.rindex(")") + 2:].split()
+    try:
+        return {
+            "ppid": int(fields[1]),
+            "cpu_ticks": int(fields[11]) + int(fields[12]), # utime + stime
+            "threads": int(fields[17]),
+            "rss_bytes": int(fields[21]) * PAGE_SIZE,
+        }
+    except (IndexError, ValueError):
+        return None
+
+def read_status_memory(pid: int) -> Dict[str, int]:
+    """VmRSS and VmHWM (peak RSS) in bytes from /proc/<pid>/status."""
+    data = _read(f"{PROC_ROOT}/{pid}/status") or ""
+    memory = {}
+    for line in data.splitlines():
+        key, _sep, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            parts = value.split()
+            if parts and parts[0].isdigit():
+                memory[key] = int(parts[0]) * 1024 # Reported in kB
+    return memory
+
+def count_fds(pid: int) -> Optional[int]:
+    try:
+        return len(os.listdir(f"{PROC_ROOT}/{pid}/fd"))
+    except OSError:
+        return None
+
+def children_map() -> Dict[int, List[int]]:
+    """ppid -> child pids of every process (one pass over /proc)."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir(PROC_ROOT)
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        stat = read_stat(int(entry))
+        if stat is not None:
+            children.setdefault(stat["ppid"], []).append(int(entry))
+    return children
+
+def process_tree(root_pid: int, children: Dict[int, List[int]]) -> List[int]:
+    """root_pid and all its descendants (e.g. the node process behind an npx wrapper)."""
+    tree, stack, seen = [], [root_pid], set()
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        tree.append(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
+def sample_tree(pids: Iterable[int]) -> Dict[str, object]:
+    """Summed CPU ticks, RSS, peak RSS, threads and open FDs of a process tree, plus per-pid ticks."""
+    ticks: Dict[int, int] = {}
+    totals = {"rss_bytes": 0, "peak_rss_bytes": 0, "threads": 0, "fds": 0, "processes": 0}
+    for pid in pids:
+        stat = read_stat(pid)
+        if stat is None:
+            continue
+        memory = read_status_memory(pid)
+        ticks[pid] = stat["cpu_ticks"]
+        totals["processes"] += 1
+        totals["rss_bytes"] += memory.get("VmRSS", stat["rss_bytes"])
+        totals["peak_rss_bytes"] += memory.get("VmHWM", 0)
+        totals["threads"] += stat["threads"]
+        totals["fds"] += count_fds(pid) or 0
+    return {"ticks": ticks, **totals}
+
+def _read_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def read_cmdline(pid: int) -> Optional[List[str]]:
+    data = _read_bytes(f"{PROC_ROOT}/{pid}/cmdline")
+    if not data:
+        return None
+    return [arg.decode("utf-8", errors="surrogateescape") for arg in data.rstrip(b"\0").split(b"\0")]
+
+def read_environ(pid: int) -> Optional[Dict[str, str]]:
+    """Environment the process was exec'd with (needs the same uid)."""
+    data = _read_bytes(f"{PROC_ROOT}/{pid}/environ")
+    if data is None:
+        return None
+    environ = {}
+    for entry in data.split(b"\0"):
+        key, sep, value = entry.decode("utf-8", errors="surrogateescape").partition("=")
+        if sep:
+            environ[key] = value
+    return environ
+
+def read_link(pid: int, name: str) -> Optional[str]:
+    """Target of /proc/<pid>/exe or /proc/<pid>/cwd."""
+    try:
+        return os.readlink(f"{PROC_ROOT}/{pid}/{name}")
+    except OSError:
+        return None
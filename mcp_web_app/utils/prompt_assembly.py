@@ -0,0 +1,87 @@
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+from langchain_core.tools import BaseTool, render_text_description
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+# Providers with prefix caching (DeepSeek, OpenAI) only reuse a cached prompt prefix if it is
+# byte-identical. The prompts below keep everything stable (instructions, tool list) first and
+# the volatile parts (history, user input, scratchpad) last, and tools are always ordered the
+# same way regardless of the order enabled_tools was built in.
+
+# Same text as hub "hwchase17/react", kept locally so prompt bytes can't drift between pulls
+REACT_TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+# System message of hub "hwchase17/openai-tools-agent"
+TOOLS_AGENT_SYSTEM_MESSAGE = "You are a helpful assistant"
+
+def canonical_tools(tools: Sequence[BaseTool]) -> List[BaseTool]:
+    """Tools in a deterministic order (by name), so the rendered tool block is identical across sessions."""
+    return sorted(tools, key=lambda tool: tool.name)
+
+def build_react_prompt() -> PromptTemplate:
+    return PromptTemplate.from_template(REACT_TEMPLATE)
+
+def build_tools_agent_prompt(system_message: str = TOOLS_AGENT_SYSTEM_MESSAGE) -> ChatPromptTemplate:
+    """Stable system text first; chat history, the new input and the scratchpad after it."""
+    return ChatPromptTemplate.from_messages([
+        ("system", system_message),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+def prompt_prefix_fingerprint(tools: Sequence[BaseTool], agent_mode: Optional[str] = None) -> str:
+    """
+    Short hash of the cacheable prefix (instructions + tool definitions) a session sends.
+    Sessions with the same fingerprint can share the provider's prefix cache.
+    """
+    if agent_mode == "react":
+        prefix = REACT_TEMPLATE.split("{input}")[0] + render_text_description(list(tools))
+    else:
+        prefix = TOOLS_AGENT_SYSTEM_MESSAGE
+        try:
+            prefix += json.dumps([convert_to_openai_tool(tool) for tool in tools], sort_keys=True, default=str)
+        except Exception as e:
+            logger.debug(f"Could not serialize tool schemas for prefix fingerprint: {e}")
+            prefix += ",".join(tool.name for tool in tools)
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+def _first_int(*values: Any) -> Optional[int]:
+    for value in values:
+        if isinstance(value, int):
+            return value
+    return None
+
+def cache_hit_tokens_from_message(message: Any) -> Optional[int]:
+    """Prompt tokens the provider served from its prefix cache, if it reported them."""
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    token_usage: Dict[str, Any] = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return _first_int(
+        (usage_metadata.get("input_token_details") or {}).get("cache_read"), # langchain-openai (prompt_tokens_details.cached_tokens)
+        token_usage.get("prompt_cache_hit_tokens"),                          # DeepSeek raw usage
+        (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    )
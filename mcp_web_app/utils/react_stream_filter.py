@@ -0,0 +1,144 @@
+import re
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ReActSection:
+    """Sections of the ReAct grammar parsed by CustomReActParser."""
+    THOUGHT = "thought"
+    ACTION = "action"
+    ACTION_INPUT = "action_input"
+    OBSERVATION = "observation"
+    FINAL_ANSWER = "final_answer"
+
+# Gap the ReAct parser allows inside Action markers (e.g. "Action 1:", "Action Input 2:")
+_STEP_GAP = r"\s*\d*\s*"
+
+# Marker -> section it opens, as the atoms (single characters or _STEP_GAP) of the pattern
+# ReActSingleInputOutputParser matches. Order matters only for readability; matching picks the earliest hit.
+REACT_MARKERS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (tuple("Thought:"), ReActSection.THOUGHT),
+    ((*"Action", _STEP_GAP, *"Input", _STEP_GAP, ":"), ReActSection.ACTION_INPUT),
+    ((*"Action", _STEP_GAP, ":"), ReActSection.ACTION),
+    (tuple("Observation:"), ReActSection.OBSERVATION),
+    (tuple("Final Answer:"), ReActSection.FINAL_ANSWER),
+)
+
+def _atom_pattern(atom: str) -> str:
+    return atom if atom == _STEP_GAP else re.escape(atom)
+
+_MARKER_PATTERNS = [(re.compile("".join(map(_atom_pattern, atoms))), section) for atoms, section in REACT_MARKERS]
+# Any proper prefix of a marker match (the gap is prefix-closed, so prefixes are unions of leading atoms)
+_PARTIAL_MARKER_PATTERN = re.compile("|".join(
+    "".join(map(_atom_pattern, atoms[:size])) for atoms, _section in REACT_MARKERS for size in range(1, len(atoms))
+))
+# Longest tail that is checked for a partial marker (bounds the scan when a gap is long)
+_MAX_PARTIAL_MARKER_CHARS = 32
+
+# Output item kinds returned by ReActStreamFilter.feed()/flush()
+ANSWER_TOKEN = "token"
+AGENT_STEP = "agent_step"
+
+FilterOutput = Tuple[str, Any] # (ANSWER_TOKEN, text) or (AGENT_STEP, {"step": ..., "text": ...})
+
+class ReActStreamFilter:
+    """
+    Incremental state machine over the raw token stream of one ReAct LLM call.
+
+    Scaffolding sections (Thought / Action / Action Input / Observation) are collected
+    and emitted as one compact agent_step item each when the section closes; only text
+    after "Final Answer:" is passed through as answer tokens, as soon as it arrives.
+    A trailing partial marker (e.g. "Final Ans") is held back until the next token
+    decides it, so markers split across tokens are still recognized.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new LLM call (ReAct invokes the model once per step)."""
+        self.section = ReActSection.THOUGHT # Text before any marker is the (implicit) first thought
+        self._pending = ""
+        self._section_text: List[str] = []
+        self._answer_started = False
+
+    @property
+    def section_text(self) -> str:
+        """Text of the open section received so far (excluding a held-back partial marker)."""
+        return "".join(self._section_text)
+
+    @property
+    def in_final_answer(self) -> bool:
+        return self.section == ReActSection.FINAL_ANSWER
+
+    def feed(self, token: str) -> List[FilterOutput]:
+        """Consume one streamed token and return the items it completes."""
+        if not token:
+            return []
+        if self.in_final_answer:
+            # Nothing follows the final answer in the grammar: stream it through unbuffered
+            return self._answer(token)
+
+        outputs: List[FilterOutput] = []
+        self._pending += token
+        while True:
+            hit = self._find_marker(self._pending)
+            if hit is None:
+                break
+            index, marker, section = hit
+            self._section_text.append(self._pending[:index])
+            outputs.extend(self._close_section())
+            self.section = section
+            self._pending = self._pending[index + len(marker):]
+            if self.in_final_answer:
+                outputs.extend(self._answer(self._pending))
+                self._pending = ""
+                return outputs
+
+        keep = self._partial_marker_length(self._pending)
+        self._section_text.append(self._pending[:len(self._pending) - keep])
+        self._pending = self._pending[len(self._pending) - keep:]
+        return outputs
+
+    def flush(self) -> List[FilterOutput]:
+        """End of the LLM call: emit whatever is still buffered."""
+        if self.in_final_answer:
+            outputs = self._answer(self._pending)
+        else:
+            self._section_text.append(self._pending)
+            outputs = self._close_section()
+        self._pending = ""
+        return outputs
+
+    def _answer(self, text: str) -> List[FilterOutput]:
+        if not self._answer_started:
+            text = text.lstrip() # Drop the space/newline right after "Final Answer:"
+            if not text:
+                return []
+            self._answer_started = True
+        return [(ANSWER_TOKEN, text)] if text else []
+
+    def _close_section(self) -> List[FilterOutput]:
+        text = "".join(self._section_text).strip()
+        self._section_text = []
+        if not text:
+            return []
+        return [(AGENT_STEP, {"step": self.section, "text": text})]
+
+    @staticmethod
+    def _find_marker(text: str) -> Optional[Tuple[int, str, str]]:
+        best = None
+        for pattern, section in _MARKER_PATTERNS:
+            match = pattern.search(text)
+            if match and (best is None or match.start() < best[0]):
+                best = (match.start(), match.group(0), section)
+        return best
+
+    @staticmethod
+    def _partial_marker_length(text: str) -> int:
+        """Length of the longest suffix of text that is a proper prefix of some marker."""
+        for start in range(max(0, len(text) - _MAX_PARTIAL_MARKER_CHARS), len(text)):
+            if _PARTIAL_MARKER_PATTERN.fullmatch(text, start):
+                return len(text) - start
+        return 0
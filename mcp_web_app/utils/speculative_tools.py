@@ -0,0 +1,209 @@
+import json
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.tools import BaseTool
+
+from mcp_web_app.utils.logging_pipeline import hot_path
+
+logger = logging.getLogger(__name__)
+
+try:
+    import jsonschema
+except ImportError: # Declared dependency; without it, tools with a JSON-schema args_schema are never dispatched speculatively
+    jsonschema = None
+    logger.warning("jsonschema is not installed: speculative dispatch is disabled for MCP tools (their args can't be validated).")
+
+# Dispatcher of the agent run executing in the current context (set by the agent service per stream)
+current_dispatcher: ContextVar[Optional["SpeculativeToolDispatcher"]] = ContextVar("speculative_tool_dispatcher", default=None)
+
+def _call_key(tool_name: str, tool_args: Any) -> Optional[str]:
+    """Canonical key of a tool call; only structured (dict) arguments can be matched."""
+    if not tool_name or not isinstance(tool_args, dict):
+        return None
+    try:
+        return f"{tool_name.strip()}:{json.dumps(tool_args, sort_keys=True, default=str)}"
+    except (TypeError, ValueError):
+        return None
+
+def normalize_tool_args(tool: BaseTool, tool_args: Any) -> Optional[Dict[str, Any]]:
+    """
+    The arguments the tool would actually be called with (validated and coerced through its
+    args_schema), or None if they don't validate or can't be checked.
+    """
+    if not isinstance(tool_args, dict):
+        return None
+    schema = tool.args_schema
+    try:
+        if isinstance(schema, dict): # MCP tools: the server's inputSchema, passed through unvalidated by LangChain
+            if jsonschema is None:
+                return None
+            jsonschema.validate(tool_args, schema)
+            return dict(tool_args)
+        normalized = tool._parse_input(dict(tool_args), None)
+    except Exception:
+        return None
+    return normalized if isinstance(normalized, dict) else None
+
+def parse_complete_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the JSON object at the start of text once it is syntactically complete, else None.
+    Mirrors CustomReActParser's cleanup of ```json fences around the Action Input.
+    """
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[len("```json"):].strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned[len("```"):].strip()
+    if not cleaned.startswith("{"):
+        return None
+    try:
+        parsed, _end = json.JSONDecoder().raw_decode(cleaned)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+class SpeculativeToolDispatcher:
+    """
+    Starts MCP tool calls from partially streamed LLM output, one agent run at a time.
+
+    The callback handler feeds it the ReAct "Action"/"Action Input" text or the OpenAI
+    tool_call_chunks as they stream. As soon as a call's arguments form a complete JSON
+    object that validates against the tool's schema, the tool coroutine is started while
+    the model is still emitting trailing tokens. When the AgentExecutor later runs the tool,
+    the wrapped coroutine claims the matching in-flight call (matched on normalized
+    arguments) instead of starting a new one. Calls the final parse does not confirm are
+    discarded: their result is dropped, but a call that already reached the server has
+    run, so only tools without side effects should be enabled (see enable_speculative_dispatch).
+    """
+
+    def __init__(self, tools: Iterable[BaseTool], session_id: Optional[str] = None):
+        self.session_id = session_id
+        self._tools = {
+            tool.name: tool
+            for tool in tools
+            if getattr(getattr(tool, "coroutine", None), "speculative_original", None) is not None
+        }
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._tool_call_buffers: Dict[Any, Dict[str, str]] = {}
+        # discarded_after_run: unconfirmed calls that had already completed (their effects happened)
+        self.stats = {"dispatched": 0, "claimed": 0, "discarded": 0, "discarded_after_run": 0, "invalid_args": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._tools)
+
+    def _key(self, tool_name: str, tool_args: Any) -> Optional[str]:
+        """Key of a call to an enabled tool on its normalized arguments (None if they don't validate)."""
+        tool = self._tools.get((tool_name or "").strip())
+        if tool is None:
+            return None
+        normalized = normalize_tool_args(tool, tool_args)
+        return _call_key(tool.name, normalized) if normalized is not None else None
+
+    def dispatch(self, tool_name: str, tool_args: Any) -> bool:
+        """Start a tool call speculatively (idempotent per tool name + normalized arguments)."""
+        tool = self._tools.get((tool_name or "").strip())
+        if tool is None:
+            return False
+        normalized = normalize_tool_args(tool, tool_args)
+        if normalized is None:
+            self.stats["invalid_args"] += 1
+            return False
+        key = _call_key(tool.name, normalized)
+        if key is None or key in self._pending:
+            return False
+        self._pending[key] = asyncio.create_task(tool.coroutine.speculative_original(**normalized))
+        self.stats["dispatched"] += 1
+        logger.info(f"Session {self.session_id}: Speculatively dispatched tool '{tool_name}' before the LLM finished.")
+        return True
+
+    def observe_react(self, action: Optional[str], action_input_text: str) -> None:
+        """Feed the streamed Action Input of a ReAct step; dispatches once the JSON is complete."""
+        if not action:
+            return
+        tool_args = parse_complete_json_object(action_input_text)
+        if tool_args is not None:
+            self.dispatch(action, tool_args)
+
+    def observe_tool_call_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """Feed tool_call_chunks of a streamed AIMessageChunk; dispatches each call once its args are complete."""
+        for chunk in chunks or []:
+            index = chunk.get("index") if chunk.get("index") is not None else chunk.get("id")
+            buffer = self._tool_call_buffers.setdefault(index, {"name": "", "args": ""})
+            buffer["name"] += chunk.get("name") or ""
+            buffer["args"] += chunk.get("args") or ""
+            if not buffer["name"] or not buffer["args"].rstrip().endswith("}"):
+                continue
+            try:
+                tool_args = json.loads(buffer["args"])
+            except ValueError:
+                continue
+            if isinstance(tool_args, dict) and self.dispatch(buffer["name"], tool_args):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Tool call chunk %r complete after %d arg chars", buffer["name"], len(buffer["args"]), extra=hot_path(self.session_id))
+
+    def claim(self, tool_name: str, tool_args: Any) -> Optional[asyncio.Task]:
+        """Take over the in-flight speculative call matching this tool call's normalized arguments, if any."""
+        key = self._key(tool_name, tool_args)
+        task = self._pending.pop(key, None) if key else None
+        if task is not None:
+            self.stats["claimed"] += 1
+            logger.info(f"Session {self.session_id}: Tool '{tool_name}' served by its speculative call (done={task.done()}).")
+        return task
+
+    def retain(self, calls: Iterable[Tuple[str, Any]]) -> None:
+        """Discard speculative calls the final parse of the LLM output did not produce."""
+        keep: Set[str] = {key for key in (self._key(name, args) for name, args in calls) if key}
+        for key in [key for key in self._pending if key not in keep]:
+            self._discard(key)
+
+    def reset_stream(self) -> None:
+        """A new LLM call starts: calls not claimed by the previous step are stale."""
+        self._tool_call_buffers.clear()
+        self.cancel_all()
+
+    def cancel_all(self) -> None:
+        for key in list(self._pending):
+            self._discard(key)
+
+    def _discard(self, key: str) -> None:
+        """Drop an unconfirmed call; cancelling stops waiting for it, it cannot undo a call the server already ran."""
+        task = self._pending.pop(key)
+        completed = task.done() and not task.cancelled()
+        if not task.done():
+            task.cancel()
+        elif completed:
+            task.exception() # Retrieve it so asyncio doesn't warn about an unretrieved exception
+            self.stats["discarded_after_run"] += 1
+        self.stats["discarded"] += 1
+        logger.info(f"Session {self.session_id}: Discarded unconfirmed speculative tool call {key[:80]} (already completed: {completed}).")
+
+def _speculative_coroutine(tool_name: str, original):
+    async def call_tool(**arguments: Any) -> Any:
+        dispatcher = current_dispatcher.get()
+        task = dispatcher.claim(tool_name, arguments) if dispatcher is not None else None
+        if task is not None:
+            return await task
+        return await original(**arguments)
+
+    call_tool.speculative_original = original
+    return call_tool
+
+def enable_speculative_dispatch(tools: List[BaseTool], excluded_tool_names: Optional[Set[str]] = None) -> List[BaseTool]:
+    """
+    Return copies of coroutine-backed tools (MCP adapter StructuredTools) whose coroutine
+    first claims a matching speculative call. Tools in excluded_tool_names (every server
+    that hasn't opted in with speculative_tools: true) are returned unchanged.
+    """
+    excluded_tool_names = excluded_tool_names or set()
+    prepared: List[BaseTool] = []
+    for tool in tools:
+        coroutine = getattr(tool, "coroutine", None)
+        if coroutine is None or tool.name in excluded_tool_names or hasattr(coroutine, "speculative_original"):
+            prepared.append(tool)
+            continue
+        prepared.append(tool.model_copy(update={"coroutine": _speculative_coroutine(tool.name, coroutine)}))
+    return prepared
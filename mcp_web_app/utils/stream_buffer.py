@@ -0,0 +1,153 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How long a stream (and its still-running agent task) survives without any client attached
+STREAM_RESUME_GRACE_SECONDS = float(os.getenv("MCP_STREAM_RESUME_GRACE_SECONDS", "120"))
+# Number of events retained per stream for replay
+STREAM_RING_BUFFER_SIZE = int(os.getenv("MCP_STREAM_RING_BUFFER_SIZE", "4096"))
+
+BufferedEvent = Tuple[int, str, Any] # (offset, event_type, data)
+
+class StreamRecord:
+    """
+    Events of one agent run, numbered with monotonically increasing offsets (starting at 1)
+    and kept in a bounded ring buffer so a reconnecting client can resume from its last offset.
+    Streamed token text is also accumulated separately so it survives ring buffer eviction.
+    """
+
+    def __init__(self, stream_id: str, session_id: str, max_events: int = STREAM_RING_BUFFER_SIZE):
+        self.stream_id = stream_id
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.buffer: Deque[BufferedEvent] = deque(maxlen=max_events)
+        self.last_offset = 0
+        self.tokens: List[str] = []
+        self.done = False
+        self.agent_task: Optional[asyncio.Task] = None
+        self.attached = 0
+        self.detached_at: Optional[float] = None
+        self._new_event = asyncio.Event()
+
+    def append(self, event_type: str, data: Any) -> int:
+        """Buffer an event and wake up readers. Synchronous, callable from callback handlers."""
+        self.last_offset += 1
+        self.buffer.append((self.last_offset, event_type, data))
+        if event_type == "token":
+            self.tokens.append(data if isinstance(data, str) else str(data))
+        self._wake()
+        return self.last_offset
+
+    def mark_done(self) -> None:
+        self.done = True
+        self._wake()
+
+    def _wake(self) -> None:
+        self._new_event.set()
+        self._new_event = asyncio.Event()
+
+    @property
+    def first_retained_offset(self) -> int:
+        return self.buffer[0][0] if self.buffer else self.last_offset + 1
+
+    def events_after(self, offset: int) -> Tuple[List[BufferedEvent], bool]:
+        """Return buffered events with offset > `offset`, and whether some were already evicted."""
+        gap = offset + 1 < self.first_retained_offset and offset < self.last_offset
+        if offset >= self.last_offset:
+            return [], False
+        return [event for event in self.buffer if event[0] > offset], gap
+
+    def token_text_before(self, offset: int) -> str:
+        """Token text streamed up to and including `offset` (used to bridge ring buffer gaps)."""
+        evicted_tokens = len(self.tokens) - sum(1 for event in self.buffer if event[1] == "token")
+        retained = [event[2] for event in self.buffer if event[1] == "token" and event[0] <= offset]
+        return "".join(self.tokens[:evicted_tokens]) + "".join(str(token) for token in retained)
+
+    async def wait_for_events(self, offset: int, timeout: float) -> bool:
+        """Wait until an event newer than `offset` exists or the stream is done."""
+        if self.last_offset > offset or self.done:
+            return True
+        waiter = self._new_event
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "stream_id": self.stream_id,
+            "session_id": self.session_id,
+            "last_offset": self.last_offset,
+            "first_retained_offset": self.first_retained_offset,
+            "done": self.done,
+            "attached_clients": self.attached,
+            "age_seconds": round(time.time() - self.created_at, 1),
+        }
+
+class StreamRegistry:
+    """Keeps stream records alive across client disconnects for a grace period."""
+
+    def __init__(self, grace_seconds: float = STREAM_RESUME_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self._streams: Dict[str, StreamRecord] = {}
+
+    def create(self, session_id: str) -> StreamRecord:
+        self._evict_expired()
+        record = StreamRecord(f"stream-{uuid.uuid4()}", session_id)
+        self._streams[record.stream_id] = record
+        return record
+
+    def get(self, stream_id: Optional[str]) -> Optional[StreamRecord]:
+        self._evict_expired()
+        return self._streams.get(stream_id) if stream_id else None
+
+    def start_agent_task(self, record: StreamRecord, coro) -> asyncio.Task:
+        """Run the agent independently of any connection; the record is marked done when it ends."""
+        record.agent_task = asyncio.create_task(coro)
+        record.agent_task.add_done_callback(lambda _task: record.mark_done())
+        return record.agent_task
+
+    def attach(self, record: StreamRecord) -> None:
+        record.attached += 1
+        record.detached_at = None
+
+    def detach(self, record: StreamRecord) -> None:
+        """Called when a client goes away; keeps the run alive for the grace period."""
+        record.attached = max(record.attached - 1, 0)
+        if record.attached:
+            return
+        record.detached_at = time.time()
+        logger.info(f"Stream {record.stream_id}: no clients attached, keeping it for {self.grace_seconds:.0f}s (done={record.done}).")
+        try:
+            asyncio.get_running_loop().call_later(self.grace_seconds + 0.1, self._evict_expired)
+        except RuntimeError:
+            pass # No running loop; eviction happens lazily on the next create/get
+
+    def cancel(self, record: StreamRecord) -> None:
+        if record.agent_task and not record.agent_task.done():
+            record.agent_task.cancel()
+        self._streams.pop(record.stream_id, None)
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        for stream_id, record in list(self._streams.items()):
+            if record.attached or record.detached_at is None:
+                continue
+            if now - record.detached_at >= self.grace_seconds:
+                if record.agent_task and not record.agent_task.done():
+                    logger.info(f"Stream {stream_id}: grace period expired without a reconnect, cancelling agent task.")
+                    record.agent_task.cancel()
+                del self._streams[stream_id]
+
+    def list_streams(self) -> List[Dict[str, Any]]:
+        self._evict_expired()
+        return [record.info() for record in self._streams.values()]
+
+stream_registry = StreamRegistry()
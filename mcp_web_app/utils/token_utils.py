@@ -1,7 +1,290 @@
-# Placeholder for token utility functions
+import os
+import time
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
 
-class TokenReplacingStreamHandler:
-    pass
- 
-class StreamingLLMCallbackHandler:
-    pass 
\ No newline at end of file
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from mcp_web_app.utils.prompt_assembly import cache_hit_tokens_from_message
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError: # Optional: estimates fall back to a characters-per-token heuristic
+    tiktoken = None
+
+# Encoding used to estimate tokens for providers that report no usage (e.g. older Ollama builds)
+ESTIMATE_ENCODING = os.getenv("MCP_TOKEN_ESTIMATE_ENCODING", "cl100k_base")
+LIVE_USAGE_INTERVAL_SECONDS = float(os.getenv("MCP_USAGE_LIVE_INTERVAL_SECONDS", "1.0"))
+MAX_TRACKED_SESSIONS = int(os.getenv("MCP_USAGE_MAX_SESSIONS", "1000"))
+
+USAGE_EVENT = "usage" # Event type of live throughput and final usage frames
+
+@lru_cache(maxsize=4)
+def _encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Tokenizer '{name}' unavailable ({e}); estimating tokens from characters.")
+        return None
+
+def warm_tokenizer() -> None:
+    """Load the estimate encoding ahead of time (tiktoken may download it on first use)."""
+    _encoding(ESTIMATE_ENCODING)
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate (tiktoken encoding loaded once; ~4 chars/token without it)."""
+    if not text:
+        return 0
+    encoding = _encoding(ESTIMATE_ENCODING)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _usage_from_mapping(usage: Any) -> Optional[Tuple[int, int]]:
+    if not isinstance(usage, dict):
+        return None
+    if "input_tokens" in usage or "output_tokens" in usage: # LangChain usage_metadata
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    if "prompt_tokens" in usage or "completion_tokens" in usage: # OpenAI-compatible 'usage'
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    if "prompt_eval_count" in usage or "eval_count" in usage: # Ollama final chunk
+        return int(usage.get("prompt_eval_count") or 0), int(usage.get("eval_count") or 0)
+    return None
+
+def extract_usage(response: LLMResult) -> Optional[Tuple[int, int]]:
+    """(prompt_tokens, completion_tokens) reported by the provider, or None if it reported nothing."""
+    prompt_tokens = completion_tokens = 0
+    found = False
+    for generations in response.generations or []:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            candidates = [
+                getattr(message, "usage_metadata", None),
+                (getattr(message, "response_metadata", None) or {}).get("token_usage"),
+                getattr(message, "response_metadata", None),
+                generation.generation_info,
+            ]
+            for candidate in candidates:
+                usage = _usage_from_mapping(candidate)
+                if usage is not None:
+                    prompt_tokens += usage[0]
+                    completion_tokens += usage[1]
+                    found = True
+                    break
+    if not found:
+        usage = _usage_from_mapping((response.llm_output or {}).get("token_usage"))
+        if usage is not None:
+            return usage
+    return (prompt_tokens, completion_tokens) if found else None
+
+def _message_text(message: Any) -> str:
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+class UsageTotals:
+    """Token counters of one aggregation bucket (a session, an LLM config, a turn kind)."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.turns = 0
+        self.estimated_turns = 0 # Turns where at least one call had to be estimated locally
+        self.failed_turns = 0 # Turns that errored or were cancelled (their completed calls still count)
+        self.cache_hit_tokens = 0 # Prompt tokens served from the provider's prefix cache
+        self.last_used_at: Optional[float] = None
+
+    def add(self, prompt_tokens: int, completion_tokens: int, llm_calls: int, estimated: bool, cache_hit_tokens: int = 0,
+            failed: bool = False) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.cache_hit_tokens += cache_hit_tokens
+        self.completion_tokens += completion_tokens
+        self.llm_calls += llm_calls
+        self.turns += 1
+        self.estimated_turns += 1 if estimated else 0
+        self.failed_turns += 1 if failed else 0
+        self.last_used_at = time.time()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "llm_calls": self.llm_calls,
+            "turns": self.turns,
+            "estimated_turns": self.estimated_turns,
+            "failed_turns": self.failed_turns,
+            "cache_hit_tokens": self.cache_hit_tokens,
+            "cache_hit_ratio": round(self.cache_hit_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "last_used_at": self.last_used_at,
+        }
+
+class UsageLedger:
+    """Process-wide token usage per session, per LLM config and per turn kind (tool-enabled vs plain)."""
+
+    def __init__(self, max_sessions: int = MAX_TRACKED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, UsageTotals]" = OrderedDict()
+        self._configs: Dict[str, UsageTotals] = {}
+        self._turn_kinds: Dict[str, UsageTotals] = {}
+
+    def record(self, session_id: Optional[str], config_id: Optional[str], tools_enabled: bool,
+               prompt_tokens: int, completion_tokens: int, llm_calls: int, estimated: bool,
+               cache_hit_tokens: int = 0, failed: bool = False) -> None:
+        buckets = [
+            self._configs.setdefault(config_id or "unknown", UsageTotals()),
+            self._turn_kinds.setdefault("tools" if tools_enabled else "plain", UsageTotals()),
+        ]
+        if session_id:
+            session_totals = self._sessions.pop(session_id, None) or UsageTotals()
+            self._sessions[session_id] = session_totals # Most recently used last
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            buckets.append(session_totals)
+        for totals in buckets:
+            totals.add(prompt_tokens, completion_tokens, llm_calls, estimated, cache_hit_tokens, failed)
+
+    def session_usage(self, session_id: str) -> Optional[Dict[str, Any]]:
+        totals = self._sessions.get(session_id)
+        return totals.info() if totals else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "by_config": {config_id: totals.info() for config_id, totals in self._configs.items()},
+            "by_turn_kind": {kind: totals.info() for kind, totals in self._turn_kinds.items()},
+            "sessions": len(self._sessions),
+        }
+
+usage_ledger = UsageLedger()
+
+class _RunUsage:
+    def __init__(self, prompt_text: str):
+        self.prompt_text = prompt_text
+        self.started_at = time.time()
+        self.first_token_at: Optional[float] = None
+        self.streamed_chunks = 0
+        self.streamed_text: List[str] = []
+
+class UsageMeteringCallbackHandler(AsyncCallbackHandler):
+    """
+    Meters the tokens of one turn (all LLM calls of one agent run).
+
+    Provider-reported usage (usage_metadata / token_usage / Ollama eval counts) is used when
+    present; otherwise prompt and completion are estimated with the local tokenizer. While
+    tokens stream, a throttled 'usage' event with the live tokens/s is sent through
+    output_stream_fn; finish() records the turn in the ledger and returns the final summary.
+    """
+
+    def __init__(self, output_stream_fn: Optional[Callable[[str, Any], None]] = None, session_id: Optional[str] = None,
+                 config_id: Optional[str] = None, tools_enabled: bool = False, ledger: Optional[UsageLedger] = None,
+                 live_interval_seconds: float = LIVE_USAGE_INTERVAL_SECONDS):
+        super().__init__()
+        self.output_stream_fn = output_stream_fn
+        self.session_id = session_id
+        self.config_id = config_id
+        self.tools_enabled = tools_enabled
+        self.ledger = ledger if ledger is not None else usage_ledger
+        self.live_interval_seconds = live_interval_seconds
+        self._runs: Dict[UUID, _RunUsage] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.estimated = False
+        self.cache_hit_tokens: Optional[int] = None # None until the provider reports prefix-cache hits
+        self.streamed_chunks = 0
+        self.streaming_seconds = 0.0 # Sum over calls of first token -> last token
+        self._turn_started_at = time.time()
+        self._last_live_at = 0.0
+        self._finished = False
+        self.llm_errors = 0
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = _RunUsage("\n".join(_message_text(message) for batch in messages for message in batch))
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = _RunUsage("\n".join(prompts))
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is None or not token:
+            return
+        now = time.time()
+        if run.first_token_at is None:
+            run.first_token_at = now
+        run.streamed_chunks += 1
+        run.streamed_text.append(token)
+        self.streamed_chunks += 1
+        if self.output_stream_fn is not None and now - self._last_live_at >= self.live_interval_seconds:
+            self._last_live_at = now
+            elapsed = now - run.first_token_at
+            self.output_stream_fn(USAGE_EVENT, {
+                "final": False,
+                "tokens_per_second": round(run.streamed_chunks / elapsed, 1) if elapsed > 0 else None,
+                "completion_tokens_so_far": self.completion_tokens + run.streamed_chunks,
+            })
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        usage = extract_usage(response)
+        if usage is None or usage == (0, 0):
+            completion_text = "".join(run.streamed_text) if run and run.streamed_text else "".join(
+                generation.text for generations in response.generations or [] for generation in generations
+            )
+            usage = (estimate_tokens(run.prompt_text) if run else 0, estimate_tokens(completion_text))
+            self.estimated = True
+        self.prompt_tokens += usage[0]
+        self.completion_tokens += usage[1]
+        self.llm_calls += 1
+        for generations in response.generations or []:
+            for generation in generations:
+                cache_hits = cache_hit_tokens_from_message(getattr(generation, "message", None))
+                if cache_hits is not None:
+                    self.cache_hit_tokens = (self.cache_hit_tokens or 0) + cache_hits
+        if run is not None and run.first_token_at is not None:
+            self.streaming_seconds += time.time() - run.first_token_at
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+        self.llm_errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "final": True,
+            "config_id": self.config_id,
+            "tools_enabled": self.tools_enabled,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "llm_calls": self.llm_calls,
+            "estimated": self.estimated,
+            "cache_hit_tokens": self.cache_hit_tokens,
+            "tokens_per_second": round(self.completion_tokens / self.streaming_seconds, 1) if self.streaming_seconds > 0 else None,
+            "llm_errors": self.llm_errors,
+            "duration_seconds": round(time.time() - self._turn_started_at, 2),
+        }
+
+    def finish(self, failed: bool = False) -> Dict[str, Any]:
+        """
+        Record the turn in the ledger (once) and return its usage summary. A failed or
+        cancelled turn is recorded even if no LLM call completed, flagged as failed.
+        """
+        summary = self.summary()
+        summary["failed"] = failed
+        if not self._finished and (self.llm_calls or failed):
+            self._finished = True
+            self.ledger.record(self.session_id, self.config_id, self.tools_enabled,
+                               self.prompt_tokens, self.completion_tokens, self.llm_calls, self.estimated,
+                               self.cache_hit_tokens or 0, failed=failed)
+        return summary
@@ -17,5 +17,6 @@ setup(
         "langchain-core",
         "langchain",
         "langgraph",
+        "jsonschema",
     ],
 ) 
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel
+
+from mcp_web_app.utils.speculative_tools import (
+    SpeculativeToolDispatcher,
+    current_dispatcher,
+    enable_speculative_dispatch,
+    normalize_tool_args,
+)
+
+ADD_SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, "b": {"type": "integer"}},
+    "required": ["a", "b"],
+}
+
+class SquareArgs(BaseModel):
+    n: int
+
+def make_tools(calls):
+    async def add(a, b):
+        calls.append(("add", a, b))
+        return str(a + b)
+
+    async def square(n):
+        calls.append(("square", n))
+        return str(n * n)
+
+    async def write(path):
+        calls.append(("write", path))
+        return "ok"
+
+    return [
+        StructuredTool(name="add", description="Add", args_schema=ADD_SCHEMA, coroutine=add),
+        StructuredTool(name="square", description="Square", args_schema=SquareArgs, coroutine=square),
+        StructuredTool(name="write", description="Write", args_schema={"type": "object", "properties": {"path": {"type": "string"}}}, coroutine=write),
+    ]
+
+def run_step(dispatcher, streamed, executed):
+    """Stream a ReAct Action Input, then let the executor run the tool the final parse produced."""
+    async def step():
+        token = current_dispatcher.set(dispatcher)
+        try:
+            action, text = streamed
+            dispatcher.observe_react(action, text)
+            await asyncio.sleep(0) # Let a speculative task start, as trailing tokens would
+            name, args = executed
+            dispatcher.retain([(name, args)])
+            tool = next(tool for tool in dispatcher_tools(dispatcher) if tool.name == name)
+            result = await tool.ainvoke(args)
+            dispatcher.cancel_all()
+            return result
+        finally:
+            current_dispatcher.reset(token)
+    return asyncio.run(step())
+
+def dispatcher_tools(dispatcher):
+    return list(dispatcher._tools.values())
+
+def test_confirmed_call_runs_once_and_is_claimed():
+    calls = []
+    dispatcher = SpeculativeToolDispatcher(enable_speculative_dispatch(make_tools(calls)))
+    result = run_step(dispatcher, ("add", '{"a": 1, "b": 2}'), ("add", {"a": 1, "b": 2}))
+    assert result == "3"
+    assert calls == [("add", 1, 2)]
+    assert dispatcher.stats["dispatched"] == 1
+    assert dispatcher.stats["claimed"] == 1
+
+def test_args_failing_the_schema_are_never_dispatched():
+    calls = []
+    dispatcher = SpeculativeToolDispatcher(enable_speculative_dispatch(make_tools(calls)))
+    run_step(dispatcher, ("add", '{"a": "1", "b": 2}'), ("add", {"a": 1, "b": 2}))
+    assert calls == [("add", 1, 2)]
+    assert dispatcher.stats["dispatched"] == 0
+    assert dispatcher.stats["invalid_args"] == 1
+
+def test_coerced_args_match_the_executed_call():
+    calls = []
+    dispatcher = SpeculativeToolDispatcher(enable_speculative_dispatch(make_tools(calls)))
+    result = run_step(dispatcher, ("square", '{"n": "3"}'), ("square", {"n": 3}))
+    assert result == "9"
+    assert calls == [("square", 3)]
+    assert dispatcher.stats["claimed"] == 1
+    assert not dispatcher._pending
+
+def test_unconfirmed_call_is_reported_as_discarded_not_undone():
+    calls = []
+    dispatcher = SpeculativeToolDispatcher(enable_speculative_dispatch(make_tools(calls)))
+
+    async def step():
+        dispatcher.observe_react("write", '{"path": "a.txt"}')
+        await asyncio.sleep(0.01) # The call completes before the final parse arrives
+        dispatcher.retain([])
+
+    asyncio.run(step())
+    assert calls == [("write", "a.txt")]
+    assert dispatcher.stats["discarded"] == 1
+    assert dispatcher.stats["discarded_after_run"] == 1
+    assert "cancelled" not in dispatcher.stats
+
+def test_excluded_tools_are_not_wrapped():
+    calls = []
+    tools = enable_speculative_dispatch(make_tools(calls), excluded_tool_names={"write"})
+    dispatcher = SpeculativeToolDispatcher(tools)
+
+    async def step():
+        assert not dispatcher.dispatch("write", {"path": "a.txt"})
+        await asyncio.sleep(0)
+
+    asyncio.run(step())
+    assert calls == []
+    assert sorted(dispatcher._tools) == ["add", "square"]
+
+def test_normalize_tool_args_rejects_non_dict_input():
+    tool = make_tools([])[0]
+    assert normalize_tool_args(tool, "1, 2") is None
+    assert normalize_tool_args(tool, {"a": 1, "b": 2}) == {"a": 1, "b": 2}